@@ -5,18 +5,37 @@ from flask_socketio import SocketIO, emit
 import json
 import logging
 import time
+import math
 from datetime import datetime
 import firebase_admin
 from firebase import auth
 from firebase_admin import credentials, firestore, auth as firebase_auth
 import firestore_models  # Import our new Firestore models
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import mimetypes
 import cannon_handler  # Import the cannon handler module
 import player_handler  # Import the player handler module
 import harpoon_handler # <-- Import the new harpoon handler
 import requests # <-- Add requests for HTTP calls
 import projectile_manager # <-- Import the new manager
+import interest_manager # Spatial grid for area-of-interest broadcasting
+import tick_bundler # Per-tick outbound event bundling
+import snapshots # Delta-compressed world snapshots
+import wire_protocol # Optional binary encoding of position updates
+import update_lod # Distance-based update rates for remote players
+import input_mailbox # Latest-wins coalescing of incoming position updates
+import shared_state # State shared between worker processes
+import position_history # Per-player position history for lag-compensated hits
+import dead_reckoning # Server-side extrapolation of ships between position updates
+import storage # Document storage (Firestore, or local-first SQLite replicated to Firestore)
+import journal # Local write-ahead journal of buffered mutations, replayed after a crash
+import write_behind # Batched, asynchronous Firestore player writes
+import inventory_cache # In-memory inventories of online players, flushed in the background
+import leaderboards # In-memory rankings, updated as stats change
+import chat_log # In-memory chat history, persisted in batches
+import player_store # Player cache with an active-player index and bounded inactive entries
+import warm_restart # Snapshot of in-memory world state, loaded instead of Firestore on a quick restart
 import threading # <-- Add threading for non-blocking HTTP calls
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -60,11 +79,14 @@ limiter = Limiter(
 )
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'ship_game_secret_key')
 
-# Set up Socket.IO
-socketio = SocketIO(app, cors_allowed_origins=os.environ.get('SOCKETIO_CORS_ALLOWED_ORIGINS', '*'))
+# Set up Socket.IO. With SOCKETIO_MESSAGE_QUEUE set (e.g. redis://localhost:6379/0) several
+# worker processes can serve the same world; see shared_state for how game state is shared.
+socketio = SocketIO(app,
+                    cors_allowed_origins=os.environ.get('SOCKETIO_CORS_ALLOWED_ORIGINS', '*'),
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
 
-# Keep a session cache for quick access
-players = {}
+# Keep a session cache for quick access (players are loaded when they join)
+players = player_store.PlayerStore()
 islands = {}
 
 # Add this near your other global variables
@@ -77,6 +99,10 @@ last_db_positions = {}  # Track last database position for each player
 # Add this near your other global variables (at the top of the file)
 socket_to_user_map = {}
 
+# Maximum number of concurrently active players. Movement is only sent to nearby
+# players (see interest_manager), so this is no longer bound by broadcast bandwidth.
+MAX_ACTIVE_PLAYERS = int(os.environ.get('MAX_ACTIVE_PLAYERS', 50))
+
 # Add these MIME type registrations after your existing imports
 # Register GLB and GLTF MIME types
 mimetypes.add_type('model/gltf-binary', '.glb')
@@ -96,33 +122,119 @@ def init_firebase():
 
     # Initialize our Firestore models with the Firestore client
     firestore_models.init_firestore(db)
+    storage.init_storage(db)
+    journaled = journal.init_journal()
+    write_behind.init_write_behind()
+    inventory_cache.init_inventory_cache()
+    write_behind.replay(journaled)
+    inventory_cache.replay(journaled)
     auth.init_auth(firebase_app)
 
     return firebase_app, db
 
 
-init_firebase()
+# --- Startup ---
+STARTUP_WORKERS = 6  # Threads running the independent startup reads in parallel
+startup_timings = {}  # {phase: seconds}, reported in /api/metrics
+
+def timed_phase(phase, function, *args):
+    """Run one startup phase and record how long it took"""
+    start = time.perf_counter()
+    result = function(*args)
+    startup_timings[phase] = round(time.perf_counter() - start, 3)
+    return result
+
+startup_began = time.perf_counter()
+timed_phase('init_firebase', init_firebase)
+
+def reset_stale_players():
+    """
+    Queue active=False for players the previous run left marked active; they are not
+    connected anymore. write_behind commits the resets in WriteBatch chunks in the
+    background, and a player who joins meanwhile wins (their active=True is merged later).
+    """
+    stale_players = storage.find_documents('players', 'active', True)
+    for player in stale_players:
+        write_behind.update_player(player['id'], active=False)
+    write_behind.flush_soon()
+    return len(stale_players)
+
+def load_leaderboard_seed(category):
+    # Players are loaded when they join; only the leaderboard leaders are read up front
+    return storage.top_documents('players', category, leaderboards.SEED_SIZE)
+
+def load_islands():
+    return storage.all_documents('islands')
 
 # Load data from Firestore on startup
 def load_data_from_firestore():
-    # Load players
-    db_players = firestore_models.Player.get_all()
-    for player in db_players:
-        # Set all players to inactive on server start
-        if player.get('active', False):
-            firestore_models.Player.update(player['id'], active=False)
-            player['active'] = False
-        players[player['id']] = player
-    
-    # Load islands
-    db_islands = firestore_models.Island.get_all()
-    for island in db_islands:
-        islands[island['id']] = island
-    
-    logger.info(f"Loaded {len(players)} players and {len(islands)} islands from Firestore")
+    """
+    Read the state the server needs before accepting connections. The reads are independent,
+    so they run in parallel; each one's duration is logged.
+    """
+    with ThreadPoolExecutor(max_workers=STARTUP_WORKERS, thread_name_prefix='startup') as pool:
+        stale_reset = pool.submit(timed_phase, 'reset_stale_players', reset_stale_players)
+        seeds = [pool.submit(timed_phase, f'leaderboard_{category}', load_leaderboard_seed, category)
+                 for category in leaderboards.CATEGORIES]
+        db_islands = pool.submit(timed_phase, 'islands', load_islands)
+        chat_warmup = pool.submit(timed_phase, 'chat_history', chat_log.init_chat_log, players)
+
+        leaders = {player['id']: player for seed in seeds for player in seed.result()}
+        leaderboards.init_leaderboards(leaders)
 
-# Call the function during app startup
-load_data_from_firestore()
+        for island in db_islands.result():
+            islands[island['id']] = island
+
+        stale_count = stale_reset.result()
+        chat_warmup.result()
+
+    logger.info(f"Reset {stale_count} stale active players, loaded {len(leaders)} leaderboard players "
+                f"and {len(islands)} islands from Firestore")
+
+# Fields of an active player that change every tick and are only persisted now and then
+SESSION_FIELDS = ('position', 'rotation', 'mode', 'last_update')
+
+def capture_world_state():
+    """
+    In-flight world state for a warm-restart snapshot (runs on the tick thread). Persistent
+    state (stats, islands, leaderboards, chat) is not included: it is always reloaded from
+    storage, where the write-behind flush and the journal replay may have made it newer.
+    """
+    return {
+        'sessions': {player_id: {field: player[field] for field in SESSION_FIELDS if field in player}
+                     for player_id, player in players.active_items()},
+        'last_db_update': last_db_update,
+        'last_db_positions': last_db_positions,
+        'cannons': cannon_handler.cannons,
+        'cannon_cooldowns': cannon_handler.player_cooldowns,
+        'harpoon_cooldowns': harpoon_handler.player_harpoon_cooldowns,
+        'projectiles': projectile_manager.projectiles,
+    }
+
+def restore_world_state(state):
+    """
+    Restore the in-flight world state of a warm-restart snapshot, after the persistent
+    state was loaded. Sockets did not survive the restart, so the sessions of players who
+    were active are kept until they join again (see warm_restart.apply_session).
+    """
+    warm_restart.keep_sessions(state['sessions'])
+    last_db_update.update(state['last_db_update'])
+    last_db_positions.update(state['last_db_positions'])
+    cannon_handler.cannons.update(state['cannons'])
+    cannon_handler.player_cooldowns.update(state['cannon_cooldowns'])
+    harpoon_handler.player_harpoon_cooldowns.update(state['harpoon_cooldowns'])
+    projectile_manager.projectiles.update(state['projectiles'])
+
+    logger.info(f"Restored {len(warm_restart.restored_sessions)} player sessions and "
+                f"{len(projectile_manager.projectiles)} projectiles from the warm restart snapshot")
+
+# Call the function during app startup; a fresh snapshot adds the in-flight state on top
+snapshot = timed_phase('read_snapshot', warm_restart.load_snapshot)
+timed_phase('load_data', load_data_from_firestore)
+if snapshot is not None:
+    timed_phase('restore_snapshot', restore_world_state, snapshot)
+startup_timings['total'] = round(time.perf_counter() - startup_began, 3)
+logger.info("Startup phases: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in startup_timings.items()))
 
 # --- Discord Integration Helper ---
 def send_to_discord_bot(event_type, payload):
@@ -171,6 +283,9 @@ def handle_disconnect():
     
     # Look up the player ID from our mapping
     player_id = socket_to_user_map.pop(request.sid, None)
+    tick_bundler.unregister_session(request.sid)
+    snapshots.remove_client(request.sid)
+    wire_protocol.forget_session(request.sid)
    # logger.error(f'request.sid: {request.sid}')
     #logger.error(f"Socket to user map: {socket_to_user_map}")
  
@@ -178,23 +293,57 @@ def handle_disconnect():
   #  logger.error(f"Players: {players}")
     
     # If this was a player, mark them as inactive
+    if player_id:
+        interest_manager.remove_player(player_id)
+        snapshots.release_handle(player_id)
+        update_lod.forget_player(player_id)
+        input_mailbox.forget_player(player_id)
+        position_history.forget_player(player_id)
+        dead_reckoning.forget_player(player_id)
+        inventory_cache.player_left(player_id)
+
     if player_id and player_id in players:
         # Update player in Firestore and cache
-        firestore_models.Player.update(player_id, active=False, last_update=time.time())
+        write_behind.update_player(player_id, active=False, last_update=time.time())
         if player_id in players:
-            players[player_id]['active'] = False
+            players.set_active(player_id, False)
             
+            # Publish the final state to the other workers before letting go of the player
+            shared_state.release_player(player_id, request.sid)
+
             # Broadcast that the player disconnected
             emit('player_disconnected', {'id': player_id}, broadcast=True)
             logger.error(f"Player {player_id} marked as inactive after disconnect")
 
+# Fields of the online-player roster sent to every client; full player state only goes
+# to the clients whose area of interest contains the ship
+ROSTER_FIELDS = ('name', 'color', 'fishCount', 'money')
+
+def roster_entry(player_id, player):
+    """A player's entry in the online roster"""
+    return {'id': player_id, **{field: player.get(field) for field in ROSTER_FIELDS}}
+
+def send_player_lists(player_id):
+    """Send a client the roster of every active player and the full state of the players it can see"""
+    emit('player_roster', [roster_entry(pid, player) for pid, player in players.active_items()])
+    # Others arrive via player_entered_view as they come into view
+    visible_ids = interest_manager.visible_players(player_id) | {player_id}
+    emit('all_players', [players[pid] for pid in visible_ids if pid in players])
+
+@socketio.on('get_all_players')
+def handle_get_all_players(data=None):
+    """Resend the roster and the players in view (clients refresh their player list with this)"""
+    player_id = socket_to_user_map.get(request.sid)
+    if player_id:
+        send_player_lists(player_id)
+
 @socketio.on('player_join')
 def handle_player_join(data):
     # --- Max Player Cap Check ---
-    active_player_count = len([p for p in players.values() if p.get('active', False)])
-    if active_player_count >= 10:
-        logger.warning(f"Connection rejected: Server full ({active_player_count}/10 active players)")
-        emit('connection_response', {'error': 'Server is full (max 10 players)'})
+    active_player_count = players.active_count()
+    if active_player_count >= MAX_ACTIVE_PLAYERS:
+        logger.warning(f"Connection rejected: Server full ({active_player_count}/{MAX_ACTIVE_PLAYERS} active players)")
+        emit('connection_response', {'error': f'Server is full (max {MAX_ACTIVE_PLAYERS} players)'})
         return
     # ----------------------------
 
@@ -223,7 +372,15 @@ def handle_player_join(data):
 
             socket_to_user_map[request.sid] = docid
 
-            existing_player = firestore_models.Player.get(docid)
+            if docid in players:
+                # Still cached from a recent session
+                existing_player = dict(players[docid])
+            else:
+                existing_player = storage.get_document('players', docid)
+            if existing_player:
+                # Fields from the last session (or replayed from the journal) may not have been flushed yet
+                existing_player.update(write_behind.pending_fields('players', docid))
+                warm_restart.apply_session(docid, existing_player)
             
             if existing_player:
                 # Update the existing player in database
@@ -234,7 +391,7 @@ def handle_player_join(data):
                 }
                 
                 # Update in Firestore
-                firestore_models.Player.update(docid, **player_data)
+                write_behind.update_player(docid, **player_data)
                 
                 # Update cache
                 players[docid] = {**existing_player, **player_data}
@@ -255,24 +412,50 @@ def handle_player_join(data):
                     'firebase_uid': verified_uid
                 }
                 
-                # Create player in Firestore and cache the result
-                player = firestore_models.Player.create(docid, **player_data)
+                # Create player in storage and cache the result
+                player = storage.set_document('players', docid,
+                                              {**firestore_models.Player.defaults(docid), **player_data})
                 players[docid] = player
 
+            # Keep the inventory in memory for the rest of the session
+            inventory_cache.player_joined(docid)
+            leaderboards.update_player(docid, players[docid])
+
+            # Register for per-tick event delivery, negotiating the bundled frame format
+            accepted_capabilities = tick_bundler.register_session(request.sid, docid, data.get('capabilities'))
+            if tick_bundler.CAPABILITY_DELTA_SNAPSHOTS in accepted_capabilities:
+                snapshots.add_client(request.sid)
+
+            # Negotiate the wire format; clients that don't ask stay on JSON
+            protocol_version = wire_protocol.negotiate(request.sid, data.get('protocol_version'))
+            if wire_protocol.is_binary(request.sid):
+                tick_bundler.set_session_encoder(request.sid, wire_protocol.encode_tick_items)
+
+            # This worker is now authoritative for the player
+            shared_state.claim_player(docid, request.sid)
+
+            # Subscribe this socket to the grid cells around the player's ship
+            interest_manager.add_player(docid, request.sid, players[docid].get('position'))
 
              # Get existing player from Firestore before sending connection response
             
             auth_player_data = existing_player if existing_player else player_data
             
             auth_player_data['id'] = docid  # Add ID if it's not already included
+            auth_player_data['capabilities'] = accepted_capabilities
+            auth_player_data['handle'] = snapshots.handle_for(docid)
+            auth_player_data['protocol_version'] = protocol_version
+            if tick_bundler.CAPABILITY_DEAD_RECKONING in accepted_capabilities:
+                auth_player_data['dead_reckoning'] = dead_reckoning.client_parameters()
 
             emit('connection_response', auth_player_data)
 
-            # Broadcast to all clients that a new player joined
-            emit('player_joined', players[docid], broadcast=True)
-
-            active_players = [p for p in players.values() if p.get('active', False)]
-            emit('all_players', active_players)
+            # Tell the players who can see the new ship (their sockets are in its cell's room)
+            emit('player_joined', players[docid],
+                 room=interest_manager.cell_room(interest_manager.get_player_cell(docid)), include_self=False)
+            # Everyone else only needs the new ship's roster entry
+            tick_bundler.queue_event('roster_joined', roster_entry(docid, players[docid]),
+                                     exclude=request.sid, key=('roster_joined', docid))
 
             # --- Send notification to Discord ---
             if player_doc_id and player_doc_id in players:
@@ -290,37 +473,35 @@ def handle_player_join(data):
         return
     
     # Send game data regardless of auth status (read-only operations)
-    # Send existing ACTIVE players to the new player
-    active_players = [p for p in players.values() if p.get('active', False)]
-    emit('all_players', active_players)
+    send_player_lists(player_doc_id)
     
     # Send all islands to the new player
     emit('all_islands', list(islands.values()))
     
     # Send recent messages to the new player
-    recent_messages = firestore_models.Message.get_recent_messages(limit=20)
-    emit('chat_history', recent_messages)
+    emit('chat_history', chat_log.recent(limit=20))
     
     # Send leaderboard data to the new player
-    emit('leaderboard_update', firestore_models.Player.get_combined_leaderboard())
+    emit('leaderboard_update', leaderboards.full_copy())
 
 @socketio.on('update_position')
 def handle_position_update(data):
+    # Binary clients send a packed frame; the player is identified by their socket
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            data = wire_protocol.decode_position_update(data, socket_to_user_map.get(request.sid))
+        except ValueError as e:
+            logger.warning(f"Malformed binary position update from {request.sid}: {e}")
+            return
+
     # Get the player ID from the request data
     player_id = data.get('player_id')
     if not player_id:
         logger.warning("Missing player ID in position update. Ignoring.")
         return
 
-    # Extract individual position components
-    x = data.get('x')
-    y = data.get('y')
-    z = data.get('z')
-    rotation = data.get('rotation')
-    mode = data.get('mode')
-    
     # Validate required fields
-    if x is None or z is None:  # y can be 0, so check None specifically
+    if data.get('x') is None or data.get('z') is None:  # y can be 0, so check None specifically
         logger.warning("Missing position data in update. Ignoring.")
         return
     
@@ -328,6 +509,34 @@ def handle_position_update(data):
     if player_id not in players:
         logger.warning(f"Player ID {player_id} not found in cache. Ignoring position update.")
         return
+
+    # Optional speed for dead reckoning; anything that isn't a finite number is ignored
+    speed = data.get('speed')
+    if speed is not None and (not isinstance(speed, (int, float)) or isinstance(speed, bool) or not math.isfinite(speed)):
+        data.pop('speed')
+
+    # Only the newest pending update per player is kept; it is applied on the next tick,
+    # so server cost no longer depends on how often the client chooses to send
+    input_mailbox.submit(player_id, data)
+
+def process_position_updates(tick):
+    """Tick hook: apply the newest pending position update of every player once per tick"""
+    for player_id, data in input_mailbox.drain():
+        if player_id not in players:
+            continue
+        try:
+            apply_position_update(player_id, data)
+        except Exception as e:
+            logger.error(f"Error applying position update for {player_id}: {str(e)}")
+
+def apply_position_update(player_id, data):
+    """Apply one position update: cache write, interest cells, throttled Firestore save and broadcast"""
+    # Extract individual position components
+    x = data.get('x')
+    y = data.get('y')
+    z = data.get('z')
+    rotation = data.get('rotation')
+    mode = data.get('mode')
     
     # Periodically clean up expired cannons (approximately every 5 position updates)
     # This spreads the cleanup task across multiple players/requests
@@ -346,13 +555,19 @@ def handle_position_update(data):
         'z': z
     }
     
-    # Always update in-memory cache immediately for responsive gameplay
+    # Update in-memory cache first; everything below reads the new position
     players[player_id]['position'] = position
     if rotation is not None:
         players[player_id]['rotation'] = rotation
     if mode is not None:
         players[player_id]['mode'] = mode
     players[player_id]['last_update'] = current_time
+    position_history.record(player_id, position, current_time)
+    speed = dead_reckoning.observe(player_id, position, players[player_id].get('rotation'),
+                                   current_time, data.get('speed'))
+
+    # Move the player between interest cells if they crossed a boundary
+    cell = interest_manager.update_player_position(player_id, position)
     
     # Calculate distance from last stored database position (if available)
     should_update_db = False
@@ -389,10 +604,10 @@ def handle_position_update(data):
             update_data['mode'] = mode
         
         # Update in Firestore
-        firestore_models.Player.update(player_id, **update_data)
+        write_behind.update_player(player_id, **update_data)
         logger.debug(f"Updated player {player_id} position in Firestore (distance threshold)")
     
-    # Broadcast to all other clients (not back to sender)
+    # Send only to clients whose area of interest includes this player's cell
     emit_data = {
         'id': player_id,
         'position': position
@@ -401,8 +616,123 @@ def handle_position_update(data):
         emit_data['rotation'] = rotation
     if mode is not None:
         emit_data['mode'] = mode
+    emit_data['speed'] = speed
         
-    emit('player_moved', emit_data, broadcast=True, include_self=False)
+    if cell is not None:
+        queue_player_moved(player_id, emit_data, current_time)
+
+def handle_extrapolated_position(player_id, position):
+    """
+    dead_reckoning callback: a ship moved along its prediction between updates.
+    Keeps history and interest cells current and moves the ship for observers that
+    do not run the prediction themselves.
+    """
+    current_time = time.time()
+    position_history.record(player_id, position, current_time)
+    if interest_manager.update_player_position(player_id, position) is None:
+        return
+
+    player = players[player_id]
+    emit_data = {'id': player_id, 'position': position}
+    if player.get('rotation') is not None:
+        emit_data['rotation'] = player['rotation']
+    if player.get('mode') is not None:
+        emit_data['mode'] = player['mode']
+    queue_player_moved(player_id, emit_data, current_time,
+                       skip_capability=tick_bundler.CAPABILITY_DEAD_RECKONING)
+
+def queue_player_moved(player_id, emit_data, current_time, skip_capability=None):
+    """
+    Queue a player_moved event for the local observers of a player.
+    Delta-snapshot clients get movement through their per-tick snapshot instead;
+    everyone else is sent updates at a rate that depends on how far away they are.
+    Observers with skip_capability (if given) are left out as well.
+    """
+    observer_ids = []
+    for other_id in interest_manager.visible_players(player_id):
+        other_sid = interest_manager.get_player_sid(other_id)
+        if not other_sid or tick_bundler.has_capability(other_sid, tick_bundler.CAPABILITY_DELTA_SNAPSHOTS):
+            continue
+        if skip_capability is not None and tick_bundler.has_capability(other_sid, skip_capability):
+            continue
+        observer_ids.append(other_id)
+    due_ids = update_lod.due_observers(player_id, observer_ids, current_time, update=emit_data)
+    observers = [interest_manager.get_player_sid(other_id) for other_id in due_ids]
+    tick_bundler.queue_event('player_moved', emit_data, to=observers,
+                             key=('player_moved', player_id))
+
+def send_pending_moves(tick):
+    """
+    Tick hook: send observers the latest player_moved they skipped while the ship was not
+    due at their distance, so a ship that stopped moving is shown where it came to rest.
+    """
+    for observer_id, subject_id, update in update_lod.take_pending(time.time()):
+        observer_sid = interest_manager.get_player_sid(observer_id)
+        if observer_sid and subject_id in interest_manager.visible_players(observer_id):
+            tick_bundler.queue_event('player_moved', update, to=[observer_sid],
+                                     key=('player_moved', subject_id))
+
+last_latency_probe = 0.0
+
+def probe_latency(tick):
+    """
+    Tick hook: every PROBE_INTERVAL seconds, send each joined client a latency_probe.
+    The client acknowledges it straight away, which gives the round-trip time used
+    to rewind targets for that player's shots.
+    """
+    global last_latency_probe
+    now = time.time()
+    if now - last_latency_probe < position_history.PROBE_INTERVAL:
+        return
+    last_latency_probe = now
+    for sid, player_id in list(socket_to_user_map.items()):
+        socketio.emit('latency_probe', {}, room=sid,
+                      callback=lambda *args, player_id=player_id, sent_at=now:
+                          position_history.observe_rtt(player_id, time.time() - sent_at))
+
+def handle_remote_player_update(player_id, previous, player):
+    """
+    shared_state callback: a player owned by another worker changed.
+    Keeps the interest grid and leaderboards up to date and forwards movement to this worker's observers.
+    """
+    # Stats of remote players count towards this worker's leaderboards too
+    leaderboards.update_player(player_id, player)
+
+    position = player.get('position')
+    if not player.get('active', False):
+        interest_manager.remove_player(player_id)
+        position_history.forget_player(player_id)
+        return
+
+    position_history.record(player_id, position)
+    if interest_manager.get_player_cell(player_id) is None:
+        interest_manager.add_player(player_id, None, position)
+        return
+
+    interest_manager.update_player_position(player_id, position)
+    if previous is None or previous.get('position') != position or previous.get('rotation') != player.get('rotation'):
+        emit_data = {'id': player_id, 'position': position}
+        if player.get('rotation') is not None:
+            emit_data['rotation'] = player['rotation']
+        if player.get('mode') is not None:
+            emit_data['mode'] = player['mode']
+        queue_player_moved(player_id, emit_data, time.time())
+
+@socketio.on('snapshot_ack')
+def handle_snapshot_ack(data):
+    """
+    Acknowledge receipt of a delta snapshot so it becomes the client's new baseline
+    Expects: { seq }
+    """
+    seq = data.get('seq') if isinstance(data, dict) else None
+    if not isinstance(seq, int):
+        return
+    if snapshots.acknowledge(request.sid, seq):
+        # Snapshot seq is the tick it was sent on, which gives us the client's round-trip time
+        sent_at = tick_bundler.tick_time(seq)
+        player_id = socket_to_user_map.get(request.sid)
+        if sent_at is not None and player_id:
+            position_history.observe_rtt(player_id, time.time() - sent_at)
 
 @socketio.on('player_action')
 def handle_player_action(data):
@@ -431,21 +761,19 @@ def handle_player_action(data):
         players[player_id]['fishCount'] += 1
         
         # Update player in Firestore
-        firestore_models.Player.update(player_id, 
+        write_behind.update_player(player_id, 
                                      fishCount=players[player_id]['fishCount'])
         
         # Broadcast achievement to all players
-        emit('player_achievement', {
+        tick_bundler.queue_event('player_achievement', {
             'id': player_id,
             'name': players[player_id]['name'],
             'achievement': 'Caught a fish!',
             'fishCount': players[player_id]['fishCount']
-        }, broadcast=True)
+        })
         
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
+        # Update leaderboard (broadcast on the next tick if a visible entry changed)
+        leaderboards.update_player(player_id, players[player_id])
     
     elif action_type == 'monster_killed':
         # Increment monster kills
@@ -454,21 +782,19 @@ def handle_player_action(data):
         players[player_id]['monsterKills'] += 1
         
         # Update player in Firestore
-        firestore_models.Player.update(player_id, 
+        write_behind.update_player(player_id, 
                                      monsterKills=players[player_id]['monsterKills'])
         
         # Broadcast achievement to all players
-        emit('player_achievement', {
+        tick_bundler.queue_event('player_achievement', {
             'id': player_id,
             'name': players[player_id]['name'],
             'achievement': 'Defeated a sea monster!',
             'monsterKills': players[player_id]['monsterKills']
-        }, broadcast=True)
+        })
         
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
+        # Update leaderboard (broadcast on the next tick if a visible entry changed)
+        leaderboards.update_player(player_id, players[player_id])
     
     elif action_type == 'money_earned':
         amount = data.get('amount', 0)
@@ -479,21 +805,19 @@ def handle_player_action(data):
         players[player_id]['money'] += amount
         
         # Update player in Firestore
-        firestore_models.Player.update(player_id, 
+        write_behind.update_player(player_id, 
                                      money=players[player_id]['money'])
         
         # Broadcast achievement to all players
-        emit('player_achievement', {
+        tick_bundler.queue_event('player_achievement', {
             'id': player_id,
             'name': players[player_id]['name'],
             'achievement': f'Earned {amount} coins!',
             'money': players[player_id]['money']
-        }, broadcast=True)
+        })
         
-        # Update leaderboard
-        emit('leaderboard_update', 
-             firestore_models.Player.get_combined_leaderboard(), 
-             broadcast=True)
+        # Update leaderboard (broadcast on the next tick if a visible entry changed)
+        leaderboards.update_player(player_id, players[player_id])
 
 @socketio.on('send_message')
 def handle_chat_message(data):
@@ -551,10 +875,13 @@ def handle_chat_message(data):
     #print(f"CHAT DEBUG: Broadcasting message object: {message_obj}")
     logger.info(f"CHAT DEBUG: Broadcasting message with player name: '{final_name}'")
     
+    # Keep it in the chat history and persist it in the background
+    history_entry = chat_log.append(message_obj, sender_color=players.get(player_id, {}).get('color'))
+
     # IMPORTANT: Make sure we're sending the OBJECT, not just the content string
     try:
         # Send as JSON to ensure proper serialization
-        emit('new_message', message_obj, broadcast=True)
+        tick_bundler.queue_event('new_message', history_entry)
         # --- Send chat message to Discord ---
         # Consider if the Discord bot needs sanitized or raw content.
         # If Discord also displays HTML, send sanitized_content there too.
@@ -591,16 +918,18 @@ def handle_update_player_color(data):
     
     # Update in-memory cache
     players[player_id]['color'] = color
+    leaderboards.update_player(player_id, players[player_id])
     
     # Update in Firestore directly with the data
-    firestore_models.Player.update(player_id, color=color)
+    write_behind.update_player(player_id, color=color)
     logger.info(f"Updated player {player_id} color to {color}")
     
     # Broadcast to all other clients@
-    emit('player_updated', {
+    tick_bundler.queue_event('player_updated', {
         'id': player_id,
         'color': color
-    }, broadcast=True)
+    }, to=tick_bundler.sids_without(tick_bundler.CAPABILITY_DELTA_SNAPSHOTS),
+       key=('player_updated', player_id))
 
 @socketio.on('update_player_name')
 def handle_update_player_name(data):
@@ -646,16 +975,18 @@ def handle_update_player_name(data):
     
     # Update in-memory cache
     players[player_id]['name'] = sanitized_name
+    leaderboards.update_player(player_id, players[player_id])
     
     # Update in Firestore directly
-    firestore_models.Player.update(player_id, name=sanitized_name)
+    write_behind.update_player(player_id, name=sanitized_name)
     logger.info(f"Updated player {player_id} name to {sanitized_name}")
     
     # Broadcast to all other clients
-    emit('player_updated', {
+    tick_bundler.queue_event('player_updated', {
         'id': player_id,
         'name': sanitized_name
-    }, broadcast=True)
+    }, to=tick_bundler.sids_without(tick_bundler.CAPABILITY_DELTA_SNAPSHOTS),
+       key=('player_updated', player_id))
     
     print(f"DEBUG: Broadcast player name update: {player_id} = '{sanitized_name}'")
 
@@ -700,14 +1031,15 @@ def sanitize_player_name(name):
 @limiter.limit("50 per minute")
 def get_players():
     """Get all active players"""
-    active_players = [p for p in players.values() if p.get('active', False)]
+    active_players = players.active_players()
     return jsonify(active_players)
 
 @app.route('/api/players/<player_id>', methods=['GET'])
 def get_player(player_id):
     """Get a specific player"""
-    player = firestore_models.Player.get(player_id)
+    player = storage.get_document('players', player_id)
     if player:
+        player.update(write_behind.pending_fields('players', player_id))
         return jsonify(player)
     return jsonify({'error': 'Player not found'}), 404
 
@@ -721,7 +1053,15 @@ def get_islands():
 @limiter.limit("50 per minute")
 def get_leaderboard():
     """Get the combined leaderboard"""
-    return jsonify(firestore_models.Player.get_combined_leaderboard())
+    return jsonify(leaderboards.combined())
+
+@socketio.on('get_leaderboard')
+def handle_get_leaderboard(data=None):
+    """
+    Send the full leaderboard to the requesting client only
+    (e.g. a leaderboard_diff client that missed a version)
+    """
+    emit('leaderboard_update', leaderboards.full_copy())
 
 @app.route('/api/messages', methods=['GET'])
 @limiter.limit("50 per minute")
@@ -729,9 +1069,30 @@ def get_messages():
     """Get recent chat messages"""
     message_type = request.args.get('type', 'global')
     limit = int(request.args.get('limit', 50))
-    messages = firestore_models.Message.get_recent_messages(limit=limit, message_type=message_type)
+    if limit <= chat_log.HISTORY_SIZE and message_type in chat_log.channels:
+        return jsonify(chat_log.recent(message_type, limit))
+    messages = firestore_models.Message.get_recent_messages(limit=limit, message_type=message_type,
+                                                          players=players)
     return jsonify(messages)
 
+@app.route('/api/metrics', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_metrics():
+    """Get server metrics (outbound queue backpressure, write-behind flush lag, storage replication)"""
+    return jsonify({
+        'outbound_queues': tick_bundler.queue_metrics(),
+        'write_behind': write_behind.metrics(),
+        'storage': storage.metrics(),
+        'inventory_cache': inventory_cache.metrics(),
+        'leaderboards': leaderboards.metrics(),
+        'chat_log': chat_log.metrics(),
+        'players': players.metrics(),
+        'warm_restart': warm_restart.metrics(),
+        'journal': journal.metrics(),
+        'auth': auth.token_metrics(),
+        'startup': startup_timings
+    })
+
 @app.route('/api/admin/create_island', methods=['POST'])
 @limiter.limit("10 per minute")
 def create_island():
@@ -745,11 +1106,12 @@ def create_island():
     # Generate island ID
     island_id = f"island_{int(time.time())}"
     
-    # Create island in Firestore
-    island = firestore_models.Island.create(island_id, **data)
+    # Create island in storage
+    island = storage.set_document('islands', island_id, {**firestore_models.Island.defaults(), **data})
     
     # Add to cache
     islands[island_id] = island
+    shared_state.publish_island(island_id, island)
     
     # Broadcast to all clients
     socketio.emit('island_created', island)
@@ -784,18 +1146,23 @@ def handle_add_to_inventory(data):
     
     # Add to appropriate inventory type
     if item_type == 'fish':
-        result = firestore_models.Inventory.add_fish(player_id, item_name, item_data)
+        result = inventory_cache.add_item(player_id, 'fish', item_name, item_data)
         logger.info(f"Added fish '{item_name}' to player {player_id}'s inventory")
     elif item_type == 'treasure':
-        result = firestore_models.Inventory.add_treasure(player_id, item_name, item_data)
+        result = inventory_cache.add_item(player_id, 'treasures', item_name, item_data)
         logger.info(f"Added treasure '{item_name}' to player {player_id}'s inventory")
     else:
         logger.warning(f"Unknown item type '{item_type}' in inventory update. Ignoring.")
         return
     
-    # Send updated inventory to the player
+    # Acknowledge only once the item's journal record is on disk: through the tick bundler,
+    # which sends after this tick's journal.sync hook, or after syncing here
     if result:
-        emit('inventory_updated', result)
+        if request.sid in tick_bundler.sessions:
+            tick_bundler.queue_event('inventory_updated', result, to=request.sid)
+        else:
+            journal.sync()
+            emit('inventory_updated', result)
 
 # Add API endpoint to get player inventory
 @app.route('/api/players/<player_id>/inventory', methods=['GET'])
@@ -803,11 +1170,48 @@ def get_player_inventory(player_id):
     print(f"DEBUG: Getting player inventory for {player_id}")
     #logger.error(f"DEBUG: Getting player inventory for {player_id}")
     """Get a player's inventory"""
-    inventory = firestore_models.Inventory.get(player_id)
+    inventory = inventory_cache.get(player_id)
     if inventory:
         return jsonify(inventory)
     return jsonify({'error': 'Inventory not found'}), 404
 
+@app.route('/api/players/<player_id>/inventory/items', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_player_inventory_items(player_id):
+    """Get one page of a player's inventory items, newest first (?type=fish&limit=50&cursor=...)"""
+    try:
+        # Items picked up since the last flush must be in Firestore before paging
+        inventory_cache.flush_player(player_id)
+        page = firestore_models.Inventory.list_items(player_id,
+                                                     item_type=request.args.get('type'),
+                                                     limit=int(request.args.get('limit', 50)),
+                                                     cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+
+@socketio.on('get_inventory_items')
+def handle_get_inventory_items(data):
+    """
+    Handle request for a page of inventory items
+    Expects: { player_id, type (optional), limit (optional), cursor (optional) }
+    """
+    player_id = data.get('player_id')
+    if not player_id:
+        logger.warning("Missing player ID in inventory items request. Ignoring.")
+        return
+
+    try:
+        inventory_cache.flush_player(player_id)
+        page = firestore_models.Inventory.list_items(player_id,
+                                                     item_type=data.get('type'),
+                                                     limit=data.get('limit', 50),
+                                                     cursor=data.get('cursor'))
+    except (TypeError, ValueError) as e:
+        emit('inventory_items', {'error': str(e)})
+        return
+    emit('inventory_items', {**page, 'type': data.get('type')})
+
 @socketio.on('get_inventory')
 def handle_get_inventory(data):
     """
@@ -821,8 +1225,8 @@ def handle_get_inventory(data):
         logger.warning("Missing player ID in inventory request. Ignoring.")
         return
     
-    # Get inventory
-    inventory = firestore_models.Inventory.get(player_id)
+    # Get inventory (from memory for online players)
+    inventory = inventory_cache.get(player_id)
     
     # Send inventory data back to the requesting client only
     if inventory:
@@ -864,7 +1268,7 @@ def handle_discord_message():
 
     # Broadcast the message to all connected game clients
     try:
-        socketio.emit('new_message', message_obj)
+        tick_bundler.queue_event('new_message', chat_log.append(message_obj))
         logger.info(f"Broadcasted Discord message from '{author}' to game clients.")
         return jsonify({"status": "success"}), 200
     except Exception as e:
@@ -877,6 +1281,19 @@ if __name__ == '__main__':
     env = os.environ.get('FLASK_ENV_RUN', 'development')
     port = int(os.environ.get('PORT', 5001))
     projectile_manager.init_manager(socketio)
+    tick_bundler.init_bundler(socketio)
+    tick_bundler.register_tick_hook(process_position_updates) # Must run before snapshots are built
+    dead_reckoning.init_dead_reckoning(players, handle_extrapolated_position) # Extrapolates ships that did not report this tick
+    tick_bundler.register_tick_hook(send_pending_moves) # After this tick's moves, which replace pending ones
+    tick_bundler.register_tick_hook(probe_latency)
+    tick_bundler.register_tick_hook(leaderboards.broadcast)
+    shared_state.init_state(players, islands, handle_remote_player_update)
+    interest_manager.init_manager(socketio, players)
+    snapshots.init_snapshots(players)
+    wire_protocol.init_protocol(players)
+    update_lod.init_lod(players)
+    warm_restart.init_warm_restart(capture_world_state) # Runs late, so the snapshot sees this tick's state
+    tick_bundler.register_tick_hook(journal.sync) # Last: this tick's mutations are durable before its events are sent
 
     # Initialize specific handlers (they might register collision checkers now)
     cannon_handler.init_socketio(socketio, players)
@@ -884,6 +1301,6 @@ if __name__ == '__main__':
     harpoon_handler.init_socketio(socketio, players) # This will now register its checker
     
     if env == 'development':
-        socketio.run(app, host='0.0.0.0', port=5001, debug=False, use_reloader=False) 
+        socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False) 
     else:
         socketio.run(app, host='0.0.0.0') 
\ No newline at end of file
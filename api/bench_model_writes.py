@@ -0,0 +1,188 @@
+"""
+Benchmark: Firestore round trips per model write.
+
+Runs the model update paths against an in-memory Firestore stand-in that counts
+document reads and writes, once with readback=True (the old behaviour) and once
+with the default write-only path, then the per-item cost of Inventory.add_fish
+for a player without an inventory, an empty one and a large one. A WriteBatch
+or transaction commit counts as one write. Round trips, not latency, are what
+the production cost scales with; multiply by your Firestore RTT for wall time.
+
+Usage:
+    python bench_model_writes.py [--iterations 1000]
+"""
+
+import argparse
+import time
+
+import firestore_models
+import models.player
+import models.island
+import models.inventory
+from models.player import Player
+from models.island import Island
+from models.inventory import Inventory
+
+class CountingSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class CountingDocument:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return CountingCollection(self.store, self.path + (name,))
+
+    def get(self, transaction=None):
+        self.store.counts['reads'] += 1
+        return CountingSnapshot(self, self.store.docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self.store.counts['writes'] += 1
+        self.store.apply_set(self.path, data, merge)
+
+    def update(self, data):
+        self.store.counts['writes'] += 1
+        self.store.docs[self.path] = {**self.store.docs[self.path], **data}
+
+    def delete(self):
+        self.store.counts['writes'] += 1
+        self.store.docs.pop(self.path, None)
+
+class CountingCollection:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.store.next_id += 1
+            doc_id = f"auto_{self.store.next_id}"
+        return CountingDocument(self.store, self.path + (doc_id,))
+
+class CountingBatch:
+    """WriteBatch stand-in: the whole batch is one write round trip, applied on commit"""
+    def __init__(self, store):
+        self.store = store
+        self.operations = []
+
+    def set(self, reference, data, merge=False):
+        self.operations.append(lambda: self.store.apply_set(reference.path, data, merge))
+
+    def delete(self, reference):
+        self.operations.append(lambda: self.store.docs.pop(reference.path, None))
+
+    def commit(self):
+        self.store.counts['writes'] += 1
+        for operation in self.operations:
+            operation()
+        self.operations = []
+
+class CountingTransaction(CountingBatch):
+    """Transaction stand-in: beginning it is a round trip (counted with the reads), committing is one write"""
+    def begin(self):
+        self.store.counts['reads'] += 1
+
+class CountingFirestoreModule:
+    """Stands in for firebase_admin.firestore inside the models (transactions run once, no retries)"""
+    class Query:
+        DESCENDING = 'DESCENDING'
+
+    @staticmethod
+    def transactional(function):
+        def run(transaction, *args, **kwargs):
+            transaction.begin()
+            result = function(transaction, *args, **kwargs)
+            transaction.commit()
+            return result
+        return run
+
+class CountingFirestore:
+    """Just enough of the Firestore client for the model write paths, counting round trips"""
+    def __init__(self):
+        self.docs = {}
+        self.counts = {'reads': 0, 'writes': 0}
+        self.next_id = 0
+
+    def collection(self, name):
+        return CountingCollection(self, (name,))
+
+    def batch(self):
+        return CountingBatch(self)
+
+    def transaction(self):
+        return CountingTransaction(self)
+
+    def apply_set(self, path, data, merge):
+        base = self.docs.get(path, {}) if merge else {}
+        self.docs[path] = {**base, **data}
+
+def install(db):
+    for module in (models.player, models.island, models.inventory):
+        module.db = db
+        module.serialize_timestamp = firestore_models.serialize_timestamp
+    models.inventory.firestore = CountingFirestoreModule
+
+def fill_inventory(item_count):
+    """Setup: give the bench player an inventory that already holds item_count fish"""
+    summary = Inventory.empty_summary('firebase_bench')
+    new_items = []
+    for index in range(item_count):
+        entry = {'name': f"fish_{index % 20}", 'caught_at': index, 'data': {}}
+        Inventory.add_to_summary(summary, 'fish', entry)
+        new_items.append((f"item_{index}", {**entry, 'type': 'fish', 'acquired_at': index}))
+    Inventory.save('firebase_bench', summary, new_items)
+
+def measure(label, func, iterations, setup=None):
+    db = CountingFirestore()
+    install(db)
+    Player.create('firebase_bench')
+    Island.create('island_bench')
+    Inventory.create('firebase_bench')
+    if setup is not None:
+        setup()
+    db.counts = {'reads': 0, 'writes': 0}
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    elapsed = time.perf_counter() - start
+
+    reads = db.counts['reads'] / iterations
+    writes = db.counts['writes'] / iterations
+    print(f"  {label:<44} {reads:5.2f} reads {writes:5.2f} writes"
+          f" {reads + writes:5.2f} round trips/call  ({elapsed / iterations * 1e6:7.1f} us/call local)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Count Firestore reads/writes per model update")
+    parser.add_argument('--iterations', type=int, default=1000, help="Calls per measurement")
+    args = parser.parse_args()
+
+    cases = [
+        ('Player.update', lambda rb: lambda i: Player.update('firebase_bench', {'fishCount': i}, readback=rb)),
+        ('Island.update', lambda rb: lambda i: Island.update('island_bench', {'radius': i}, readback=rb)),
+        ('Inventory.update', lambda rb: lambda i: Inventory.update('firebase_bench', {'created_at': i}, readback=rb)),
+    ]
+    for name, make in cases:
+        print(name)
+        measure("readback=True (previous behaviour)", make(True), args.iterations)
+        measure("readback=False (default)", make(False), args.iterations)
+
+    print("Inventory.add_fish (transaction reading only the summary)")
+    add_fish = lambda i: Inventory.add_fish('firebase_bench', 'cod')
+    measure("new player (no inventory document yet)",
+            lambda i: Inventory.add_fish(f'firebase_new_{i}', 'cod'), args.iterations)
+    measure("empty inventory", add_fish, args.iterations)
+    measure("inventory holding 5000 items", add_fish, args.iterations, setup=lambda: fill_inventory(5000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: JSON vs binary encoding of update_position / player_moved.
+
+Measures the payload size on the wire (including Socket.IO packet framing) and
+the server-side encode/decode cost of both paths.
+
+Usage:
+    python bench_wire_protocol.py [--players 50] [--iterations 2000]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import snapshots
+import wire_protocol
+
+# Socket.IO framing: '42' + JSON array for text events; binary events send a
+# placeholder text packet followed by the attachment as its own frame.
+JSON_EVENT_PREFIX = '42'
+BINARY_EVENT_TEXT = '451-["%s",{"_placeholder":true,"num":0}]'
+
+def make_players(count):
+    """Create fake players with realistic firebase_ document IDs"""
+    players = {}
+    for i in range(count):
+        uid = ''.join(random.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(28))
+        player_id = f"firebase_{uid}"
+        players[player_id] = {
+            'id': player_id,
+            'position': {'x': random.uniform(-3000, 3000), 'y': random.uniform(0, 2), 'z': random.uniform(-3000, 3000)},
+            'rotation': random.uniform(-3.14, 3.14),
+            'mode': 'boat',
+        }
+    return players
+
+def json_update_position(player):
+    """The JSON update_position payload the current client sends"""
+    return {
+        'x': player['position']['x'], 'y': player['position']['y'], 'z': player['position']['z'],
+        'rotation': player['rotation'], 'mode': player['mode'], 'player_id': player['id'],
+    }
+
+def json_player_moved(player):
+    """The JSON player_moved payload the server broadcasts"""
+    return {'id': player['id'], 'position': player['position'],
+            'rotation': player['rotation'], 'mode': player['mode']}
+
+def timed(label, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / iterations * 1e6
+    print(f"  {label:<42} {per_call_us:8.2f} us/call")
+    return per_call_us
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary wire protocol against JSON")
+    parser.add_argument('--players', type=int, default=50, help="Number of moving players per tick")
+    parser.add_argument('--iterations', type=int, default=2000, help="Iterations per timing")
+    args = parser.parse_args()
+
+    random.seed(1)
+    players = make_players(args.players)
+    wire_protocol.init_protocol(players)
+    sample = next(iter(players.values()))
+
+    # --- Inbound update_position ---
+    json_update = json.dumps(['update_position', json_update_position(sample)], separators=(',', ':'))
+    binary_update = wire_protocol.encode_position_update(1, sample['position']['x'], sample['position']['y'],
+                                                         sample['position']['z'], sample['rotation'], sample['mode'])
+    json_update_size = len(JSON_EVENT_PREFIX) + len(json_update)
+    binary_update_size = len(BINARY_EVENT_TEXT % 'update_position') + len(binary_update)
+
+    print("update_position (client -> server)")
+    print(f"  JSON:   {json_update_size:6d} bytes")
+    print(f"  binary: {binary_update_size:6d} bytes ({len(binary_update)} byte frame)"
+          f" -> {100 * (1 - binary_update_size / json_update_size):.1f}% smaller")
+    timed("JSON decode", lambda: json.loads(json_update), args.iterations)
+    timed("binary decode", lambda: wire_protocol.decode_position_update(binary_update, sample['id']), args.iterations)
+
+    # --- Outbound player_moved, one tick's worth for one client ---
+    moves = [json_player_moved(player) for player in players.values()]
+    json_tick_size = sum(len(JSON_EVENT_PREFIX) + len(json.dumps(['player_moved', move], separators=(',', ':')))
+                         for move in moves)
+    binary_frame = wire_protocol.encode_players_moved(moves)
+    binary_tick_size = len(BINARY_EVENT_TEXT % wire_protocol.BINARY_MOVED_EVENT) + len(binary_frame)
+
+    print(f"\nplayer_moved for {len(moves)} players (server -> one client, one tick)")
+    print(f"  JSON:   {json_tick_size:6d} bytes in {len(moves)} packets")
+    print(f"  binary: {binary_tick_size:6d} bytes in 1 packet"
+          f" -> {100 * (1 - binary_tick_size / json_tick_size):.1f}% smaller")
+    print("  (handle announcements are sent once per client and not included)")
+
+    iterations = max(1, args.iterations // 10)
+    timed("JSON encode (all players)",
+          lambda: [json.dumps(['player_moved', move], separators=(',', ':')) for move in moves], iterations)
+    timed("binary encode (all players)", lambda: wire_protocol.encode_players_moved(moves), iterations)
+    timed("binary decode (all players)", lambda: wire_protocol.decode_players_moved(binary_frame), iterations)
+
+    # Sanity check: quantization error stays within half a quantum
+    decoded = wire_protocol.decode_players_moved(binary_frame)
+    max_error = max(abs(d['position']['x'] - m['position']['x']) for d, m in zip(decoded, moves))
+    print(f"\nMax position quantization error: {max_error:.3f} units (step {1 / snapshots.POSITION_SCALE})")
+
+if __name__ == '__main__':
+    main()
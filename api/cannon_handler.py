@@ -9,6 +9,8 @@ import logging
 from flask_socketio import emit
 from simulations import simulate_cannonball, check_collision, calculate_trajectory_points
 import player_handler
+import tick_bundler
+import position_history
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,7 +20,7 @@ CANNON_SPEED = 100  # Units per second
 CANNON_LIFETIME = 1  # Seconds before a cannon projectile expires
 CANNON_DAMAGE = 10  # Damage inflicted by a cannon hit
 CANNON_COOLDOWN = 0.5  # Seconds between cannon shots
-CANNON_BLAST_RADIUS = 10  # Units radius for hit detection
+CANNON_BLAST_RADIUS = 6  # Units radius for hit detection (targets are rewound by position_history, so no latency padding)
 
 # Data structure to track active cannon projectiles
 cannons = {}  # Dictionary to store active cannon projectiles
@@ -91,11 +93,11 @@ def handle_cannon_fire(data):
         cannons[cannon_id] = cannon_data
         
         # Broadcast cannon firing to all players
-        emit('cannon_fired', {
+        tick_bundler.queue_event('cannon_fired', {
             'id': player_id,
             'position': cannon_data['position'],
             'direction': cannon_data['direction']
-        }, broadcast=True)
+        })
         
         logger.info(f"Cannon fired by player {player_id}")
         
@@ -165,11 +167,16 @@ def update_cannon_positions():
             del cannons[cannon_id]
 
 def check_cannon_collisions(cannon_id, cannon):
-    """Check if a cannon projectile has collided with any players using simulation utilities"""
+    """
+    Check if a cannon projectile has collided with any players using simulation utilities.
+    Targets are rewound to where the shooter saw them (lag compensation).
+    """
     owner_id = cannon['owner']
     cannon_position = cannon['position']
+    current_time = time.time()
+    rewind = position_history.rewind_for(owner_id)
     
-    for player_id, player in players.items():
+    for player_id, player in players.active_items():
         # Skip checking collision with the cannon owner
         if player_id == owner_id:
             continue
@@ -178,11 +185,8 @@ def check_cannon_collisions(cannon_id, cannon):
         if not player.get('active', False):
             continue
             
-        player_position = player.get('position', {'x': 0, 'y': 0, 'z': 0})
+        player_position = position_history.rewound_position(player_id, player, rewind, current_time)
 
-        # Calculate distance between cannon and player
-        distance = calculate_distance(cannon_position, player_position)
-        
         # Use the simulation utility to check for collision
         if check_collision(cannon_position, player_position, CANNON_BLAST_RADIUS):
             # Handle collision
@@ -198,7 +202,7 @@ def check_cannon_collisions(cannon_id, cannon):
 def handle_cannon_collision(cannon, hit_player_id):
     """Handle a collision between a cannon projectile and a player with enhanced notifications"""
     # Notify all clients about the hit for visual effects
-    socketio.emit('server_cannon_hit', {
+    tick_bundler.queue_event('server_cannon_hit', {
         'shooter_id': cannon['owner'],
         'hit_player_id': hit_player_id,
         'damage': CANNON_DAMAGE,
@@ -0,0 +1,182 @@
+"""
+Chat Log Module
+Keeps the most recent chat messages of each channel (message_type) in a
+bounded in-memory ring buffer, so chat history is served without touching
+Firestore, and persists new messages from a background thread in batched
+writes. At startup each channel is warmed from one bounded query.
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from models.message import Message, MAX_BATCH_WRITES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+HISTORY_SIZE = 100          # Messages kept in memory per channel
+WARM_CHANNELS = ('global',) # Channels loaded at startup; others are loaded on first use
+FLUSH_INTERVAL = 2.0        # Seconds between batched writes of new messages
+FLUSH_THRESHOLD = 100       # Pending messages that trigger an early write
+MAX_PENDING = 5000          # Oldest unwritten messages are dropped beyond this (Firestore unreachable)
+RETRY_DELAY = 5.0           # Seconds to wait after a failed write before trying again
+
+# --- Module-level Data Structures ---
+channels = {}   # {message_type: deque of client-shaped messages, oldest first}
+pending = []    # Stored-shape messages (see Message.create_many) not yet written
+stats = {
+    'appended': 0,
+    'written': 0,
+    'batches': 0,
+    'failures': 0,
+    'dropped': 0,    # Messages never persisted because the pending queue overflowed
+}
+_lock = threading.Lock()
+_wake = threading.Event()
+
+# --- Module-level References ---
+_thread = None
+_players = None  # Player cache used to resolve senders of messages loaded from Firestore
+
+def init_chat_log(players):
+    """Warm the startup channels and start the background writer (Firestore models must be initialized)"""
+    global _thread, _players
+    if _thread is not None:
+        logger.warning("Chat log already initialized.")
+        return
+
+    _players = players
+    for message_type in WARM_CHANNELS:
+        _channel(message_type)
+
+    _thread = threading.Thread(target=_flush_loop, name='chat-log', daemon=True)
+    _thread.start()
+    atexit.register(_final_flush)
+    logger.info(f"Chat log initialized ({HISTORY_SIZE} messages per channel, write every {FLUSH_INTERVAL}s)")
+
+def _to_client(message):
+    """Shape a stored message like a live new_message event"""
+    try:
+        timestamp = datetime.fromtimestamp(float(message.get('timestamp'))).isoformat()
+    except (TypeError, ValueError):
+        timestamp = message.get('timestamp')
+    return {
+        'content': message.get('content', ''),
+        'player_id': message.get('sender_id'),
+        'sender_name': message.get('sender_name'),
+        'sender_color': message.get('sender_color'),
+        'timestamp': timestamp,
+        'message_type': message.get('message_type', 'global'),
+    }
+
+def _channel(message_type):
+    """Return a channel's buffer, loading it with one bounded query the first time"""
+    buffer = channels.get(message_type)
+    if buffer is not None:
+        return buffer
+
+    try:
+        recent = Message.get_recent_messages(limit=HISTORY_SIZE, message_type=message_type, players=_players)
+    except Exception as e:
+        logger.error(f"Failed to load chat history for '{message_type}': {e}")
+        recent = []
+    buffer = channels.setdefault(message_type, deque((_to_client(m) for m in recent), maxlen=HISTORY_SIZE))
+    return buffer
+
+def append(message, sender_color=None, message_type='global'):
+    """
+    Add a message to its channel's history and queue it for persistence.
+
+    Args:
+        message (dict): The new_message payload ({content, player_id, sender_name, timestamp}).
+        sender_color (dict): Sender's color, stored with the message.
+        message_type (str): Channel the message belongs to.
+
+    Returns:
+        dict: The message as kept in history (the payload plus sender_color and message_type).
+    """
+    entry = {**message, 'sender_color': sender_color, 'message_type': message_type}
+    _channel(message_type).append(entry)
+
+    with _lock:
+        pending.append({
+            'sender_id': message.get('player_id'),
+            'content': message.get('content', ''),
+            'timestamp': time.time(),
+            'message_type': message_type,
+            'sender_name': message.get('sender_name'),
+            'sender_color': sender_color,
+        })
+        overflow = len(pending) - MAX_PENDING
+        if overflow > 0:
+            del pending[:overflow]
+            stats['dropped'] += overflow
+        size = len(pending)
+    stats['appended'] += 1
+
+    if size >= FLUSH_THRESHOLD:
+        _wake.set()
+    return entry
+
+def recent(message_type='global', limit=HISTORY_SIZE):
+    """The newest `limit` messages of a channel (at most HISTORY_SIZE), oldest first"""
+    buffer = _channel(message_type)
+    limit = max(0, min(limit, len(buffer)))
+    return list(buffer)[len(buffer) - limit:]
+
+def flush():
+    """
+    Write every pending message.
+
+    Returns:
+    - Number of messages written
+    """
+    written = 0
+    while True:
+        # One WriteBatch per round, so a failure never leaves a batch half written
+        with _lock:
+            batch = pending[:MAX_BATCH_WRITES]
+            del pending[:MAX_BATCH_WRITES]
+        if not batch:
+            return written
+
+        try:
+            Message.create_many(batch)
+        except Exception:
+            stats['failures'] += 1
+            with _lock:
+                # Put them back in front of anything appended meanwhile
+                pending[:0] = batch
+            raise
+
+        stats['written'] += len(batch)
+        stats['batches'] += 1
+        written += len(batch)
+
+def _flush_loop():
+    logger.info("Starting chat log writer.")
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Chat log write failed, will retry: {e}")
+            time.sleep(RETRY_DELAY)
+
+def _final_flush():
+    """Write whatever is still pending when the process exits"""
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Chat log final write failed: {e}")
+
+def metrics():
+    """Return buffer and write metrics"""
+    with _lock:
+        size = len(pending)
+    return {**stats, 'pending': size, 'channels': {name: len(buffer) for name, buffer in channels.items()}}
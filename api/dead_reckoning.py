@@ -0,0 +1,137 @@
+"""
+Dead Reckoning Module
+Predicts where every ship is between position updates from its last reported
+position, its heading (the rotation field) and a speed estimated from recent
+samples. Clients that share the same model only need to send update_position
+when their real position drifts more than ERROR_THRESHOLD from the prediction.
+The server moves ships along the prediction every tick, so collision checks and
+area-of-interest queries see extrapolated positions between updates. A ship that
+stops reporting is parked after MAX_EXTRAPOLATION seconds, and its speed drops to
+zero after SPEED_TIMEOUT.
+"""
+
+import math
+import time
+import logging
+import tick_bundler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+ERROR_THRESHOLD = 2.0       # World units of drift from the prediction before a client must send an update
+MAX_EXTRAPOLATION = 1.0     # Seconds past the last update that a ship keeps moving on its prediction
+HEARTBEAT_INTERVAL = 1.0    # Clients send at least one update this often, even on the prediction
+SPEED_SMOOTHING = 0.5       # Weight of a new speed sample when the client does not report its speed
+MAX_SPEED = 200.0           # Estimated speeds are clamped to this many units per second
+MIN_SAMPLE_INTERVAL = 0.02  # Samples closer together than this are too noisy to estimate speed from
+SPEED_TIMEOUT = 2 * HEARTBEAT_INTERVAL  # Seconds without a report after which a ship is treated as stopped
+
+# --- Module-level Data Structures ---
+# {player_id: {'t', 'x', 'y', 'z', 'rotation', 'speed'}} the last reported state of each locally owned ship
+models = {}
+
+# --- Module-level References ---
+players = None             # Reference to the main player dictionary from app.py
+extrapolate_callback = None  # fn(player_id, position) called when a ship is moved along its prediction
+
+def init_dead_reckoning(players_reference, callback=None):
+    """Initialize the dead reckoning module and register its per-tick extrapolation"""
+    global players, extrapolate_callback
+    players = players_reference
+    extrapolate_callback = callback
+    tick_bundler.register_tick_hook(advance)
+    logger.info(f"Dead reckoning initialized (threshold {ERROR_THRESHOLD}, max extrapolation {MAX_EXTRAPOLATION}s)")
+
+def client_parameters():
+    """Return the prediction parameters clients must use, sent in connection_response"""
+    return {
+        'error_threshold': ERROR_THRESHOLD,
+        'max_extrapolation': MAX_EXTRAPOLATION,
+        'heartbeat_interval': HEARTBEAT_INTERVAL,
+        'speed_timeout': SPEED_TIMEOUT,
+    }
+
+def heading(rotation):
+    """Unit forward vector (x, z) of a ship with the given rotation"""
+    rotation = rotation or 0.0
+    return math.sin(rotation), math.cos(rotation)
+
+def observe(player_id, position, rotation, timestamp=None, speed=None):
+    """
+    Record a reported position and update the ship's model.
+    When the client does not report its speed, it is estimated from the distance
+    travelled along the heading since the previous report.
+
+    Returns:
+    - The ship's speed in units per second
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    previous = models.get(player_id)
+
+    if speed is None:
+        speed = 0.0
+        if previous is not None:
+            dt = timestamp - previous['t']
+            # After a silence the old speed says nothing about the current one
+            speed = previous['speed'] if dt <= SPEED_TIMEOUT else 0.0
+            if dt >= MIN_SAMPLE_INTERVAL:
+                hx, hz = heading(rotation if rotation is not None else previous['rotation'])
+                sample = ((position['x'] - previous['x']) * hx + (position['z'] - previous['z']) * hz) / dt
+                speed = speed + SPEED_SMOOTHING * (sample - speed)
+    speed = max(-MAX_SPEED, min(MAX_SPEED, speed))
+
+    models[player_id] = {
+        't': timestamp,
+        'x': position['x'],
+        'y': position.get('y') or 0.0,
+        'z': position['z'],
+        'rotation': rotation if rotation is not None else (previous['rotation'] if previous else 0.0),
+        'speed': speed,
+    }
+    return speed
+
+def predict(player_id, timestamp):
+    """
+    Return the predicted {'x', 'y', 'z'} of a ship at a time, or None if it has no model.
+    Prediction stops MAX_EXTRAPOLATION seconds after the last report.
+    """
+    model = models.get(player_id)
+    if model is None:
+        return None
+    elapsed = min(max(timestamp - model['t'], 0.0), MAX_EXTRAPOLATION)
+    hx, hz = heading(model['rotation'])
+    distance = model['speed'] * elapsed
+    return {'x': model['x'] + hx * distance, 'y': model['y'], 'z': model['z'] + hz * distance}
+
+def advance(tick):
+    """
+    Tick hook: move every ship that did not report this tick along its prediction.
+    The predicted position is written to the players cache so everything reading it
+    (interest grid, snapshots, collisions) sees where the ship is expected to be.
+    Ships silent for SPEED_TIMEOUT are stopped where their prediction ended.
+    """
+    now = time.time()
+    for player_id, model in list(models.items()):
+        player = players.get(player_id)
+        if player is None or not player.get('active', False):
+            continue
+        if model['speed'] == 0 or now - model['t'] < MIN_SAMPLE_INTERVAL:
+            continue  # Stationary, or reported this tick
+
+        position = predict(player_id, now)
+        if now - model['t'] > SPEED_TIMEOUT:
+            # Stop the ship at the end of its prediction; the next report starts from rest
+            model.update(t=now, x=position['x'], z=position['z'], speed=0.0)
+        if position == player.get('position'):
+            continue  # Parked at the end of its prediction
+        player['position'] = position
+        if extrapolate_callback is not None:
+            try:
+                extrapolate_callback(player_id, position)
+            except Exception as e:
+                logger.error(f"Error in dead reckoning callback for {player_id}: {e}")
+
+def forget_player(player_id):
+    """Drop the model of a player that left"""
+    models.pop(player_id, None)
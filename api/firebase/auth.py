@@ -1,12 +1,34 @@
+import time
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from firebase_admin import auth as firebase_auth
 
+try:
+    # Runs blocking calls in eventlet's OS thread pool while the hub keeps serving other sockets
+    from eventlet import tpool
+except ImportError:
+    tpool = None
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# --- Constants ---
+MAX_CACHED_TOKENS = 10000  # Decoded tokens kept (least recently used are dropped beyond this)
+
 # This will be set during initialization
 firebase_app = None
 
+# {sha256(token): (uid, exp)} verified tokens, least recently used first
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+token_stats = {
+    'hits': 0,
+    'verifications': 0,   # Cold verifications (signature checked)
+    'failures': 0,
+}
+
 def init_auth(firebase_application):
     """Initialize the auth module with a Firebase application instance"""
     global firebase_app
@@ -16,27 +38,74 @@ def init_auth(firebase_application):
 # Socket to user mapping (moved from app.py)
 socket_to_user_map = {}
 
+def _cached_uid(token_hash):
+    """Return the UID of an already verified, unexpired token, or None"""
+    with _token_cache_lock:
+        cached = _token_cache.get(token_hash)
+        if cached is None:
+            return None
+        uid, exp = cached
+        if exp <= time.time():
+            del _token_cache[token_hash]
+            return None
+        _token_cache.move_to_end(token_hash)
+        return uid
+
+def _cache_token(token_hash, uid, exp):
+    with _token_cache_lock:
+        _token_cache[token_hash] = (uid, exp)
+        _token_cache.move_to_end(token_hash)
+        while len(_token_cache) > MAX_CACHED_TOKENS:
+            _token_cache.popitem(last=False)
+
+def _verify_id_token(token):
+    # Passing the app reuses its token verifier, whose HTTP session caches
+    # Google's public keys for as long as their Cache-Control allows
+    return firebase_auth.verify_id_token(token, app=firebase_app)
+
 def verify_firebase_token(token):
-    """Verify Firebase token and return the UID if valid"""
+    """
+    Verify Firebase token and return the UID if valid.
+    Verified tokens are cached by their hash until they expire. A cold verification
+    runs in eventlet's thread pool, so it does not block other sockets.
+    """
     try:
         if not token:
             logger.warning("No token provided for verification")
             return None
-            
+
+        token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        uid = _cached_uid(token_hash)
+        if uid is not None:
+            token_stats['hits'] += 1
+            return uid
+
         logger.info("Attempting to verify Firebase token")
         
         # Verify the token
-        decoded_token = firebase_auth.verify_id_token(token)
+        token_stats['verifications'] += 1
+        if tpool is not None:
+            decoded_token = tpool.execute(_verify_id_token, token)
+        else:
+            decoded_token = _verify_id_token(token)
         
         # Get user UID from the token
         uid = decoded_token['uid']
+        _cache_token(token_hash, uid, decoded_token['exp'])
         logger.info(f"Successfully verified Firebase token for user: {uid}")
         return uid
     except Exception as e:
        # logger.error(f"Error verifying Firebase token: {e}")
+        token_stats['failures'] += 1
         logger.exception("Token verification exception details:")  # This logs the full stack trace
         return None
 
+def token_metrics():
+    """Return token cache and verification metrics"""
+    with _token_cache_lock:
+        cached = len(_token_cache)
+    return {**token_stats, 'cached': cached}
+
 
 def register_socket_user(socket_id, user_id):
     """Associate a socket ID with a user ID"""
@@ -72,7 +72,7 @@ def create_player(player_id, **data):
 
 def update_player(player_id, **updates):
     """Update a player's fields"""
-    return Player.update(player_id, **updates)
+    return Player.update(player_id, updates)
 
 def delete_player(player_id):
     """Delete a player"""
@@ -101,7 +101,7 @@ def create_island(island_id, **data):
 
 def update_island(island_id, **updates):
     """Update an island's fields"""
-    return Island.update(island_id, **updates)
+    return Island.update(island_id, updates)
 
 def delete_island(island_id):
     """Delete an island"""
@@ -116,9 +116,9 @@ def get_recent_messages(limit=50, message_type='global'):
     """Get recent messages of a specific type"""
     return Message.get_recent_messages(limit, message_type)
 
-def create_message(sender_id, content, message_type='global'):
-    """Create a new message"""
-    return Message.create(sender_id, content, message_type)
+def create_message(sender_id, content, message_type='global', sender_name=None, sender_color=None):
+    """Create a new message (the sender's name and color are stored with it)"""
+    return Message.create(sender_id, content, message_type, sender_name, sender_color)
 
 # ======= Inventory getters =======
 def get_inventory(player_id):
@@ -131,7 +131,7 @@ def create_inventory(player_id):
 
 def update_inventory(player_id, **updates):
     """Update a player's inventory"""
-    return Inventory.update(player_id, **updates)
+    return Inventory.update(player_id, updates)
 
 def add_fish_to_inventory(player_id, fish_name, fish_data=None):
     """Add a fish to a player's inventory"""
@@ -145,9 +145,13 @@ def add_cargo_to_inventory(player_id, cargo_name, cargo_data=None):
     """Add cargo to a player's inventory"""
     return Inventory.add_cargo(player_id, cargo_name, cargo_data)
 
-def remove_inventory_item(player_id, item_type, item_index):
+def list_inventory_items(player_id, item_type=None, limit=50, cursor=None):
+    """Get one page of a player's inventory items, newest first"""
+    return Inventory.list_items(player_id, item_type, limit, cursor)
+
+def remove_inventory_item(player_id, item_id):
     """Remove an item from a player's inventory"""
-    return Inventory.remove_item(player_id, item_type, item_index)
+    return Inventory.remove_item(player_id, item_id)
 
 def get_all_player_inventories():
     """Get all player inventories"""
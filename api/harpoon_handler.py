@@ -9,11 +9,13 @@ import math
 import logging
 from flask_socketio import emit
 import player_handler
+import position_history
 # import projectile_manager # <-- Import the projectile manager
 
-# Assuming a simulations module exists with calculate_distance
+# Configure logging
+logger = logging.getLogger(__name__)
 
-'''
+# Assuming a simulations module exists with calculate_distance
 try:
     from simulations import calculate_distance
 except ImportError:
@@ -43,9 +45,6 @@ except ImportError:
                 'z': initial_position['z'] + initial_velocity['z'] * time_elapsed
             }
     logger.warning("Simulations module not found, using basic implementations.")
-'''
-# Configure logging
-logger = logging.getLogger(__name__)
 
 # --- Harpoon Configuration Constants ---
 HARPOON_SPEED = 80      # Units per second (adjust as needed)
@@ -177,12 +176,15 @@ def _harpoon_collision_check_callback(harpoon_id, harpoon_data):
     Callback function provided to the ProjectileManager.
     Checks a specific harpoon projectile for collisions against active players.
     Returns True if a collision occurred (signaling manager to remove projectile), False otherwise.
+    Targets are rewound to where the shooter saw them (lag compensation).
     """
     harpoon_pos = harpoon_data['position']
     owner_id = harpoon_data['owner']
+    current_time = time.time()
+    rewind = position_history.rewind_for(owner_id)
 
-    # Iterate through a copy of player items for safety
-    current_players = list(players.items())
+    # Only active players can be hit (active_items returns a copy, safe to iterate)
+    current_players = players.active_items()
 
     for player_id, player_data in current_players:
         # --- Skip Self-Hit ---
@@ -197,7 +199,7 @@ def _harpoon_collision_check_callback(harpoon_id, harpoon_data):
         # if player_data.get('health', 0) <= 0:
         #     continue
 
-        player_pos = player_data['position']
+        player_pos = position_history.rewound_position(player_id, player_data, rewind, current_time)
 
         # --- Calculate Distance & Check Collision ---
         distance = calculate_distance(harpoon_pos, player_pos)
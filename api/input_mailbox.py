@@ -0,0 +1,66 @@
+"""
+Input Mailbox Module
+Latest-wins inbox for incoming update_position packets. Each player has at most
+one pending update; newer packets overwrite it and stale or out-of-order packets
+(by sequence number) are dropped. The tick loop drains the mailbox once per tick.
+"""
+
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+SEQ_MODULUS = 2**32  # Sequence numbers wrap like the binary protocol's uint32
+
+# --- Module-level Data Structures ---
+pending = {}    # {player_id: data} newest unprocessed update per player
+last_seq = {}   # {player_id: seq} highest sequence number accepted per player
+stats = {
+    'received': 0,   # Packets submitted
+    'coalesced': 0,  # Packets overwritten by a newer one before being processed
+    'stale': 0,      # Packets dropped because their sequence number was not newer
+    'processed': 0,  # Updates handed to the tick loop
+}
+
+def is_newer(seq, previous):
+    """Return True if seq comes after previous, allowing for 32-bit wrap-around"""
+    delta = (seq - previous) % SEQ_MODULUS
+    return 0 < delta < SEQ_MODULUS // 2
+
+def submit(player_id, data):
+    """
+    Store a position update as the player's pending update.
+    Updates without a 'seq' field are always accepted in arrival order.
+
+    Returns:
+    - True if the update was kept, False if it was stale
+    """
+    stats['received'] += 1
+
+    seq = data.get('seq')
+    if isinstance(seq, int):
+        previous = last_seq.get(player_id)
+        if previous is not None and not is_newer(seq, previous):
+            stats['stale'] += 1
+            return False
+        last_seq[player_id] = seq
+
+    if player_id in pending:
+        stats['coalesced'] += 1
+    pending[player_id] = data
+    return True
+
+def drain():
+    """Return and clear every pending update as a list of (player_id, data)"""
+    if not pending:
+        return []
+    items = list(pending.items())
+    pending.clear()
+    stats['processed'] += len(items)
+    return items
+
+def forget_player(player_id):
+    """Drop any pending update and sequence state of a player that left"""
+    pending.pop(player_id, None)
+    last_seq.pop(player_id, None)
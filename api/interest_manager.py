@@ -0,0 +1,188 @@
+"""
+Interest Manager Module
+Splits the world into a grid of cells and keeps every connected socket
+subscribed to the Socket.IO rooms of the cells around its ship, so that
+movement updates only reach players that are close enough to care.
+"""
+
+import math
+import logging
+import tick_bundler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+CELL_SIZE = 500          # World units per grid cell (x/z plane)
+VIEW_RADIUS_CELLS = 1    # Cells around a player's own cell that they can see (1 -> 3x3 block)
+NAMESPACE = '/'
+
+# --- Module-level Data Structures ---
+player_cells = {}   # {player_id: (cx, cz)} cell each tracked player is currently in
+cell_players = {}   # {(cx, cz): set(player_id)} reverse index of player_cells
+player_sids = {}    # {player_id: sid} socket currently controlling each tracked player
+
+# --- Module-level References ---
+socketio = None
+players = None  # Reference to the main player dictionary from app.py
+
+def init_manager(socketio_instance, players_reference):
+    """Initialize the interest manager with Socket.IO instance and players reference"""
+    global socketio, players
+    socketio = socketio_instance
+    players = players_reference
+    logger.info("Interest manager initialized")
+
+def cell_for_position(position):
+    """Return the (cx, cz) grid cell containing a {x, y, z} position"""
+    if not position:
+        return (0, 0)
+    return (int(math.floor(position.get('x', 0) / CELL_SIZE)),
+            int(math.floor(position.get('z', 0) / CELL_SIZE)))
+
+def cell_room(cell):
+    """Return the Socket.IO room name for a grid cell"""
+    return f"cell:{cell[0]}:{cell[1]}"
+
+def neighbour_cells(cell):
+    """Return the set of cells visible from a cell (including the cell itself)"""
+    cx, cz = cell
+    r = VIEW_RADIUS_CELLS
+    return {(cx + dx, cz + dz) for dx in range(-r, r + 1) for dz in range(-r, r + 1)}
+
+def get_player_cell(player_id):
+    """Return the cell a tracked player is in, or None if untracked"""
+    return player_cells.get(player_id)
+
+def get_player_sid(player_id):
+    """Return the socket ID controlling a tracked player, or None"""
+    return player_sids.get(player_id)
+
+def players_in_cells(cells):
+    """Return the IDs of all tracked players located in any of the given cells"""
+    found = set()
+    for cell in cells:
+        found |= cell_players.get(cell, set())
+    return found
+
+def visible_players(player_id):
+    """Return the IDs of the tracked players that a player can currently see (excluding themself)"""
+    cell = player_cells.get(player_id)
+    if cell is None:
+        return set()
+    return players_in_cells(neighbour_cells(cell)) - {player_id}
+
+def observer_sids(player_id):
+    """
+    Return the socket IDs of every other player that can see this player.
+    Because visibility is symmetric this is the same set of players as visible_players().
+    """
+    return {player_sids[pid] for pid in visible_players(player_id) if pid in player_sids}
+
+def _enter_rooms(sid, cells):
+    for cell in cells:
+        socketio.server.enter_room(sid, cell_room(cell), namespace=NAMESPACE)
+
+def _leave_rooms(sid, cells):
+    for cell in cells:
+        socketio.server.leave_room(sid, cell_room(cell), namespace=NAMESPACE)
+
+def _index_player(player_id, cell):
+    player_cells[player_id] = cell
+    cell_players.setdefault(cell, set()).add(player_id)
+
+def _unindex_player(player_id):
+    cell = player_cells.pop(player_id, None)
+    if cell is not None:
+        members = cell_players.get(cell)
+        if members is not None:
+            members.discard(player_id)
+            if not members:
+                del cell_players[cell]
+    return cell
+
+def add_player(player_id, sid, position):
+    """
+    Start tracking a player that has just joined.
+    Subscribes the socket to the rooms of every cell around the player. Players
+    connected to another worker are tracked with sid=None so local players can see them.
+    """
+    if player_id in player_cells:
+        remove_player(player_id)
+
+    cell = cell_for_position(position)
+    _index_player(player_id, cell)
+    if sid is not None:
+        player_sids[player_id] = sid
+        _enter_rooms(sid, neighbour_cells(cell))
+    logger.debug(f"Player {player_id} entered interest grid at cell {cell}")
+
+def remove_player(player_id):
+    """Stop tracking a player (disconnect). Leaves every cell room the socket was in."""
+    sid = player_sids.pop(player_id, None)
+    cell = _unindex_player(player_id)
+    if sid is not None and cell is not None:
+        try:
+            _leave_rooms(sid, neighbour_cells(cell))
+        except Exception as e:
+            # The socket may already be gone from the server on disconnect
+            logger.debug(f"Could not leave cell rooms for {player_id}: {e}")
+
+def update_player_position(player_id, position):
+    """
+    Re-evaluate a player's cell after a position update.
+    When the player crosses a cell boundary their room membership is updated and
+    spawn/despawn events are sent both to the player and to the players that
+    gained or lost sight of them.
+
+    Returns:
+    - The player's current cell, or None if the player is not tracked
+    """
+    old_cell = player_cells.get(player_id)
+    if old_cell is None:
+        return None
+
+    new_cell = cell_for_position(position)
+    if new_cell == old_cell:
+        return new_cell
+
+    sid = player_sids.get(player_id)
+    old_view = neighbour_cells(old_cell)
+    new_view = neighbour_cells(new_cell)
+    entered = new_view - old_view
+    left = old_view - new_view
+
+    _unindex_player(player_id)
+    _index_player(player_id, new_cell)
+
+    if sid is not None:
+        _leave_rooms(sid, left)
+        _enter_rooms(sid, entered)
+
+    # Visibility is symmetric: the players in newly visible cells are exactly
+    # the players that can now see the mover, and vice versa for lost cells.
+    appeared = players_in_cells(entered) - {player_id}
+    vanished = players_in_cells(left) - {player_id}
+
+    # Keyed per (observer, subject) so an enter and leave within one tick collapse to the latest
+    for other_id in appeared:
+        other_sid = player_sids.get(other_id)
+        if other_sid and player_id in players:
+            tick_bundler.queue_event('player_entered_view', players[player_id],
+                                     to=other_sid, key=('view', player_id))
+        if sid and other_id in players:
+            tick_bundler.queue_event('player_entered_view', players[other_id],
+                                     to=sid, key=('view', other_id))
+
+    for other_id in vanished:
+        other_sid = player_sids.get(other_id)
+        if other_sid:
+            tick_bundler.queue_event('player_left_view', {'id': player_id},
+                                     to=other_sid, key=('view', player_id))
+        if sid:
+            tick_bundler.queue_event('player_left_view', {'id': other_id},
+                                     to=sid, key=('view', other_id))
+
+    logger.debug(f"Player {player_id} moved from cell {old_cell} to {new_cell} "
+                 f"({len(appeared)} spawned, {len(vanished)} despawned)")
+    return new_cell
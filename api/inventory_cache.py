@@ -0,0 +1,276 @@
+"""
+Inventory Cache Module
+Keeps the inventories of online players in memory so inventory requests and
+item pickups never wait on Firestore. An inventory is loaded once when its
+player joins; new items are added to the in-memory summary and marked dirty,
+and a background thread writes dirty inventories every FLUSH_INTERVAL seconds
+and as soon as their player disconnects.
+Inventories of offline players stay cached (for quick reconnects and REST
+reads) until more than MAX_OFFLINE_INVENTORIES are held, then the least
+recently used clean ones are evicted.
+Each new item is recorded in the local journal before it is added, and
+confirmed there once written, so a crash before the flush loses nothing.
+"""
+
+import os
+import copy
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from models.inventory import Inventory, TIMESTAMP_KEYS
+import journal
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+FLUSH_INTERVAL = float(os.environ.get('INVENTORY_FLUSH_INTERVAL', 5.0))  # Seconds between flushes of dirty inventories
+MAX_OFFLINE_INVENTORIES = 500   # Clean inventories of offline players kept for reconnects
+RETRY_DELAY = 5.0               # Seconds to wait after a failed flush before trying again
+
+# --- Module-level Data Structures ---
+# {player_id: entry} least recently used first. Each entry holds:
+#   'summary': the stored inventory summary (see Inventory.load), updated in memory
+#   'new_items': [(item_id, item)] added since the last flush
+#   'journal_seqs': journal sequence numbers of the new items
+#   'dirty': True if the summary has changes not yet written
+#   'online': True while the player is connected
+#   'flush_lock': held while the entry's changes are being written
+inventories = OrderedDict()
+stats = {
+    'hits': 0,
+    'loads': 0,
+    'flushes': 0,            # Inventories written
+    'items_written': 0,
+    'failures': 0,
+    'evictions': 0,
+}
+_lock = threading.RLock()
+_wake = threading.Event()
+
+# --- Module-level References ---
+_thread = None
+
+def init_inventory_cache():
+    """Start the flusher thread (Firestore models must be initialized first)"""
+    global _thread
+    if _thread is not None:
+        logger.warning("Inventory cache flusher already running.")
+        return
+
+    _thread = threading.Thread(target=_flush_loop, name='inventory-cache', daemon=True)
+    _thread.start()
+    atexit.register(_final_flush)
+    logger.info(f"Inventory cache initialized (flush every {FLUSH_INTERVAL}s)")
+
+def _entry(player_id):
+    """Return the cached entry for a player, loading it from Firestore on a miss"""
+    with _lock:
+        entry = inventories.get(player_id)
+        if entry is not None:
+            inventories.move_to_end(player_id)
+            stats['hits'] += 1
+            return entry
+
+    summary = Inventory.load(player_id) or {**Inventory.empty_summary(player_id), 'id': player_id}
+
+    with _lock:
+        # Another request may have loaded it meanwhile; keep the first copy
+        entry = inventories.get(player_id)
+        if entry is None:
+            entry = {'summary': summary, 'new_items': [], 'journal_seqs': [], 'dirty': False, 'online': False,
+                     'flush_lock': threading.Lock()}
+            inventories[player_id] = entry
+            stats['loads'] += 1
+        inventories.move_to_end(player_id)
+        _evict()
+        return entry
+
+def player_joined(player_id):
+    """Load a player's inventory (if not cached) and keep it while they are online"""
+    entry = _entry(player_id)
+    with _lock:
+        entry['online'] = True
+
+def player_left(player_id):
+    """Mark a player offline and flush their inventory soon"""
+    with _lock:
+        entry = inventories.get(player_id)
+        if entry is None:
+            return
+        entry['online'] = False
+        dirty = entry['dirty']
+    if dirty:
+        _wake.set()
+
+def get(player_id):
+    """Get a player's inventory summary, shaped for clients"""
+    entry = _entry(player_id)
+    with _lock:
+        return Inventory.to_client(entry['summary'])
+
+def add_item(player_id, item_type, name, data=None):
+    """
+    Add an item in memory and mark the inventory dirty.
+    Returns the same shape as Inventory.add_fish/add_treasure.
+    """
+    entry = _entry(player_id)
+    now = time.time()
+    item = {
+        'name': name,
+        TIMESTAMP_KEYS[item_type]: now,
+        'data': data or {}
+    }
+    item_id = Inventory.new_item_id(player_id)
+    seq = journal.record('item', player_id=player_id, item_type=item_type, item_id=item_id, item=item, now=now)
+    counts = _apply_item(entry, item_type, item_id, item, now, seq)
+
+    return {'id': player_id, 'item_type': item_type, 'item': {**item, 'id': item_id},
+            'counts': counts, 'updated_at': now}
+
+def _apply_item(entry, item_type, item_id, item, now, seq):
+    """Fold a new item into a cached inventory and mark it dirty. Returns the new counts."""
+    with _lock:
+        summary = entry['summary']
+        summary.setdefault('created_at', now)
+        Inventory.add_to_summary(summary, item_type, item)
+        summary['updated_at'] = now
+        entry['new_items'].append((item_id, {**item, 'type': item_type, 'acquired_at': now}))
+        if seq is not None:
+            entry['journal_seqs'].append(seq)
+        entry['dirty'] = True
+        return dict(summary['counts'])
+
+def replay(records):
+    """
+    Re-add the journaled items a previous run did not confirm (see journal.init_journal).
+    Items whose document already exists were written before the crash and are skipped.
+    """
+    by_player = {}
+    for record in records:
+        if record.get('kind') == 'item':
+            by_player.setdefault(record['player_id'], []).append(record)
+
+    replayed = 0
+    for player_id, items in by_player.items():
+        stored = Inventory.existing_item_ids(player_id, [record['item_id'] for record in items])
+        journal.confirm([record['seq'] for record in items if record['item_id'] in stored])
+        entry = _entry(player_id)
+        for record in items:
+            if record['item_id'] not in stored:
+                _apply_item(entry, record['item_type'], record['item_id'], record['item'], record['now'], record['seq'])
+                replayed += 1
+
+    if replayed:
+        logger.info(f"Replayed {replayed} journaled inventory items")
+        _wake.set()
+    return replayed
+
+def flush_player(player_id):
+    """
+    Write one player's pending changes now (e.g. before paging their items from Firestore).
+    If a flush of the same player is already running, waits for it first, so the caller
+    never reads Firestore while items taken by that flush are still being written.
+
+    Returns:
+    - True if this call wrote anything
+    """
+    with _lock:
+        entry = inventories.get(player_id)
+        if entry is None:
+            return False
+
+    with entry['flush_lock']:
+        return _flush_entry(player_id, entry)
+
+def _flush_entry(player_id, entry):
+    """Write an entry's pending changes (the caller holds its flush_lock)"""
+    with _lock:
+        if not entry['dirty']:
+            return False
+        summary = copy.deepcopy(entry['summary'])
+        new_items = entry['new_items']
+        seqs = entry['journal_seqs']
+        entry['new_items'] = []
+        entry['journal_seqs'] = []
+        entry['dirty'] = False
+
+    try:
+        Inventory.save(player_id, summary, new_items)
+    except Exception:
+        with _lock:
+            # Put the items back in front of anything added meanwhile
+            entry['new_items'] = new_items + entry['new_items']
+            entry['journal_seqs'] = seqs + entry['journal_seqs']
+            entry['dirty'] = True
+        stats['failures'] += 1
+        raise
+
+    journal.confirm(seqs)
+    stats['flushes'] += 1
+    stats['items_written'] += len(new_items)
+    return True
+
+def flush():
+    """
+    Write every dirty inventory.
+
+    Returns:
+    - Number of inventories written
+    """
+    with _lock:
+        # Offline players first, so their entries become evictable
+        pending = sorted((pid for pid, entry in inventories.items() if entry['dirty']),
+                         key=lambda pid: inventories[pid]['online'])
+
+    written = 0
+    for player_id in pending:
+        try:
+            if flush_player(player_id):
+                written += 1
+        except Exception as e:
+            logger.error(f"Failed to flush inventory of {player_id}, will retry: {e}")
+
+    with _lock:
+        _evict()
+    return written
+
+def _evict():
+    """Drop the least recently used clean offline inventories beyond MAX_OFFLINE_INVENTORIES"""
+    offline = [pid for pid, entry in inventories.items() if not entry['online']]
+    excess = len(offline) - MAX_OFFLINE_INVENTORIES
+    for player_id in offline:
+        if excess <= 0:
+            break
+        if not inventories[player_id]['dirty']:
+            del inventories[player_id]
+            stats['evictions'] += 1
+            excess -= 1
+
+def _flush_loop():
+    logger.info("Starting inventory cache flusher.")
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Inventory cache flush failed: {e}")
+            time.sleep(RETRY_DELAY)
+
+def _final_flush():
+    """Write whatever is still pending when the process exits"""
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Inventory cache final flush failed: {e}")
+
+def metrics():
+    """Return cache size, hit and flush metrics"""
+    with _lock:
+        cached = len(inventories)
+        online = sum(1 for entry in inventories.values() if entry['online'])
+        dirty = sum(1 for entry in inventories.values() if entry['dirty'])
+    return {**stats, 'cached': cached, 'online': online, 'dirty': dirty}
@@ -0,0 +1,186 @@
+"""
+Journal Module
+A local append-only write-ahead journal of buffered game-state mutations.
+write_behind and inventory_cache record every mutation here before buffering
+it, and confirm it once it has been persisted. The journal file is fsynced
+once per tick, before that tick's events are sent, so anything a client was
+told about survives a crash even if Firestore was not written yet.
+
+On startup the unconfirmed records are replayed into the write buffers.
+Confirmed records are dropped by periodically rewriting the file with only
+the unconfirmed ones.
+
+File format: one JSON object per line, {"seq": n, "kind": ..., ...}. A torn
+last line (crash mid-append) is ignored on replay.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+JOURNAL_PATH = os.environ.get('JOURNAL_PATH',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mutations.journal'))
+COMPACT_INTERVAL = 30.0    # Seconds between rewrites of the journal without confirmed records
+COMPACT_THRESHOLD = 5000   # Confirmed records that trigger an early rewrite
+
+# --- Module-level Data Structures ---
+unconfirmed = {}  # {seq: serialized record line}, oldest first
+stats = {
+    'recorded': 0,
+    'confirmed': 0,
+    'syncs': 0,
+    'compactions': 0,
+    'replayed': 0,           # Records replayed at startup
+    'last_sync_ms': 0.0,
+    'max_sync_ms': 0.0,
+}
+_lock = threading.Lock()
+
+# --- Module-level References ---
+_path = None
+_file = None
+_next_seq = 1
+_unsynced = False
+_confirmed_since_compaction = 0
+_last_compaction = 0.0
+
+def init_journal(path=JOURNAL_PATH):
+    """
+    Open the journal and return the records left unconfirmed by the previous run,
+    oldest first, for the write buffers to replay.
+
+    Returns:
+        list: [{'seq': n, 'kind': ..., ...}]
+    """
+    global _path, _next_seq
+    if _file is not None:
+        logger.warning("Journal already initialized.")
+        return []
+
+    _path = path
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Ignoring torn journal record in {path}")
+    except FileNotFoundError:
+        pass
+
+    for record in records:
+        unconfirmed[record['seq']] = json.dumps(record, separators=(',', ':'))
+    _next_seq = max(unconfirmed, default=0) + 1
+    stats['replayed'] = len(records)
+
+    # Rewrite without any torn line, so new records are appended after a clean newline
+    compact()
+    atexit.register(_close)
+    logger.info(f"Journal opened at {path} ({len(records)} records to replay)")
+    return records
+
+def _open():
+    global _file
+    _file = open(_path, 'a', encoding='utf-8')
+
+def record(kind, **payload):
+    """
+    Append a mutation to the journal (buffered; made durable by the next sync).
+
+    Returns:
+        int | None: The record's sequence number, to pass to confirm once it is
+        persisted, or None when the journal is not enabled.
+    """
+    global _next_seq, _unsynced
+    if _file is None:
+        return None
+
+    with _lock:
+        seq = _next_seq
+        _next_seq += 1
+        line = json.dumps({'seq': seq, 'kind': kind, **payload}, separators=(',', ':'), default=str)
+        _file.write(line + '\n')
+        unconfirmed[seq] = line
+        _unsynced = True
+    stats['recorded'] += 1
+    return seq
+
+def sync(tick=None):
+    """Tick hook: fsync the records appended since the last sync (one fsync per tick)"""
+    global _unsynced
+    if _file is None or not _unsynced:
+        return
+
+    start = time.perf_counter()
+    with _lock:
+        _file.flush()
+        _unsynced = False
+        os.fsync(_file.fileno())
+    elapsed = (time.perf_counter() - start) * 1000
+    stats['syncs'] += 1
+    stats['last_sync_ms'] = elapsed
+    stats['max_sync_ms'] = max(stats['max_sync_ms'], elapsed)
+
+def confirm(seqs):
+    """Mark records as persisted; they are dropped at the next compaction"""
+    global _confirmed_since_compaction
+    seqs = [seq for seq in seqs if seq is not None]
+    if not seqs:
+        return
+
+    with _lock:
+        for seq in seqs:
+            if unconfirmed.pop(seq, None) is not None:
+                _confirmed_since_compaction += 1
+        stats['confirmed'] += len(seqs)
+        due = (_confirmed_since_compaction >= COMPACT_THRESHOLD or
+               (_confirmed_since_compaction and time.time() - _last_compaction >= COMPACT_INTERVAL))
+    if due:
+        compact()
+
+def compact():
+    """Atomically rewrite the journal with only the unconfirmed records"""
+    global _file, _unsynced, _confirmed_since_compaction, _last_compaction
+    if _path is None:
+        return
+
+    temp_path = f"{_path}.tmp"
+    with _lock:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for line in unconfirmed.values():
+                f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if _file is not None:
+            _file.close()
+        os.replace(temp_path, _path)
+        _open()
+        _unsynced = False
+        _confirmed_since_compaction = 0
+        _last_compaction = time.time()
+    stats['compactions'] += 1
+
+def _close():
+    """Compact and close the journal when the process exits (after the final flushes)"""
+    global _file
+    try:
+        compact()
+        with _lock:
+            _file.close()
+            _file = None
+    except Exception as e:
+        logger.error(f"Failed to close journal: {e}")
+
+def metrics():
+    """Return journal size, sync and compaction metrics"""
+    with _lock:
+        size = len(unconfirmed)
+    return {**stats, 'unconfirmed': size}
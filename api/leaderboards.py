@@ -0,0 +1,202 @@
+"""
+Leaderboards Module
+Keeps an in-memory ranking per leaderboard category, seeded at startup with
+the SEED_SIZE leaders of each category and updated as stats change, so
+leaderboards are served and broadcast without querying Firestore. A player
+outside the seed can only climb by playing, which ranks them here.
+Each category is a list of (-value, player_id) keys kept sorted with bisect,
+which orders ties by player ID like the Firestore order_by query did.
+
+Broadcasts are change driven: only changes that touch the visible top
+DEFAULT_LIMIT entries mark the leaderboard dirty, and a tick hook sends at
+most MAX_BROADCASTS_PER_SECOND updates. Clients that negotiated the
+leaderboard_diff capability get just the entries that changed since the
+previous broadcast; everyone else gets the full leaderboard.
+"""
+
+import time
+import bisect
+import logging
+import numbers
+import tick_bundler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+CATEGORIES = ('fishCount', 'monsterKills', 'money')
+DEFAULT_LIMIT = 10
+SEED_SIZE = 100  # Players per category loaded at startup (the visible top plus slack for drops)
+MAX_BROADCASTS_PER_SECOND = 2
+BROADCAST_INTERVAL = 1.0 / MAX_BROADCASTS_PER_SECOND
+
+# --- Module-level Data Structures ---
+rankings = {category: [] for category in CATEGORIES}  # {category: sorted [(-value, player_id)]}
+values = {category: {} for category in CATEGORIES}    # {category: {player_id: value}}
+profiles = {}  # {player_id: {'name': ..., 'color': ...}} shown next to the value
+broadcast_state = {
+    'sent': None,          # The leaderboard as of the last broadcast (what clients hold)
+    'version': 0,          # Incremented with every broadcast
+    'dirty': False,        # A visible entry changed since the last broadcast
+    'last_sent_at': 0.0,
+}
+stats = {
+    'broadcasts': 0,
+    'skipped': 0,  # Dirty flushes whose visible entries turned out unchanged
+}
+
+def init_leaderboards(players):
+    """
+    Build the rankings from {player_id: player} (the startup seed).
+    Register broadcast as a tick hook to send changes.
+    """
+    for category in CATEGORIES:
+        rankings[category].clear()
+        values[category].clear()
+    profiles.clear()
+
+    for player_id, player in players.items():
+        _set_profile(player_id, player)
+        for category in CATEGORIES:
+            value = player.get(category)
+            if _is_rankable(value):
+                values[category][player_id] = value
+                rankings[category].append((-value, player_id))
+
+    for category in CATEGORIES:
+        rankings[category].sort()
+    broadcast_state['sent'] = combined()
+    broadcast_state['dirty'] = False
+    logger.info(f"Leaderboards initialized from {len(players)} players")
+
+def _is_rankable(value):
+    # Players without a numeric stat are left out, as Firestore's order_by skips missing fields
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+def _set_profile(player_id, player):
+    """Update the name/color shown for a player. Returns True if either changed."""
+    profile = {'name': player.get('name'), 'color': player.get('color')}
+    if profiles.get(player_id) == profile:
+        return False
+    profiles[player_id] = profile
+    return True
+
+def _is_visible(category, key):
+    """True if a (-value, player_id) key ranks within the visible top DEFAULT_LIMIT"""
+    return bisect.bisect_left(rankings[category], key) < DEFAULT_LIMIT
+
+def set_value(category, player_id, value):
+    """
+    Move a player to their new place in one category: O(log n) to find, plus the list shift.
+
+    Returns:
+    - True if the visible part of the ranking changed
+    """
+    ranking = rankings[category]
+    old = values[category].get(player_id)
+    if old == value:
+        return False
+
+    visible = False
+    if old is not None:
+        key = (-old, player_id)
+        index = bisect.bisect_left(ranking, key)
+        if index < len(ranking) and ranking[index] == key:
+            visible = index < DEFAULT_LIMIT
+            del ranking[index]
+
+    if _is_rankable(value):
+        values[category][player_id] = value
+        key = (-value, player_id)
+        visible = visible or _is_visible(category, key)
+        bisect.insort(ranking, key)
+    else:
+        values[category].pop(player_id, None)
+
+    if visible:
+        broadcast_state['dirty'] = True
+    return visible
+
+def update_player(player_id, player):
+    """Re-rank a player from their cached data (after a stat, name or color change)"""
+    if _set_profile(player_id, player):
+        # A rename only matters if the player is on a board
+        if any(player_id in values[category] and _is_visible(category, (-values[category][player_id], player_id))
+               for category in CATEGORIES):
+            broadcast_state['dirty'] = True
+    for category in CATEGORIES:
+        set_value(category, player_id, player.get(category))
+
+def top(category, limit=DEFAULT_LIMIT):
+    """The first `limit` entries of a category as {'name', 'value', 'color'} dicts"""
+    return [
+        {
+            'name': profiles[player_id]['name'],
+            'value': -negated,
+            'color': profiles[player_id]['color']
+        } for negated, player_id in rankings[category][:limit]
+    ]
+
+def combined(limit=DEFAULT_LIMIT):
+    """Leaderboards for all categories (same shape as Player.get_combined_leaderboard)"""
+    return {category: top(category, limit) for category in CATEGORIES}
+
+def full_copy():
+    """
+    The leaderboard clients currently hold, for a client that just joined. Changes made
+    since the last broadcast reach it with the next diff like everyone else.
+    """
+    return {**broadcast_state['sent'], 'version': broadcast_state['version']}
+
+def diff(previous, current):
+    """
+    Entries that differ between two combined leaderboards:
+    {category: {'length': n, 'changed': [[rank, entry], ...]}}, only for categories that changed.
+    When every entry of a category changed (e.g. a newcomer at rank 0 shifts the rest), the
+    category is sent whole as {'entries': [...]}, which is smaller than ranked pairs.
+    """
+    changes = {}
+    for category in CATEGORIES:
+        old_entries = previous.get(category, [])
+        new_entries = current[category]
+        changed = [[rank, entry] for rank, entry in enumerate(new_entries)
+                   if rank >= len(old_entries) or old_entries[rank] != entry]
+        if changed and len(changed) == len(new_entries):
+            changes[category] = {'entries': new_entries}
+        elif changed or len(new_entries) != len(old_entries):
+            changes[category] = {'length': len(new_entries), 'changed': changed}
+    return changes
+
+def broadcast(tick):
+    """Tick hook: send visible changes, at most MAX_BROADCASTS_PER_SECOND times a second"""
+    if not broadcast_state['dirty']:
+        return
+    now = time.time()
+    if now - broadcast_state['last_sent_at'] < BROADCAST_INTERVAL:
+        return
+
+    broadcast_state['dirty'] = False
+    current = combined()
+    changes = diff(broadcast_state['sent'], current)
+    if not changes:
+        stats['skipped'] += 1
+        return
+
+    broadcast_state['sent'] = current
+    broadcast_state['version'] += 1
+    broadcast_state['last_sent_at'] = now
+    stats['broadcasts'] += 1
+    version = broadcast_state['version']
+
+    diff_sids = [sid for sid in tick_bundler.sessions
+                 if tick_bundler.has_capability(sid, tick_bundler.CAPABILITY_LEADERBOARD_DIFF)]
+    full_sids = tick_bundler.sids_without(tick_bundler.CAPABILITY_LEADERBOARD_DIFF)
+    # Every worker keeps its own index up to date, so nothing is relayed
+    tick_bundler.queue_event('leaderboard_update', {**current, 'version': version},
+                             to=full_sids, key='leaderboard_update')
+    tick_bundler.queue_event('leaderboard_diff', {'version': version, 'changes': changes},
+                             to=diff_sids)
+
+def metrics():
+    """Return broadcast counters"""
+    return {**stats, 'version': broadcast_state['version'], 'dirty': broadcast_state['dirty']}
@@ -8,180 +8,373 @@ db = None
 # Instead, declare these variables to be set later by init_firestore
 serialize_timestamp = None
 
+ITEM_TYPES = ('fish', 'treasures', 'cargo')
+TIMESTAMP_KEYS = {'fish': 'caught_at', 'treasures': 'found_at', 'cargo': 'acquired_at'}
+STACK_FIELDS = ('value', 'color', 'description')  # Item data copied onto the per-name stack for display
+RECENT_ITEMS = 10       # Newest items of each type kept in the summary document
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MIGRATION_BATCH = 400   # Items written/deleted per WriteBatch (Firestore allows 500 writes)
+
 class Inventory:
-    """Inventory model for Firestore - stores player's fish, treasures, and cargo"""
+    """
+    Inventory model for Firestore - stores player's fish, treasures, and cargo.
+
+    Items live in an 'items' subcollection of inventories/{player_id}, one document each,
+    so inventories can grow without limit. The inventories/{player_id} document is a small
+    summary: per-type counts, per-name stacks ({name: {name, count, value, color, ...}})
+    and the newest RECENT_ITEMS items of each type. Older inventories that stored every
+    item in 'fish'/'treasures'/'cargo' arrays are migrated the first time they are touched.
+    """
     collection_name = 'inventories'
-    
+    items_collection_name = 'items'
+
     @staticmethod
     def collection():
         return db.collection(Inventory.collection_name)
-    
+
+    @staticmethod
+    def items(player_id):
+        """The subcollection holding one document per item"""
+        return Inventory.collection().document(player_id).collection(Inventory.items_collection_name)
+
     @staticmethod
     def to_dict(doc_snapshot):
         """Convert Firestore document to dictionary"""
         if not doc_snapshot.exists:
             return None
-            
+
         data = doc_snapshot.to_dict()
         data['id'] = doc_snapshot.id
-        
+
         # Simple string conversion for timestamps
         for field in ['created_at', 'updated_at']:
             if field in data:
                 data[field] = serialize_timestamp(data[field])
-                
+
         return data
-    
+
     @staticmethod
-    def get(player_id):
-        """Get player's inventory by player ID"""
+    def is_legacy(data):
+        """True if a stored inventory still keeps its items in arrays"""
+        return data is not None and any(isinstance(data.get(item_type), list) for item_type in ITEM_TYPES)
+
+    @staticmethod
+    def empty_summary(player_id):
+        """Summary fields of an inventory with no items"""
+        return {
+            'player_id': player_id,
+            'counts': {item_type: 0 for item_type in ITEM_TYPES},
+            'stacks': {item_type: {} for item_type in ITEM_TYPES},
+            'recent': {item_type: [] for item_type in ITEM_TYPES},
+        }
+
+    @staticmethod
+    def add_to_summary(summary, item_type, entry):
+        """Fold one new item into a summary dict (in place)"""
+        name = entry.get('name', 'Unknown')
+        data = entry.get('data') or {}
+        stack = summary['stacks'][item_type].setdefault(name, {'name': name, 'count': 0})
+        stack['count'] += 1
+        stack.update({field: data[field] for field in STACK_FIELDS if field in data})
+        summary['counts'][item_type] += 1
+        summary['recent'][item_type] = ([entry] + summary['recent'][item_type])[:RECENT_ITEMS]
+
+    @staticmethod
+    def to_client(data):
+        """
+        Shape a summary for clients. 'fish', 'treasures' and 'cargo' hold the per-name
+        stacks, which the inventory UI renders directly (it accepts {name: {count, ...}}).
+        """
+        if data is None or Inventory.is_legacy(data):
+            return data
+        result = {key: value for key, value in data.items() if key != 'stacks'}
+        for item_type in ITEM_TYPES:
+            result[item_type] = data.get('stacks', {}).get(item_type, {})
+        return result
+
+    @staticmethod
+    def load(player_id):
+        """
+        Get the stored summary of a player's inventory (with 'stacks', not shaped for clients),
+        migrating a legacy document first. Returns None if the player has no inventory yet.
+        """
         doc_ref = Inventory.collection().document(player_id)
         inventory = Inventory.to_dict(doc_ref.get())
-        
-        # If inventory doesn't exist, create a default one
-        if not inventory:
-            return Inventory.create(player_id)
-            
+
+        if inventory and Inventory.is_legacy(inventory):
+            inventory = Inventory.migrate(player_id, inventory)
+
         return inventory
-    
+
+    @staticmethod
+    def get(player_id):
+        """Get player's inventory summary by player ID (an empty one if none is stored; nothing is written)"""
+        inventory = Inventory.load(player_id)
+        if not inventory:
+            inventory = {**Inventory.empty_summary(player_id), 'id': player_id}
+
+        return Inventory.to_client(inventory)
+
     @staticmethod
     def create(player_id):
         """Create new inventory for a player with default empty collections"""
         # Set defaults for a new inventory
         defaults = {
-            'player_id': player_id,
-            'fish': [],       # List of fish caught
-            'treasures': [],  # List of treasures found
-            'cargo': [],      # List of cargo/trade items
+            **Inventory.empty_summary(player_id),
             'created_at': time.time()
         }
-        
+
         # Create the document with player_id as the document ID
         doc_ref = Inventory.collection().document(player_id)
         doc_ref.set(defaults)
-        
-        # Return the created inventory
-        return Inventory.to_dict(doc_ref.get())
-    
+
+        # Return the created inventory (we just wrote it, so no read-back)
+        return Inventory.to_client({**defaults, 'id': player_id,
+                                    'created_at': serialize_timestamp(defaults['created_at'])})
+
     @staticmethod
-    def update(player_id, **updates):
-        """Update inventory fields"""
+    def migrate(player_id, legacy):
+        """
+        Move the items of an array-based inventory into the items subcollection and replace
+        the document with a summary. Item IDs are derived from their array position, so an
+        interrupted migration can simply be run again.
+        """
+        summary = Inventory.empty_summary(player_id)
+        writes = []
+        for item_type in ITEM_TYPES:
+            timestamp_key = TIMESTAMP_KEYS[item_type]
+            entries = sorted(legacy.get(item_type) or [], key=lambda e: e.get(timestamp_key, 0))
+            for index, entry in enumerate(entries):
+                writes.append((f"legacy_{item_type}_{index}",
+                               {**entry, 'type': item_type, 'acquired_at': entry.get(timestamp_key, 0)}))
+                Inventory.add_to_summary(summary, item_type, entry)
+
+        items = Inventory.items(player_id)
+        for start in range(0, len(writes), MIGRATION_BATCH):
+            batch = db.batch()
+            for item_id, item in writes[start:start + MIGRATION_BATCH]:
+                batch.set(items.document(item_id), item)
+            batch.commit()
+
+        summary['created_at'] = legacy.get('created_at', time.time())
+        summary['updated_at'] = time.time()
+        Inventory.collection().document(player_id).set(summary)
+        return {**summary, 'id': player_id}
+
+    @staticmethod
+    def update(player_id, updates, readback=False, current=None):
+        """
+        Update inventory fields with a single write.
+
+        :param updates: Field values to write, as a dict so any field name can be used
+        :param readback: Re-read the document after writing and return the stored state
+        :param current: The caller's copy of the document; when given, the return value is
+                        current merged with the updates instead of just the updates
+        :return: The stored inventory if readback is set, otherwise the locally merged dict
+        """
         # Add updated_at timestamp
-        updates['updated_at'] = time.time()
-        
+        updates = {**updates, 'updated_at': time.time()}
+
         doc_ref = Inventory.collection().document(player_id)
         doc_ref.update(updates)
-        
-        # Return updated inventory
-        return Inventory.get(player_id)
-    
+
+        if readback:
+            return Inventory.get(player_id)
+        return {**(current or {'id': player_id}), **updates}
+
+    @staticmethod
+    def save(player_id, summary, new_items):
+        """
+        Write a summary built in memory together with the items added since it was loaded,
+        in WriteBatch commits. The summary goes in the last batch, so it never counts items
+        that were not written.
+
+        :param summary: The full summary document (as returned by load, 'id' is ignored)
+        :param new_items: [(item_id, item)] item documents to create
+        """
+        items = Inventory.items(player_id)
+        for start in range(0, len(new_items), MIGRATION_BATCH):
+            chunk = new_items[start:start + MIGRATION_BATCH]
+            batch = db.batch()
+            for item_id, item in chunk:
+                batch.set(items.document(item_id), item)
+            if start + MIGRATION_BATCH < len(new_items):
+                batch.commit()
+        if not new_items:
+            batch = db.batch()
+
+        batch.set(Inventory.collection().document(player_id),
+                  {key: value for key, value in summary.items() if key != 'id'})
+        batch.commit()
+
+    @staticmethod
+    def existing_item_ids(player_id, item_ids):
+        """The subset of item_ids that already have a document, read with one batched get_all"""
+        items = Inventory.items(player_id)
+        return {doc.id for doc in db.get_all([items.document(item_id) for item_id in item_ids]) if doc.exists}
+
+    @staticmethod
+    def new_item_id(player_id):
+        """Allocate an ID for an item document (generated locally, no round trip)"""
+        return Inventory.items(player_id).document().id
+
+    @staticmethod
+    def _add_item(player_id, item_type, name, data=None):
+        """
+        Add one item: create its document in the items subcollection and fold it into the
+        summary in a single transaction. The transaction only reads the small summary
+        document, so the cost does not depend on inventory size.
+        """
+        now = time.time()
+        entry = {
+            'name': name,
+            TIMESTAMP_KEYS[item_type]: now,
+            'data': data or {}
+        }
+        summary_ref = Inventory.collection().document(player_id)
+        item_ref = Inventory.items(player_id).document()
+
+        @firestore.transactional
+        def add_in_transaction(transaction):
+            summary = Inventory.to_dict(summary_ref.get(transaction=transaction))
+            if Inventory.is_legacy(summary):
+                return None  # Must be migrated first
+            summary = summary or {**Inventory.empty_summary(player_id), 'created_at': now}
+            summary.pop('id', None)
+            Inventory.add_to_summary(summary, item_type, entry)
+            summary['updated_at'] = now
+            transaction.set(item_ref, {**entry, 'type': item_type, 'acquired_at': now})
+            transaction.set(summary_ref, summary)
+            return summary
+
+        summary = add_in_transaction(db.transaction())
+        if summary is None:
+            Inventory.migrate(player_id, Inventory.to_dict(summary_ref.get()))
+            summary = add_in_transaction(db.transaction())
+
+        # Return what was added rather than the whole inventory
+        return {'id': player_id, 'item_type': item_type, 'item': {**entry, 'id': item_ref.id},
+                'counts': summary['counts'], 'updated_at': now}
+
     @staticmethod
     def add_fish(player_id, fish_name, fish_data=None):
         """Add a fish to player's inventory"""
-        # Get current inventory
-        inventory = Inventory.get(player_id)
-        
-        # Create fish entry with timestamp
-        fish_entry = {
-            'name': fish_name,
-            'caught_at': time.time(),
-            'data': fish_data or {}
-        }
-        
-        # Ensure fish array exists
-        current_fish = inventory.get('fish', [])
-        
-        # Add new fish
-        current_fish.append(fish_entry)
-        
-        # Update inventory
-        return Inventory.update(player_id, fish=current_fish)
-    
+        return Inventory._add_item(player_id, 'fish', fish_name, fish_data)
+
     @staticmethod
     def add_treasure(player_id, treasure_name, treasure_data=None):
         """Add a treasure to player's inventory"""
-        # Get current inventory
-        inventory = Inventory.get(player_id)
-        
-        # Create treasure entry with timestamp
-        treasure_entry = {
-            'name': treasure_name,
-            'found_at': time.time(),
-            'data': treasure_data or {}
-        }
-        
-        # Ensure treasures array exists
-        current_treasures = inventory.get('treasures', [])
-        
-        # Add new treasure
-        current_treasures.append(treasure_entry)
-        
-        # Update inventory
-        return Inventory.update(player_id, treasures=current_treasures)
-    
+        return Inventory._add_item(player_id, 'treasures', treasure_name, treasure_data)
+
     @staticmethod
     def add_cargo(player_id, cargo_name, cargo_data=None):
         """Add cargo item to player's inventory"""
-        # Get current inventory
-        inventory = Inventory.get(player_id)
-        
-        # Create cargo entry with timestamp
-        cargo_entry = {
-            'name': cargo_name,
-            'acquired_at': time.time(),
-            'data': cargo_data or {}
-        }
-        
-        # Ensure cargo array exists
-        current_cargo = inventory.get('cargo', [])
-        
-        # Add new cargo
-        current_cargo.append(cargo_entry)
-        
-        # Update inventory
-        return Inventory.update(player_id, cargo=current_cargo)
-    
-    @staticmethod
-    def remove_item(player_id, item_type, item_index):
-        """Remove an item from player's inventory by index"""
-        # Get current inventory
-        inventory = Inventory.get(player_id)
-        
-        # Validate item type
-        if item_type not in ['fish', 'treasures', 'cargo']:
+        return Inventory._add_item(player_id, 'cargo', cargo_name, cargo_data)
+
+    @staticmethod
+    def list_items(player_id, item_type=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        List a player's items, newest first, one page at a time.
+
+        :param item_type: Only list items of this type ('fish', 'treasures' or 'cargo')
+        :param limit: Page size (capped at MAX_PAGE_SIZE)
+        :param cursor: The next_cursor of the previous page ('<acquired_at>|<item_id>')
+        :return: {'items': [...], 'next_cursor': cursor for the next page, or None}
+        """
+        if item_type is not None and item_type not in ITEM_TYPES:
             raise ValueError("Item type must be 'fish', 'treasures', or 'cargo'")
-        
-        # Get current items of the specified type
-        current_items = inventory.get(item_type, [])
-        
-        # Check if index is valid
-        if item_index < 0 or item_index >= len(current_items):
-            raise ValueError(f"Invalid index {item_index} for {item_type}")
-        
-        # Remove the item at the specified index
-        removed_item = current_items.pop(item_index)
-        
-        # Update inventory
-        update_data = {item_type: current_items}
-        result = Inventory.update(player_id, **update_data)
-        
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        # Items sharing a timestamp (all migrated items without one have 0) are ordered by ID,
+        # so the cursor needs both to resume exactly after the last item of the page
+        query = Inventory.items(player_id)
+        if item_type is not None:
+            query = query.where('type', '==', item_type)
+        query = (query.order_by('acquired_at', direction=firestore.Query.DESCENDING)
+                      .order_by(firestore.FieldPath.document_id(), direction=firestore.Query.DESCENDING))
+        if cursor is not None:
+            acquired_at, separator, item_id = str(cursor).partition('|')
+            if not separator or not item_id:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            query = query.start_after({'acquired_at': float(acquired_at),
+                                       firestore.FieldPath.document_id(): item_id})
+
+        items = []
+        for doc in query.limit(limit).stream():
+            item = doc.to_dict()
+            item['id'] = doc.id
+            items.append(item)
+
+        next_cursor = f"{items[-1]['acquired_at']}|{items[-1]['id']}" if len(items) == limit else None
+        return {'items': items, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def remove_item(player_id, item_id):
+        """
+        Remove an item from player's inventory by item ID.
+        The item delete and the summary update happen in one transaction.
+        """
+        summary_ref = Inventory.collection().document(player_id)
+        item_ref = Inventory.items(player_id).document(item_id)
+
+        @firestore.transactional
+        def remove_in_transaction(transaction):
+            summary = Inventory.to_dict(summary_ref.get(transaction=transaction))
+            item_snapshot = item_ref.get(transaction=transaction)
+            if not item_snapshot.exists or summary is None or Inventory.is_legacy(summary):
+                raise ValueError(f"Item {item_id} not found in inventory of {player_id}")
+
+            removed_item = item_snapshot.to_dict()
+            item_type = removed_item.get('type')
+            name = removed_item.get('name', 'Unknown')
+            timestamp_key = TIMESTAMP_KEYS[item_type]
+
+            summary.pop('id', None)
+            summary['counts'][item_type] = max(0, summary['counts'].get(item_type, 0) - 1)
+            stack = summary['stacks'][item_type].get(name)
+            if stack is not None:
+                stack['count'] -= 1
+                if stack['count'] <= 0:
+                    del summary['stacks'][item_type][name]
+            summary['recent'][item_type] = [
+                entry for entry in summary['recent'][item_type]
+                if not (entry.get('name') == name and entry.get(timestamp_key) == removed_item.get(timestamp_key))
+            ]
+            summary['updated_at'] = time.time()
+
+            transaction.delete(item_ref)
+            transaction.set(summary_ref, summary)
+            return {**removed_item, 'id': item_id}, {**summary, 'id': player_id}
+
+        removed_item, result = remove_in_transaction(db.transaction())
+
         # Return the removed item and updated inventory
-        return {'removed_item': removed_item, 'inventory': result}
-    
+        return {'removed_item': removed_item, 'inventory': Inventory.to_client(result)}
+
     @staticmethod
     def get_all_player_inventories():
-        """Get all player inventories"""
+        """Get all player inventory summaries"""
         docs = Inventory.collection().stream()
-        return [Inventory.to_dict(doc) for doc in docs]
-    
+        return [Inventory.to_client(Inventory.to_dict(doc)) for doc in docs]
+
     @staticmethod
     def clear_inventory(player_id):
         """Clear a player's entire inventory"""
+        # Delete the item documents a batch at a time
+        items = Inventory.items(player_id)
+        while True:
+            docs = list(items.limit(MIGRATION_BATCH).stream())
+            if not docs:
+                break
+            batch = db.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+
         empty_inventory = {
-            'fish': [],
-            'treasures': [],
-            'cargo': [],
+            **Inventory.empty_summary(player_id),
             'updated_at': time.time()
         }
-        
-        return Inventory.update(player_id, **empty_inventory)
\ No newline at end of file
+        Inventory.collection().document(player_id).set(empty_inventory)
+        return Inventory.to_client({**empty_inventory, 'id': player_id})
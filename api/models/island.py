@@ -34,18 +34,20 @@ class Island:
         return Island.to_dict(doc_ref.get())
     
     @staticmethod
-    def create(island_id, **data):
-        """Create new island"""
-        # Set defaults if not provided
-        defaults = {
+    def defaults():
+        """Default fields of a new island"""
+        return {
             'position': {'x': 0, 'y': 0, 'z': 0},
             'radius': 50,
             'type': 'default',
             'created_at': time.time()  # Use simple timestamp
         }
-        
+    
+    @staticmethod
+    def create(island_id, **data):
+        """Create new island"""
         # Update defaults with provided data
-        island_data = {**defaults, **data}
+        island_data = {**Island.defaults(), **data}
         
         # Create the document
         doc_ref = Island.collection().document(island_id)
@@ -55,16 +57,25 @@ class Island:
         return Island.get(island_id)
     
     @staticmethod
-    def update(island_id, **updates):
-        """Update island fields"""
+    def update(island_id, updates, readback=False, current=None):
+        """
+        Update island fields with a single write.
+
+        :param updates: Field values to write, as a dict so any field name can be used
+        :param readback: Re-read the document after writing and return the stored state
+        :param current: The caller's copy of the document; when given, the return value is
+                        current merged with the updates instead of just the updates
+        :return: The stored island if readback is set, otherwise the locally merged dict
+        """
         # Add updated_at timestamp
-        updates['updated_at'] = time.time()  # Use simple timestamp
-        
+        updates = {**updates, 'updated_at': time.time()}  # Use simple timestamp
+
         doc_ref = Island.collection().document(island_id)
         doc_ref.update(updates)
-        
-        # Return updated island
-        return Island.get(island_id)
+
+        if readback:
+            return Island.get(island_id)
+        return {**(current or {'id': island_id}), **updates}
     
     @staticmethod
     def delete(island_id):
@@ -1,30 +1,77 @@
+from firebase_admin import firestore
+import time
+
+DEFAULT_SENDER_COLOR = {'r': 0.5, 'g': 0.5, 'b': 0.5}
+FALLBACK_SCAN_FACTOR = 5    # Without the composite index, scan this many newest messages per one requested
+MAX_BATCH_WRITES = 500      # Firestore WriteBatch limit
 
 class Message:
-    """Message model for Firestore"""
+    """
+    Message model for Firestore.
+
+    The sender's name and color are stored on each message when it is written, so
+    reading history needs no player lookups. Older messages without them are resolved
+    in one pass per read (see resolve_senders).
+    """
     collection_name = 'messages'
-    
+
     @staticmethod
     def collection():
         return db.collection(Message.collection_name)
-    
+
     @staticmethod
     def to_dict(doc_snapshot):
         """Convert Firestore document to dictionary"""
         if not doc_snapshot.exists:
             return None
-            
+
         data = doc_snapshot.to_dict()
         data['id'] = doc_snapshot.id
-        
+
         # Simple string conversion for timestamp
         if 'timestamp' in data:
             data['timestamp'] = serialize_timestamp(data['timestamp'])
-        
+
         return data
-    
+
+    @staticmethod
+    def resolve_senders(messages, players=None):
+        """
+        Fill in sender_name/sender_color on messages that were stored without them.
+        Senders are taken from the in-process players cache when given; the rest are
+        fetched with a single batched get_all, once per distinct sender.
+        """
+        missing = {message.get('sender_id') for message in messages
+                   if 'sender_name' not in message and message.get('sender_id')}
+        senders = {}
+        if players is not None:
+            senders = {sender_id: players[sender_id] for sender_id in missing if sender_id in players}
+
+        unresolved = [sender_id for sender_id in missing if sender_id not in senders]
+        if unresolved:
+            refs = [Player.collection().document(sender_id) for sender_id in unresolved]
+            for doc in db.get_all(refs):
+                if doc.exists:
+                    senders[doc.id] = doc.to_dict()
+
+        for message in messages:
+            if 'sender_name' in message:
+                continue
+            sender = senders.get(message.get('sender_id'))
+            if sender:
+                message['sender_name'] = sender.get('name', 'Unknown')
+                message['sender_color'] = sender.get('color')
+            else:
+                message['sender_name'] = 'Unknown'
+                message['sender_color'] = DEFAULT_SENDER_COLOR
+        return messages
+
     @staticmethod
-    def create(sender_id, content, message_type='global'):
-        """Create new message"""
+    def create(sender_id, content, message_type='global', sender_name=None, sender_color=None, players=None):
+        """
+        Create new message, storing the sender's name and color with it.
+        Pass sender_name/sender_color (or the players cache) to avoid a player lookup.
+        """
         # Create message data
         message_data = {
             'sender_id': sender_id,
@@ -32,81 +79,79 @@ class Message:
             'timestamp': time.time(),  # Use simple timestamp
             'message_type': message_type
         }
-        
+        if sender_name is not None:
+            message_data['sender_name'] = sender_name
+            message_data['sender_color'] = sender_color
+        else:
+            Message.resolve_senders([message_data], players)
+
         # Create document with auto-generated ID
         doc_ref = Message.collection().document()
         doc_ref.set(message_data)
-        
-        # Get the created message
-        created_message = Message.to_dict(doc_ref.get())
-        
-        # Also add sender info for convenience
-        if created_message:
-            sender = Player.get(sender_id)
-            if sender:
-                created_message['sender_name'] = sender.get('name', 'Unknown')
-                created_message['sender_color'] = sender.get('color')
-        
-        return created_message
-    
+
+        # Return the created message (we just wrote it, so no read-back)
+        return {**message_data, 'id': doc_ref.id, 'timestamp': serialize_timestamp(message_data['timestamp'])}
+
     @staticmethod
-    def get(message_id):
+    def create_many(messages):
+        """
+        Write already complete messages (sender_id, content, timestamp, message_type,
+        sender_name, sender_color) in WriteBatch commits, with auto-generated IDs.
+        """
+        for start in range(0, len(messages), MAX_BATCH_WRITES):
+            batch = db.batch()
+            for message_data in messages[start:start + MAX_BATCH_WRITES]:
+                message_data = {**message_data, 'content': message_data['content'][:500]}
+                batch.set(Message.collection().document(), message_data)
+            batch.commit()
+
+    @staticmethod
+    def get(message_id, players=None):
         """Get message by ID"""
         doc_ref = Message.collection().document(message_id)
         message = Message.to_dict(doc_ref.get())
-        
+
         # Add sender info
         if message:
-            sender = Player.get(message['sender_id'])
-            if sender:
-                message['sender_name'] = sender.get('name', 'Unknown')
-                message['sender_color'] = sender.get('color')
-        
+            Message.resolve_senders([message], players)
+
         return message
-    
+
     @staticmethod
-    def get_recent_messages(limit=50, message_type='global'):
+    def get_recent_messages(limit=50, message_type='global', players=None):
         """
         Get recent messages of a specific type
-        
+
         :param limit: Maximum number of messages to return
         :param message_type: Type of messages to retrieve ('global', 'team', etc.)
+        :param players: Optional in-process players cache used to resolve senders
         :return: List of recent messages in chronological order
         """
         try:
-            # Try the original query (will fail without index)
+            # Needs the composite index (message_type, timestamp desc)
             docs = (Message.collection()
                     .where('message_type', '==', message_type)
                     .order_by('timestamp', direction=firestore.Query.DESCENDING)
                     .limit(limit)
                     .stream())
-            
+
             # Convert to dictionaries
             messages = [Message.to_dict(doc) for doc in docs]
-            
+
         except Exception as e:
-            # Fallback: Get all messages of the specified type without ordering
-            # Then sort them in memory (less efficient but works without index)
+            # Fallback without the composite index: scan a bounded window of the newest
+            # messages of any type (single-field index) and filter by type in memory
             print(f"Warning: Using fallback for message retrieval: {str(e)}")
-            docs = Message.collection().where('message_type', '==', message_type).stream()
-            messages = [Message.to_dict(doc) for doc in docs]
-            
-            # Sort by timestamp in memory
-            messages.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-            
-            # Limit the results
-            messages = messages[:limit]
-        
-        # Add sender information to each message
-        for message in messages:
-            sender = Player.get(message['sender_id'])
-            if sender:
-                message['sender_name'] = sender.get('name', 'Unknown')
-                message['sender_color'] = sender.get('color')
-            else:
-                message['sender_name'] = 'Unknown'
-                message['sender_color'] = {'r': 0.5, 'g': 0.5, 'b': 0.5}
-        
+            docs = (Message.collection()
+                    .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                    .limit(limit * FALLBACK_SCAN_FACTOR)
+                    .stream())
+            messages = [message for message in (Message.to_dict(doc) for doc in docs)
+                        if message.get('message_type') == message_type][:limit]
+
+        # Add sender information to messages stored without it
+        Message.resolve_senders(messages, players)
+
         # Reverse to get chronological order
         messages.reverse()
-        return messages
\ No newline at end of file
+        return messages
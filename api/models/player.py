@@ -33,10 +33,9 @@ class Player:
         return Player.to_dict(doc_ref.get())
     
     @staticmethod
-    def create(player_id, **data):
-        """Create new player"""
-        # Set defaults if not provided
-        defaults = {
+    def defaults(player_id):
+        """Default fields of a new player"""
+        return {
             'name': f'Sailor {player_id[:4]}',
             'color': {'r': 0.3, 'g': 0.6, 'b': 0.8},
             'position': {'x': 0, 'y': 0, 'z': 0},
@@ -49,9 +48,12 @@ class Player:
             'active': True,
             'created_at': time.time()  # Use simple timestamp instead of SERVER_TIMESTAMP
         }
-        
+    
+    @staticmethod
+    def create(player_id, **data):
+        """Create new player"""
         # Update defaults with provided data
-        player_data = {**defaults, **data}
+        player_data = {**Player.defaults(player_id), **data}
         
         # Create the document
         doc_ref = Player.collection().document(player_id)
@@ -61,16 +63,25 @@ class Player:
         return Player.get(player_id)
     
     @staticmethod
-    def update(player_id, **updates):
-        """Update player fields"""
+    def update(player_id, updates, readback=False, current=None):
+        """
+        Update player fields with a single write.
+
+        :param updates: Field values to write, as a dict so any field name can be used
+        :param readback: Re-read the document after writing and return the stored state
+        :param current: The caller's copy of the document; when given, the return value is
+                        current merged with the updates instead of just the updates
+        :return: The stored player if readback is set, otherwise the locally merged dict
+        """
         # Add updated_at timestamp
-        updates['updated_at'] = time.time()  # Use simple timestamp
-        
+        updates = {**updates, 'updated_at': time.time()}  # Use simple timestamp
+
         doc_ref = Player.collection().document(player_id)
         doc_ref.update(updates)
-        
-        # Return updated player
-        return Player.get(player_id)
+
+        if readback:
+            return Player.get(player_id)
+        return {**(current or {'id': player_id}), **updates}
     
     @staticmethod
     def delete(player_id):
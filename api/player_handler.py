@@ -6,6 +6,8 @@ Handles player health, death, and respawn mechanics
 import logging
 from flask_socketio import emit
 import firestore_models
+import shared_state
+import tick_bundler
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,6 +25,9 @@ def init_handler(socketio_instance, players_reference):
     global socketio, players
     socketio = socketio_instance
     players = players_reference
+
+    # Damage to a player connected to another worker is applied by that worker
+    shared_state.register_remote_call('damage_player', damage_player)
     logger.info("Player handler initialized")
 
 def damage_player(player_id, damage_amount, source_id=None):
@@ -39,6 +44,11 @@ def damage_player(player_id, damage_amount, source_id=None):
     - False if the player is still alive
     """
     # logger.error("player id ", player_id, " took ")
+    # In multi-worker mode only the worker that owns the player may change their health
+    if not shared_state.owns_player(player_id):
+        shared_state.call_owner('damage_player', player_id, damage_amount, source_id)
+        return False
+
     # Ignore if player doesn't exist or is already inactive
     if player_id not in players or not players[player_id].get('active', False):
         return False
@@ -78,12 +88,12 @@ def handle_player_death(player_id, killer_id=None):
         # Award a kill to the player who caused the death
         #if killer_id in players and 'monsterKills' in players[killer_id]:
             #players[killer_id]['monsterKills'] += 1
-            #firestore_models.Player.update(killer_id, monsterKills=players[killer_id]['monsterKills'])
+            #firestore_models.Player.update(killer_id, {'monsterKills': players[killer_id]['monsterKills']})
     else:
         logger.info(f"Player {player_id} was defeated")
     
     # Notify all players of the defeat
-    socketio.emit('player_defeated', {
+    tick_bundler.queue_event('player_defeated', {
         'player_id': player_id,
         'killer_id': killer_id
     })
@@ -117,7 +127,7 @@ def respawn_player(player_id):
     
 
     # Notify all players of the respawn
-    socketio.emit('player_respawned', {
+    tick_bundler.queue_event('player_respawned', {
         'player_id': player_id,
         'health': DEFAULT_HEALTH
     })
@@ -0,0 +1,101 @@
+"""
+Player Store Module
+The in-process player cache. It is a dict of player_id -> player data, so the
+modules that hold a reference to it keep working unchanged. It adds two things:
+
+- an index of active player IDs, so "who is online" costs O(active) instead of
+  a scan over every cached player;
+- a bound on inactive entries: players who went offline are kept (least
+  recently used first) for quick reconnects and are evicted beyond
+  MAX_INACTIVE_PLAYERS. Nothing is lost by evicting: storage holds the
+  document, write_behind its unflushed fields, and player_join loads it again.
+
+Players are loaded when they join rather than all at startup, so memory scales
+with concurrent players, not all-time registrations.
+"""
+
+import os
+import logging
+from collections import OrderedDict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+MAX_INACTIVE_PLAYERS = int(os.environ.get('MAX_INACTIVE_PLAYERS', 1000))
+
+class PlayerStore(dict):
+    """
+    Player cache with an active-player index and LRU eviction of inactive players.
+    Assigning players[player_id] = player indexes the player by its 'active' field;
+    use set_active when flipping 'active' on a cached player in place.
+    """
+
+    def __init__(self, max_inactive=MAX_INACTIVE_PLAYERS):
+        super().__init__()
+        self.max_inactive = max_inactive
+        self.active_ids = set()
+        self.inactive = OrderedDict()  # {player_id: None}, least recently used first
+        self.stats = {'evictions': 0}
+
+    def __setitem__(self, player_id, player):
+        super().__setitem__(player_id, player)
+        self._index(player_id, player.get('active', False))
+
+    def __delitem__(self, player_id):
+        super().__delitem__(player_id)
+        self.active_ids.discard(player_id)
+        self.inactive.pop(player_id, None)
+
+    def update(self, *args, **kwargs):
+        for player_id, player in dict(*args, **kwargs).items():
+            self[player_id] = player
+
+    def pop(self, player_id, *default):
+        self.active_ids.discard(player_id)
+        self.inactive.pop(player_id, None)
+        return super().pop(player_id, *default)
+
+    def set_active(self, player_id, active):
+        """Set a cached player's 'active' flag and move them between the active index and the LRU"""
+        player = self.get(player_id)
+        if player is None:
+            return
+        player['active'] = active
+        self._index(player_id, active)
+
+    def _index(self, player_id, active):
+        if active:
+            self.active_ids.add(player_id)
+            self.inactive.pop(player_id, None)
+            return
+
+        self.active_ids.discard(player_id)
+        self.inactive[player_id] = None
+        self.inactive.move_to_end(player_id)
+        while len(self.inactive) > self.max_inactive:
+            evicted, _ = self.inactive.popitem(last=False)
+            super().__delitem__(evicted)
+            self.stats['evictions'] += 1
+
+    def active_count(self):
+        """Number of active players, O(1)"""
+        return len(self.active_ids)
+
+    def active_items(self):
+        """[(player_id, player)] for active players, O(active)"""
+        return [(player_id, self[player_id]) for player_id in self.active_ids]
+
+    def active_players(self):
+        """Data of every active player, O(active)"""
+        return [self[player_id] for player_id in self.active_ids]
+
+    def metrics(self):
+        """Return cache size metrics"""
+        return {
+            **self.stats,
+            'cached': len(self),
+            'active': len(self.active_ids),
+            'inactive': len(self.inactive),
+            'max_inactive': self.max_inactive,
+        }
@@ -0,0 +1,121 @@
+"""
+Position History Module
+Keeps a fixed-size ring buffer of timestamped positions for every player so hit
+detection can rewind targets to where the shooter saw them (lag compensation).
+Buffers are backed by array.array, so memory per player is constant.
+"""
+
+import time
+import logging
+from array import array
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+HISTORY_SIZE = 64             # Samples kept per player (~3s at 20 updates/s)
+FIELDS = 4                    # (t, x, y, z) stored interleaved
+MAX_REWIND = 0.35             # Never rewind further than this many seconds, whatever the client's latency
+INTERPOLATION_DELAY = 0.0     # How far behind real time clients render remote ships (the client snaps to each update)
+DEFAULT_LATENCY = 0.05        # One-way latency assumed until a player's RTT has been measured
+PROBE_INTERVAL = 2.0          # Seconds between latency probes sent to each client
+LATENCY_SMOOTHING = 0.2       # EWMA weight of a new RTT sample
+
+# --- Module-level Data Structures ---
+buffers = {}    # {player_id: {'data': array('d'), 'head': int, 'count': int}}
+latencies = {}  # {player_id: smoothed one-way latency in seconds}
+
+def _new_buffer():
+    return {'data': array('d', bytes(8 * HISTORY_SIZE * FIELDS)), 'head': 0, 'count': 0}
+
+def record(player_id, position, timestamp=None):
+    """Append a position sample for a player (older samples are overwritten once the buffer is full)"""
+    if not position:
+        return
+    timestamp = time.time() if timestamp is None else timestamp
+    buffer = buffers.get(player_id)
+    if buffer is None:
+        buffer = buffers[player_id] = _new_buffer()
+
+    data = buffer['data']
+    if buffer['count'] and timestamp < _sample_time(buffer, buffer['count'] - 1):
+        return  # Samples must stay in time order for the binary search
+
+    offset = buffer['head'] * FIELDS
+    data[offset] = timestamp
+    data[offset + 1] = position.get('x') or 0.0
+    data[offset + 2] = position.get('y') or 0.0
+    data[offset + 3] = position.get('z') or 0.0
+    buffer['head'] = (buffer['head'] + 1) % HISTORY_SIZE
+    buffer['count'] = min(buffer['count'] + 1, HISTORY_SIZE)
+
+def _slot(buffer, index):
+    """Array offset of the index-th oldest sample"""
+    return ((buffer['head'] - buffer['count'] + index) % HISTORY_SIZE) * FIELDS
+
+def _sample_time(buffer, index):
+    return buffer['data'][_slot(buffer, index)]
+
+def _sample(buffer, index):
+    offset = _slot(buffer, index)
+    data = buffer['data']
+    return data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+
+def position_at(player_id, timestamp):
+    """
+    Return the player's position at a past time, linearly interpolated between the
+    two surrounding samples.
+
+    Returns:
+    - {'x', 'y', 'z'} dict, clamped to the oldest/newest sample, or None if no samples exist
+    """
+    buffer = buffers.get(player_id)
+    if buffer is None or buffer['count'] == 0:
+        return None
+
+    count = buffer['count']
+    # Binary search for the first sample newer than timestamp
+    low, high = 0, count
+    while low < high:
+        mid = (low + high) // 2
+        if _sample_time(buffer, mid) <= timestamp:
+            low = mid + 1
+        else:
+            high = mid
+
+    if low == 0:
+        _, x, y, z = _sample(buffer, 0)
+    elif low == count:
+        _, x, y, z = _sample(buffer, count - 1)
+    else:
+        t0, x0, y0, z0 = _sample(buffer, low - 1)
+        t1, x1, y1, z1 = _sample(buffer, low)
+        f = (timestamp - t0) / (t1 - t0) if t1 > t0 else 1.0
+        x, y, z = x0 + (x1 - x0) * f, y0 + (y1 - y0) * f, z0 + (z1 - z0) * f
+    return {'x': x, 'y': y, 'z': z}
+
+def observe_rtt(player_id, rtt):
+    """Fold a measured round-trip time (seconds) into the player's smoothed one-way latency"""
+    if rtt is None or rtt < 0:
+        return
+    one_way = min(rtt / 2, MAX_REWIND)
+    previous = latencies.get(player_id)
+    latencies[player_id] = one_way if previous is None else previous + LATENCY_SMOOTHING * (one_way - previous)
+
+def rewind_for(shooter_id):
+    """Seconds to rewind targets for a shot by this player: their latency plus the client interpolation delay"""
+    return min(latencies.get(shooter_id, DEFAULT_LATENCY) + INTERPOLATION_DELAY, MAX_REWIND)
+
+def rewound_position(player_id, player, rewind, now=None):
+    """Return where a player was `rewind` seconds ago, falling back to their cached position"""
+    now = time.time() if now is None else now
+    if rewind > 0:
+        position = position_at(player_id, now - rewind)
+        if position is not None:
+            return position
+    return player.get('position') or {'x': 0, 'y': 0, 'z': 0}
+
+def forget_player(player_id):
+    """Drop the history and latency estimate of a player that left"""
+    buffers.pop(player_id, None)
+    latencies.pop(player_id, None)
@@ -0,0 +1,463 @@
+"""
+Shared State Module
+Lets several Socket.IO worker processes run the same world. Each worker owns
+the players whose sockets are connected to it and publishes their state to a
+shared store every sync; it pulls everyone else's state from the store into its
+local players cache. Game events that are bundled per client (tick_bundler) are
+relayed to the other workers through the store, and calls that must run on a
+player's owning worker (e.g. applying damage) are routed there.
+
+Store I/O runs on a background sync thread, never on the tick: the tick hook
+hands it the changed players and applies what the previous pull brought back.
+
+Plain Socket.IO broadcasts (emit(..., broadcast=True)) are carried between
+workers by Flask-SocketIO's own message queue (SOCKETIO_MESSAGE_QUEUE).
+Projectiles and cooldowns stay on the worker of the player who fired, since
+that is where the fire events arrive; hits on players owned elsewhere are
+routed to the owner with call_owner().
+
+Stores (selected by SHARED_STATE_URL):
+- memory://               single worker, everything stays in-process (default)
+- sqlite:////path/to/db   local stand-in: a WAL-mode SQLite file shared by the
+                          workers on one machine
+- redis://host:port/db    production store (requires the `redis` package)
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import deque
+import tick_bundler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+SYNC_INTERVAL_TICKS = 1     # Push/pull every N ticks
+STALE_AFTER = 10.0          # Seconds without a heartbeat before a remote player is treated as gone
+EVENT_RETENTION = 60.0      # Seconds relayed events are kept in the store
+RETRY_DELAY = 1.0           # Seconds the sync thread waits after a failed store call
+NS_PLAYERS = 'players'
+NS_ISLANDS = 'islands'
+NS_SESSIONS = 'sessions'
+
+# --- Module-level Data Structures ---
+owned_players = set()   # Player IDs whose socket is connected to this worker
+remote_players = set()  # Player IDs mirrored from other workers
+remote_heartbeats = {}  # {player_id: heartbeat} last heartbeat seen for each remote player
+remote_calls = {}       # {name: callable} functions other workers may invoke on this worker
+last_pushed = {}        # {player_id: (json, timestamp)} last state published for each owned player
+pending_calls = deque() # (method, args) store writes queued by the tick, run in order by the sync thread
+pulled = deque()        # ([(player_id, state)], [message]) read by the sync thread, applied on the tick
+_wake = threading.Event()
+
+# --- Module-level References ---
+store = None
+worker_id = None
+players = None   # Reference to the main player dictionary from app.py
+islands = None   # Reference to the islands dictionary from app.py
+on_remote_update = None  # Callback(player_id, previous_player, player) after a remote player changes
+_thread = None
+
+# ======= Stores =======
+class LocalStateStore:
+    """In-process store for single-worker mode. Nothing is relayed because there is nobody to relay to."""
+    multi_worker = False
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, ns, key, value):
+        self.data.setdefault(ns, {})[key] = value
+
+    def set_many(self, ns, values):
+        self.data.setdefault(ns, {}).update(values)
+
+    def get(self, ns, key):
+        return self.data.get(ns, {}).get(key)
+
+    def delete(self, ns, key):
+        self.data.get(ns, {}).pop(key, None)
+
+    def items(self, ns, since=None):
+        return list(self.data.get(ns, {}).items())
+
+    def publish(self, sender, message):
+        pass
+
+    def poll(self, receiver, after_id):
+        return after_id, []
+
+
+class SqliteStateStore:
+    """
+    Shared store backed by a WAL-mode SQLite file. Lets multiple worker processes
+    on one machine share state without running any extra service.
+    """
+    multi_worker = True
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            );
+            CREATE INDEX IF NOT EXISTS kv_updated ON kv (ns, updated_at);
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def set(self, ns, key, value):
+        self.set_many(ns, {key: value})
+
+    def set_many(self, ns, values):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO kv (ns, key, value, updated_at) VALUES (?, ?, ?, ?)',
+                [(ns, key, json.dumps(value, default=str), now) for key, value in values.items()])
+
+    def get(self, ns, key):
+        row = self._conn().execute('SELECT value FROM kv WHERE ns = ? AND key = ?', (ns, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, ns, key):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM kv WHERE ns = ? AND key = ?', (ns, key))
+
+    def items(self, ns, since=None):
+        if since is None:
+            rows = self._conn().execute('SELECT key, value FROM kv WHERE ns = ?', (ns,))
+        else:
+            rows = self._conn().execute('SELECT key, value FROM kv WHERE ns = ? AND updated_at >= ?', (ns, since))
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def publish(self, sender, message):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT INTO events (sender, created_at, payload) VALUES (?, ?, ?)',
+                         (sender, now, json.dumps(message, default=str)))
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - EVENT_RETENTION,))
+
+    def poll(self, receiver, after_id):
+        if after_id is None:
+            row = self._conn().execute('SELECT MAX(id) FROM events').fetchone()
+            return (row[0] or 0), []
+        rows = self._conn().execute(
+            'SELECT id, sender, payload FROM events WHERE id > ? ORDER BY id', (after_id,)).fetchall()
+        if not rows:
+            return after_id, []
+        messages = [json.loads(payload) for _, sender, payload in rows if sender != receiver]
+        return rows[-1][0], messages
+
+
+class RedisStateStore:
+    """
+    Shared store backed by Redis hashes and a capped stream for relayed events.
+    Each hash has a sorted set of its keys scored by update time, so reading what
+    changed since the last pull does not fetch the whole namespace.
+    """
+    multi_worker = True
+    STREAM = 'tidefall:events'
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_URL points at Redis but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+
+    def _hash(self, ns):
+        return f"tidefall:{ns}"
+
+    def _updated(self, ns):
+        return f"tidefall:{ns}:updated"
+
+    def set(self, ns, key, value):
+        self.set_many(ns, {key: value})
+
+    def set_many(self, ns, values):
+        if not values:
+            return
+        now = time.time()
+        pipeline = self.client.pipeline()
+        pipeline.hset(self._hash(ns), mapping={key: json.dumps(value, default=str)
+                                               for key, value in values.items()})
+        pipeline.zadd(self._updated(ns), {key: now for key in values})
+        pipeline.execute()
+
+    def get(self, ns, key):
+        value = self.client.hget(self._hash(ns), key)
+        return json.loads(value) if value else None
+
+    def delete(self, ns, key):
+        pipeline = self.client.pipeline()
+        pipeline.hdel(self._hash(ns), key)
+        pipeline.zrem(self._updated(ns), key)
+        pipeline.execute()
+
+    def items(self, ns, since=None):
+        if since is None:
+            return [(key.decode(), json.loads(value))
+                    for key, value in self.client.hgetall(self._hash(ns)).items()]
+        keys = self.client.zrangebyscore(self._updated(ns), since, '+inf')
+        if not keys:
+            return []
+        values = self.client.hmget(self._hash(ns), keys)
+        return [(key.decode(), json.loads(value)) for key, value in zip(keys, values) if value is not None]
+
+    def publish(self, sender, message):
+        self.client.xadd(self.STREAM, {'sender': sender, 'payload': json.dumps(message, default=str)},
+                         maxlen=10000, approximate=True)
+
+    def poll(self, receiver, after_id):
+        if after_id is None:
+            latest = self.client.xrevrange(self.STREAM, count=1)
+            return (latest[0][0] if latest else '0-0'), []
+        entries = self.client.xread({self.STREAM: after_id}, count=1000) or []
+        messages = []
+        for _, stream_entries in entries:
+            for entry_id, fields in stream_entries:
+                after_id = entry_id
+                if fields[b'sender'].decode() != receiver:
+                    messages.append(json.loads(fields[b'payload']))
+        return after_id, messages
+
+
+def create_store(url):
+    """Create a store from a SHARED_STATE_URL"""
+    if not url or url.startswith('memory://'):
+        return LocalStateStore()
+    if url.startswith('sqlite:///'):
+        return SqliteStateStore(url[len('sqlite:///'):])
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisStateStore(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+# ======= Lifecycle =======
+_last_event_id = None
+_last_pull = None
+
+def init_state(players_reference, islands_reference, remote_update_callback=None, url=None):
+    """
+    Initialize the shared state layer, start the sync thread and register the sync tick hook.
+
+    Args:
+        players_reference (dict): The main player dictionary from app.py.
+        islands_reference (dict): The islands dictionary from app.py.
+        remote_update_callback (callable): Called as fn(player_id, previous, player) after
+            a player owned by another worker changes.
+        url (str): Store URL; defaults to the SHARED_STATE_URL environment variable.
+    """
+    global store, worker_id, players, islands, on_remote_update, _last_event_id, _thread
+    players = players_reference
+    islands = islands_reference
+    on_remote_update = remote_update_callback
+    worker_id = os.environ.get('WORKER_ID') or uuid.uuid4().hex[:8]
+    store = create_store(url if url is not None else os.environ.get('SHARED_STATE_URL'))
+
+    if store.multi_worker:
+        # Publish the islands this worker knows about and pick up everyone else's
+        store.set_many(NS_ISLANDS, dict(islands))
+        for island_id, island in store.items(NS_ISLANDS):
+            islands[island_id] = island
+        _last_event_id, _ = store.poll(worker_id, None)
+        tick_bundler.broadcast_relay = relay_broadcast
+        _thread = threading.Thread(target=_sync_loop, name='shared-state', daemon=True)
+        _thread.start()
+
+    tick_bundler.register_tick_hook(sync)
+    logger.info(f"Shared state initialized (worker {worker_id}, store {type(store).__name__})")
+
+def is_multi_worker():
+    """Return True if state is shared with other worker processes"""
+    return store is not None and store.multi_worker
+
+def register_remote_call(name, function):
+    """Register a function that other workers may ask this worker to run"""
+    remote_calls[name] = function
+
+def _submit(method, *args):
+    """Queue a store write for the sync thread (sent with the next sync), or run it now in single-worker mode"""
+    if _thread is None:
+        method(*args)
+    else:
+        pending_calls.append((method, args))
+
+# ======= Ownership =======
+def claim_player(player_id, sid):
+    """Mark a player as owned by this worker (their socket connected here)"""
+    owned_players.add(player_id)
+    remote_players.discard(player_id)
+    if store is not None:
+        _submit(store.set, NS_SESSIONS, sid, {'player_id': player_id, 'worker': worker_id})
+
+def release_player(player_id, sid):
+    """Publish a player's final state and stop owning them (their socket disconnected)"""
+    owned_players.discard(player_id)
+    last_pushed.pop(player_id, None)
+    if store is None:
+        return
+    _submit(store.delete, NS_SESSIONS, sid)
+    if player_id in players and store.multi_worker:
+        _submit(store.set, NS_PLAYERS, player_id, _published_state(player_id))
+
+def owns_player(player_id):
+    """Return True if this worker is authoritative for a player (always true in single-worker mode)"""
+    return not is_multi_worker() or player_id in owned_players or player_id not in remote_players
+
+def call_owner(name, *args):
+    """
+    Run a registered remote call on the worker that owns args[0] (a player ID).
+    Runs locally when this worker is the owner.
+    """
+    if owns_player(args[0]):
+        return remote_calls[name](*args)
+    _submit(store.publish, worker_id, {'type': 'call', 'name': name, 'args': list(args)})
+    return None
+
+# ======= Islands =======
+def publish_island(island_id, island):
+    """Share a newly created island with the other workers"""
+    if is_multi_worker():
+        _submit(store.set, NS_ISLANDS, island_id, island)
+        _submit(store.publish, worker_id, {'type': 'island', 'id': island_id, 'island': island})
+
+# ======= Relay =======
+def relay_broadcast(event, data, key):
+    """tick_bundler hook: forward a broadcast queued on this worker to every other worker"""
+    _submit(store.publish, worker_id, {'type': 'event', 'event': event, 'data': data, 'key': key})
+
+def _handle_message(message):
+    kind = message.get('type')
+    if kind == 'event':
+        key = message.get('key')
+        tick_bundler.queue_event(message['event'], message['data'],
+                                 key=tuple(key) if isinstance(key, list) else key, relay=False)
+    elif kind == 'call':
+        function = remote_calls.get(message['name'])
+        args = message.get('args') or []
+        if function and args and args[0] in owned_players:
+            function(*args)
+    elif kind == 'island':
+        islands[message['id']] = message['island']
+
+# ======= Sync =======
+def _published_state(player_id):
+    state = dict(players[player_id])
+    state['_owner'] = worker_id
+    state['_heartbeat'] = time.time()
+    return state
+
+def _apply_remote_state(player_id, state):
+    previous = players.get(player_id)
+    players[player_id] = state
+    if on_remote_update:
+        on_remote_update(player_id, previous, state)
+
+def sync(tick):
+    """
+    Tick hook: queue the owned players that changed for publishing, wake the sync thread,
+    and apply the remote players and relayed messages it pulled since the last tick.
+    Never waits on the store.
+    """
+    if not is_multi_worker() or tick % SYNC_INTERVAL_TICKS:
+        return
+
+    now = time.time()
+
+    # Push: only players whose state changed, plus a heartbeat every few seconds
+    changed = {}
+    for player_id in list(owned_players):
+        if player_id not in players:
+            continue
+        encoded = json.dumps(players[player_id], sort_keys=True, default=str)
+        previous = last_pushed.get(player_id)
+        if previous is None or previous[0] != encoded or now - previous[1] > STALE_AFTER / 2:
+            changed[player_id] = _published_state(player_id)
+            last_pushed[player_id] = (encoded, now)
+    if changed:
+        _submit(store.set_many, NS_PLAYERS, changed)
+    _wake.set()
+
+    while pulled:
+        states, messages = pulled.popleft()
+        _apply_pull(states, messages)
+
+    # Players of a worker that stopped sending heartbeats (e.g. crashed) are no longer active
+    for player_id in list(remote_players):
+        player = players.get(player_id)
+        if player and player.get('active') and now - remote_heartbeats.get(player_id, 0) > STALE_AFTER:
+            _apply_remote_state(player_id, {**player, 'active': False})
+
+def _apply_pull(states, messages):
+    """Apply one pull of the sync thread (runs on the tick)"""
+    for player_id, state in states:
+        owner = state.pop('_owner', None)
+        heartbeat = state.pop('_heartbeat', 0)
+        if player_id in owned_players or owner == worker_id:
+            continue
+        if remote_heartbeats.get(player_id) == heartbeat:
+            continue
+        remote_heartbeats[player_id] = heartbeat
+        remote_players.add(player_id)
+        _apply_remote_state(player_id, state)
+
+    # Relayed events and remote calls
+    for message in messages:
+        try:
+            _handle_message(message)
+        except Exception as e:
+            logger.error(f"Error handling relayed message {message.get('type')}: {e}")
+
+def _sync_loop():
+    """Sync thread: run the queued store writes in order, then pull what changed since the last pull"""
+    global _last_event_id, _last_pull
+    logger.info("Starting shared state sync thread.")
+    while True:
+        _wake.wait()
+        _wake.clear()
+        try:
+            while pending_calls:
+                method, args = pending_calls[0]
+                method(*args)
+                pending_calls.popleft()
+
+            # Pull everything that changed since the last pull (with a little slack for clock skew)
+            now = time.time()
+            since = None if _last_pull is None else _last_pull - 1.0
+            states = store.items(NS_PLAYERS, since=since)
+            event_id, messages = store.poll(worker_id, _last_event_id)
+            _last_pull, _last_event_id = now, event_id
+            pulled.append((states, messages))
+        except Exception as e:
+            # The failed write stays at the front of the queue and is retried
+            logger.error(f"Shared state sync failed, will retry: {e}")
+            time.sleep(RETRY_DELAY)
+            _wake.set()
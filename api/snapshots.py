@@ -0,0 +1,217 @@
+"""
+Snapshot Module
+Builds a quantized snapshot of the visible world every tick and sends each
+delta-capable client only what changed since the last snapshot that client
+acknowledged. Players are referred to by small integer handles instead of
+their full document IDs.
+"""
+
+import math
+import time
+import logging
+from collections import OrderedDict
+import tick_bundler
+import interest_manager
+import update_lod
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+SNAPSHOT_EVENT = 'snapshot'
+HISTORY_LENGTH = 32          # Snapshots kept per client (1.6s at 20 Hz); older baselines trigger a full snapshot
+POSITION_SCALE = 10          # Positions are sent as integers in 1/10th of a world unit
+ROTATION_STEPS = 65536       # Rotations are sent as an unsigned 16-bit fraction of a full turn
+MAX_HANDLE = 65535           # Handles must fit in an unsigned 16-bit integer
+MODES = {'boat': 0, 'character': 1}  # Mode enum sent on the wire
+
+# --- Module-level Data Structures ---
+player_handles = {}   # {player_id: handle}
+handle_players = {}   # {handle: player_id}
+client_views = {}     # {sid: {'history': OrderedDict{seq: {handle: state}}, 'acked': seq | None}}
+_next_handle = 1
+
+# --- Module-level References ---
+players = None  # Reference to the main player dictionary from app.py
+
+def init_snapshots(players_reference):
+    """Initialize the snapshot module and register its per-tick snapshot builder"""
+    global players
+    players = players_reference
+    tick_bundler.register_tick_hook(send_snapshots)
+    logger.info("Snapshot module initialized")
+
+# --- Quantization ---
+def quantize_position(value):
+    """Quantize a world coordinate to an integer number of 1/POSITION_SCALE units"""
+    return int(round((value or 0) * POSITION_SCALE))
+
+def dequantize_position(value):
+    """Inverse of quantize_position"""
+    return value / POSITION_SCALE
+
+def quantize_rotation(radians):
+    """Quantize a rotation in radians to an unsigned 16-bit fraction of a full turn"""
+    turns = ((radians or 0) % (2 * math.pi)) / (2 * math.pi)
+    return int(round(turns * ROTATION_STEPS)) % ROTATION_STEPS
+
+def dequantize_rotation(value):
+    """Inverse of quantize_rotation (returns radians in [0, 2*pi))"""
+    return value * 2 * math.pi / ROTATION_STEPS
+
+def encode_mode(mode):
+    """Return the wire enum for a player mode (unknown modes are sent as boat)"""
+    return MODES.get(mode, MODES['boat'])
+
+# --- Handles ---
+def handle_for(player_id):
+    """
+    Return the integer handle for a player, assigning one if needed.
+    Handles are not reused until the counter wraps, so a stale client baseline
+    can never confuse two different players.
+    """
+    global _next_handle
+    handle = player_handles.get(player_id)
+    if handle is not None:
+        return handle
+
+    for _ in range(MAX_HANDLE):
+        candidate = _next_handle
+        _next_handle = _next_handle % MAX_HANDLE + 1
+        if candidate not in handle_players:
+            player_handles[player_id] = candidate
+            handle_players[candidate] = player_id
+            return candidate
+
+    raise RuntimeError("No free player handles left")
+
+def release_handle(player_id):
+    """Free a player's handle when they leave the game"""
+    handle = player_handles.pop(player_id, None)
+    if handle is not None:
+        handle_players.pop(handle, None)
+
+def player_for_handle(handle):
+    """Return the player ID behind a handle, or None"""
+    return handle_players.get(handle)
+
+# --- Client bookkeeping ---
+def add_client(sid):
+    """Start sending delta snapshots to a socket. The first snapshot is always a full one."""
+    client_views[sid] = {'history': OrderedDict(), 'acked': None}
+
+def remove_client(sid):
+    """Forget a socket's snapshot history"""
+    client_views.pop(sid, None)
+
+def acknowledge(sid, seq):
+    """
+    Record that a client has received snapshot `seq`, making it the baseline for
+    future deltas. Acks for unknown or older snapshots are ignored.
+    """
+    view = client_views.get(sid)
+    if view is None or seq not in view['history']:
+        return False
+    if view['acked'] is not None and seq <= view['acked']:
+        return False
+
+    view['acked'] = seq
+    # Anything older than the new baseline can never be used again
+    history = view['history']
+    while history and next(iter(history)) < seq:
+        history.popitem(last=False)
+    return True
+
+# --- Snapshot building ---
+def entity_state(player_id, player):
+    """Return the quantized wire state of one player"""
+    position = player.get('position') or {}
+    return {
+        'id': player_id,
+        'x': quantize_position(position.get('x')),
+        'y': quantize_position(position.get('y')),
+        'z': quantize_position(position.get('z')),
+        'r': quantize_rotation(player.get('rotation')),
+        'm': encode_mode(player.get('mode')),
+        'n': player.get('name'),
+        'c': player.get('color'),
+    }
+
+def build_view(player_id, world, previous_view=None, now=None):
+    """
+    Return {handle: state} for the entities visible to a player.
+    Entities that are not due an update at their distance tier (see update_lod)
+    keep the state from the previous view, so they produce no delta this tick.
+    """
+    previous_view = previous_view or {}
+    now = time.time() if now is None else now
+    view = {}
+    for other_id in interest_manager.visible_players(player_id):
+        state = world.get(other_id)
+        if state is None:
+            continue
+        handle = handle_for(other_id)
+        previous = previous_view.get(handle)
+        if previous is not None and previous['id'] == other_id \
+                and not update_lod.is_due(player_id, other_id, now):
+            view[handle] = previous
+        else:
+            view[handle] = state
+    return view
+
+def diff_views(baseline, view):
+    """
+    Compute the delta from a baseline view to a new view.
+
+    Returns:
+    - (entities, gone): entities maps handle -> changed fields (full state for new
+      entities or entities whose handle now belongs to someone else); gone lists
+      handles present in the baseline but not in the new view.
+    """
+    entities = {}
+    for handle, state in view.items():
+        old = baseline.get(handle)
+        if old is None or old['id'] != state['id']:
+            entities[handle] = state
+            continue
+        changed = {field: value for field, value in state.items() if old.get(field) != value}
+        if changed:
+            entities[handle] = changed
+    gone = [handle for handle in baseline if handle not in view]
+    return entities, gone
+
+def send_snapshots(tick):
+    """Tick hook: build this tick's world snapshot and queue a delta for every delta-capable client"""
+    if not client_views:
+        return
+
+    world = {}
+    for player_id in interest_manager.player_cells:
+        player = players.get(player_id)
+        if player and player.get('active', False):
+            world[player_id] = entity_state(player_id, player)
+
+    now = time.time()
+    for sid, client in list(client_views.items()):
+        session = tick_bundler.sessions.get(sid)
+        if session is None:
+            continue
+
+        history = client['history']
+        previous_view = history[next(reversed(history))] if history else None
+        view = build_view(session['player_id'], world, previous_view, now)
+        baseline_seq = client['acked']
+        baseline = history.get(baseline_seq) if baseline_seq is not None else None
+
+        if baseline is None:
+            # No usable baseline (first snapshot, or the acked one fell out of history)
+            payload = {'seq': tick, 'base': None, 'ents': view, 'gone': []}
+        else:
+            entities, gone = diff_views(baseline, view)
+            payload = {'seq': tick, 'base': baseline_seq, 'ents': entities, 'gone': gone}
+
+        history[tick] = view
+        while len(history) > HISTORY_LENGTH:
+            history.popitem(last=False)
+
+        tick_bundler.queue_event(SNAPSHOT_EVENT, payload, to=sid, key=SNAPSHOT_EVENT)
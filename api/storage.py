@@ -0,0 +1,408 @@
+"""
+Storage Module
+One document-store interface for game data (players, islands) with two backends,
+selected by STORAGE_URL:
+
+- firestore://            (default) reads and writes go straight to Firestore
+- sqlite:////path/to/db   local-first: a WAL-mode SQLite file is the primary store.
+                          Every write also appends to a durable outbox table in the
+                          same transaction, and a background thread replicates the
+                          outbox to Firestore in batches. Gameplay reads and writes
+                          never wait on the network and keep working through
+                          Firestore outages; the outbox catches up afterwards.
+
+Documents are plain dicts; writes are either a full set, a top-level field merge
+or a delete, which is all the game needs.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import firestore_models
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+MAX_BATCH_WRITES = 500        # Firestore's limit on writes per WriteBatch
+REPLICATION_INTERVAL = 1.0    # Seconds between outbox polls when it is empty
+MAX_RETRY_DELAY = 60.0        # Upper bound of the exponential backoff while Firestore is unreachable
+TIMESTAMP_FIELDS = ('created_at', 'updated_at', 'last_update')
+
+OP_SET = 'set'
+OP_MERGE = 'merge'
+OP_DELETE = 'delete'
+DESCENDING = 'DESCENDING'  # firestore.Query.DESCENDING
+
+# --- Module-level References ---
+backend = None
+
+def _serialize(doc_id, data):
+    """Shape a stored document the way the models return it: with 'id' and string timestamps"""
+    data = dict(data)
+    data['id'] = doc_id
+    for field in TIMESTAMP_FIELDS:
+        if field in data:
+            data[field] = firestore_models.serialize_timestamp(data[field])
+    return data
+
+def fold_ops(ops):
+    """
+    Collapse an ordered list of (collection, doc_id, op, data) into one write per document
+    with the same end result, preserving the order in which documents were first written.
+    """
+    folded = {}
+    for collection_name, doc_id, op, data in ops:
+        key = (collection_name, doc_id)
+        previous = folded.get(key)
+        if op != OP_MERGE or previous is None:
+            folded[key] = (op, data)
+        elif previous[0] == OP_DELETE:
+            folded[key] = (OP_SET, data)  # A merge into a deleted document creates it
+        else:
+            folded[key] = (previous[0], {**previous[1], **data})
+    return [(collection_name, doc_id, op, data) for (collection_name, doc_id), (op, data) in folded.items()]
+
+# ======= Backends =======
+class FirestoreStorage:
+    """Remote-only storage: every call is a Firestore round trip."""
+    local = False
+
+    def __init__(self, client):
+        self.client = client
+
+    def _doc(self, collection_name, doc_id):
+        return self.client.collection(collection_name).document(doc_id)
+
+    def get(self, collection_name, doc_id):
+        snapshot = self._doc(collection_name, doc_id).get()
+        return _serialize(snapshot.id, snapshot.to_dict()) if snapshot.exists else None
+
+    def all(self, collection_name):
+        return [_serialize(snapshot.id, snapshot.to_dict())
+                for snapshot in self.client.collection(collection_name).stream()]
+
+    def find(self, collection_name, field, value):
+        return [_serialize(snapshot.id, snapshot.to_dict())
+                for snapshot in self.client.collection(collection_name).where(field, '==', value).stream()]
+
+    def top(self, collection_name, field, limit):
+        query = self.client.collection(collection_name).order_by(field, direction=DESCENDING).limit(limit)
+        return [_serialize(snapshot.id, snapshot.to_dict()) for snapshot in query.stream()]
+
+    def set(self, collection_name, doc_id, data):
+        self._doc(collection_name, doc_id).set(data)
+        return _serialize(doc_id, data)
+
+    def write_batch(self, writes):
+        self.commit([(collection_name, doc_id, OP_MERGE, fields) for collection_name, doc_id, fields in writes])
+
+    def delete(self, collection_name, doc_id):
+        self._doc(collection_name, doc_id).delete()
+
+    def commit(self, ops):
+        """Apply (collection, doc_id, op, data) writes in WriteBatch commits of up to MAX_BATCH_WRITES"""
+        for start in range(0, len(ops), MAX_BATCH_WRITES):
+            batch = self.client.batch()
+            for collection_name, doc_id, op, data in ops[start:start + MAX_BATCH_WRITES]:
+                doc_ref = self._doc(collection_name, doc_id)
+                if op == OP_DELETE:
+                    batch.delete(doc_ref)
+                else:
+                    batch.set(doc_ref, data, merge=(op == OP_MERGE))
+            batch.commit()
+
+    def metrics(self):
+        return {'backend': 'firestore'}
+
+
+class SqliteStorage:
+    """
+    Local-first storage backed by a WAL-mode SQLite file, replicated to a remote
+    (Firestore) backend through a durable outbox.
+    """
+    local = True
+
+    def __init__(self, path, remote=None):
+        self.path = path
+        self.remote = remote
+        self.thread_local = threading.local()
+        self.stats = {
+            'replicated': 0,     # Outbox rows written to Firestore
+            'batches': 0,        # Successful replication commits
+            'failures': 0,       # Failed replication commits (retried with backoff)
+            'read_through': 0,   # Local misses served from Firestore
+            'last_error': None,
+        }
+        self._thread = None
+        self._hydrate_lock = threading.Lock()  # Parallel startup reads must not import a collection twice
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (collection, doc_id)
+            );
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                op TEXT NOT NULL,
+                data TEXT,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS hydrated (
+                collection TEXT PRIMARY KEY,
+                hydrated_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self.thread_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.thread_local.conn = conn
+        return conn
+
+    # --- Reads ---
+    def get(self, collection_name, doc_id):
+        row = self._conn().execute('SELECT data FROM documents WHERE collection = ? AND doc_id = ?',
+                                   (collection_name, doc_id)).fetchone()
+        if row:
+            return _serialize(doc_id, json.loads(row[0]))
+        if self.remote is None or self._is_hydrated(collection_name):
+            return None
+
+        # Not imported yet: read through to Firestore and keep a local copy
+        try:
+            document = self.remote.get(collection_name, doc_id)
+        except Exception as e:
+            logger.error(f"Read-through of {collection_name}/{doc_id} failed: {e}")
+            return None
+        if document is not None:
+            self.stats['read_through'] += 1
+            self._import(collection_name, [document])
+        return document
+
+    def all(self, collection_name):
+        if self.remote is not None and not self._is_hydrated(collection_name):
+            self.hydrate(collection_name)
+        rows = self._conn().execute('SELECT doc_id, data FROM documents WHERE collection = ?', (collection_name,))
+        return [_serialize(doc_id, json.loads(data)) for doc_id, data in rows]
+
+    def find(self, collection_name, field, value):
+        if self.remote is not None and not self._is_hydrated(collection_name):
+            self.hydrate(collection_name)
+        rows = self._conn().execute(
+            'SELECT doc_id, data FROM documents WHERE collection = ? AND json_extract(data, ?) = ?',
+            (collection_name, '$.' + field, value))
+        return [_serialize(doc_id, json.loads(data)) for doc_id, data in rows]
+
+    def top(self, collection_name, field, limit):
+        if self.remote is not None and not self._is_hydrated(collection_name):
+            self.hydrate(collection_name)
+        path = '$.' + field
+        # Like Firestore's order_by: documents without a numeric value are left out, ties by ID
+        rows = self._conn().execute(
+            "SELECT doc_id, data FROM documents WHERE collection = ? AND json_type(data, ?) IN ('integer', 'real') "
+            'ORDER BY json_extract(data, ?) DESC, doc_id LIMIT ?',
+            (collection_name, path, path, limit))
+        return [_serialize(doc_id, json.loads(data)) for doc_id, data in rows]
+
+    def _is_hydrated(self, collection_name):
+        return self._conn().execute('SELECT 1 FROM hydrated WHERE collection = ?',
+                                    (collection_name,)).fetchone() is not None
+
+    def hydrate(self, collection_name):
+        """
+        One-time import of a collection from Firestore into the local store. Documents
+        already written locally win. Returns False if Firestore could not be reached.
+        """
+        with self._hydrate_lock:
+            if self._is_hydrated(collection_name):
+                return True
+            return self._hydrate(collection_name)
+
+    def _hydrate(self, collection_name):
+        try:
+            documents = self.remote.all(collection_name)
+        except Exception as e:
+            logger.error(f"Could not import '{collection_name}' from Firestore, serving local data only: {e}")
+            return False
+        self._import(collection_name, documents)
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO hydrated (collection, hydrated_at) VALUES (?, ?)',
+                         (collection_name, time.time()))
+        logger.info(f"Imported {len(documents)} '{collection_name}' documents from Firestore")
+        return True
+
+    def _import(self, collection_name, documents):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO documents (collection, doc_id, data, updated_at) VALUES (?, ?, ?, ?)',
+                [(collection_name, document['id'],
+                  json.dumps({k: v for k, v in document.items() if k != 'id'}, default=str), now)
+                 for document in documents])
+
+    # --- Writes ---
+    def set(self, collection_name, doc_id, data):
+        self._apply([(collection_name, doc_id, OP_SET, data)])
+        return _serialize(doc_id, data)
+
+    def write_batch(self, writes):
+        self._apply([(collection_name, doc_id, OP_MERGE, fields) for collection_name, doc_id, fields in writes])
+
+    def delete(self, collection_name, doc_id):
+        self._apply([(collection_name, doc_id, OP_DELETE, None)])
+
+    def _apply(self, ops):
+        """Apply writes to the documents table and append them to the outbox in one transaction"""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            for collection_name, doc_id, op, data in ops:
+                if op == OP_DELETE:
+                    conn.execute('DELETE FROM documents WHERE collection = ? AND doc_id = ?',
+                                 (collection_name, doc_id))
+                else:
+                    stored = data
+                    if op == OP_MERGE:
+                        row = conn.execute('SELECT data FROM documents WHERE collection = ? AND doc_id = ?',
+                                           (collection_name, doc_id)).fetchone()
+                        stored = {**json.loads(row[0]), **data} if row else data
+                    conn.execute('INSERT OR REPLACE INTO documents (collection, doc_id, data, updated_at) '
+                                 'VALUES (?, ?, ?, ?)',
+                                 (collection_name, doc_id, json.dumps(stored, default=str), now))
+                conn.execute('INSERT INTO outbox (collection, doc_id, op, data, created_at) VALUES (?, ?, ?, ?, ?)',
+                             (collection_name, doc_id, op,
+                              json.dumps(data, default=str) if data is not None else None, now))
+
+    # --- Replication ---
+    def start_replication(self):
+        """Start the background thread that drains the outbox into Firestore"""
+        if self.remote is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._replication_loop, name='storage-replication', daemon=True)
+        self._thread.start()
+
+    def replicate_once(self):
+        """
+        Send up to MAX_BATCH_WRITES outbox rows to Firestore and delete them once committed.
+
+        Returns:
+        - Number of outbox rows replicated
+        """
+        conn = self._conn()
+        rows = conn.execute('SELECT id, collection, doc_id, op, data FROM outbox ORDER BY id LIMIT ?',
+                            (MAX_BATCH_WRITES,)).fetchall()
+        if not rows:
+            return 0
+
+        ops = fold_ops([(collection_name, doc_id, op, json.loads(data) if data is not None else None)
+                        for _, collection_name, doc_id, op, data in rows])
+        last_id = rows[-1][0]
+        try:
+            self.remote.commit(ops)
+        except Exception:
+            with conn:
+                conn.execute('UPDATE outbox SET attempts = attempts + 1 WHERE id <= ?', (last_id,))
+            raise
+
+        with conn:
+            conn.execute('DELETE FROM outbox WHERE id <= ?', (last_id,))
+        self.stats['replicated'] += len(rows)
+        self.stats['batches'] += 1
+        return len(rows)
+
+    def _replication_loop(self):
+        logger.info("Starting storage replication to Firestore.")
+        delay = REPLICATION_INTERVAL
+        while True:
+            try:
+                replicated = self.replicate_once()
+                delay = REPLICATION_INTERVAL
+                if replicated == MAX_BATCH_WRITES:
+                    continue  # More waiting; don't sleep
+            except Exception as e:
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(e)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                logger.error(f"Replication to Firestore failed, retrying in {delay:.0f}s: {e}")
+            time.sleep(delay)
+
+    def metrics(self):
+        depth, oldest = self._conn().execute('SELECT COUNT(*), MIN(created_at) FROM outbox').fetchone()
+        return {
+            'backend': 'sqlite',
+            'outbox_depth': depth,
+            'replication_lag': time.time() - oldest if oldest is not None else 0.0,
+            **self.stats,
+        }
+
+
+def create_storage(url, firestore_client):
+    """Create a storage backend from a STORAGE_URL"""
+    remote = FirestoreStorage(firestore_client) if firestore_client is not None else None
+    if not url or url.startswith('firestore://'):
+        return remote
+    if url.startswith('sqlite:///'):
+        return SqliteStorage(url[len('sqlite:///'):], remote)
+    raise ValueError(f"Unsupported STORAGE_URL: {url}")
+
+# ======= Module interface =======
+def init_storage(firestore_client, url=None):
+    """
+    Initialize the storage backend and, for local-first storage, start replication.
+
+    Args:
+        firestore_client: Firestore client used directly or as the replication target.
+        url (str): Storage URL; defaults to the STORAGE_URL environment variable.
+    """
+    global backend
+    backend = create_storage(url if url is not None else os.environ.get('STORAGE_URL'), firestore_client)
+    if backend.local:
+        backend.start_replication()
+    logger.info(f"Storage initialized with {type(backend).__name__}")
+
+def get_document(collection_name, doc_id):
+    """Return a document as a dict (with 'id'), or None"""
+    return backend.get(collection_name, doc_id)
+
+def all_documents(collection_name):
+    """Return every document of a collection"""
+    return backend.all(collection_name)
+
+def find_documents(collection_name, field, value):
+    """Return the documents of a collection whose field equals value"""
+    return backend.find(collection_name, field, value)
+
+def top_documents(collection_name, field, limit):
+    """Return up to limit documents ordered by a numeric field, highest first"""
+    return backend.top(collection_name, field, limit)
+
+def set_document(collection_name, doc_id, data):
+    """Create or replace a document; returns it as the models would"""
+    return backend.set(collection_name, doc_id, data)
+
+def write_batch(writes):
+    """Merge [(collection, doc_id, fields), ...] into their documents"""
+    backend.write_batch(writes)
+
+def delete_document(collection_name, doc_id):
+    """Delete a document"""
+    backend.delete(collection_name, doc_id)
+
+def metrics():
+    """Return backend and replication metrics"""
+    return backend.metrics()
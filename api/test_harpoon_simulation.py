@@ -22,6 +22,7 @@ try:
     import projectile_manager
     import harpoon_handler
     import simulations # Needed by projectile_manager
+    from player_store import PlayerStore
 except ImportError as e:
     print(f"Error importing modules: {e}")
     print(f"Attempted to add '{api_dir}' to path.")
@@ -103,7 +104,8 @@ class MockSocketIO:
 mock_socketio = MockSocketIO()
 
 # Mock Player Data (modify positions to test hit/miss)
-mock_players = {
+mock_players = PlayerStore()
+mock_players.update({
     "player_shooter": {
         "id": "player_shooter",
         "name": "Shooter",
@@ -124,7 +126,7 @@ mock_players = {
         "active": True,
         "position": {'x': args.sx + 100, 'y': args.sy, 'z': args.sz + 100},
     }
-}
+})
 
 class MockPlayerHandler:
     """Simulates Player Handler for testing status effect application."""
@@ -0,0 +1,65 @@
+"""
+Tests for input_mailbox.py: latest-wins coalescing of position updates and
+sequence-number ordering, including 32-bit wrap-around.
+
+Run with: python -m pytest test_input_mailbox.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import input_mailbox
+
+@pytest.fixture(autouse=True)
+def empty_mailbox():
+    input_mailbox.pending.clear()
+    input_mailbox.last_seq.clear()
+    for key in input_mailbox.stats:
+        input_mailbox.stats[key] = 0
+    yield
+
+def test_latest_update_wins_within_a_tick():
+    input_mailbox.submit('p1', {'x': 1, 'seq': 1})
+    input_mailbox.submit('p1', {'x': 2, 'seq': 2})
+    input_mailbox.submit('p2', {'x': 9, 'seq': 1})
+
+    assert dict(input_mailbox.drain()) == {'p1': {'x': 2, 'seq': 2}, 'p2': {'x': 9, 'seq': 1}}
+    assert input_mailbox.stats['coalesced'] == 1
+    assert input_mailbox.drain() == []
+
+def test_out_of_order_packets_are_dropped():
+    assert input_mailbox.submit('p1', {'x': 3, 'seq': 3})
+    assert not input_mailbox.submit('p1', {'x': 2, 'seq': 2})
+    assert not input_mailbox.submit('p1', {'x': 3, 'seq': 3})  # Duplicate
+
+    assert input_mailbox.drain() == [('p1', {'x': 3, 'seq': 3})]
+    assert input_mailbox.stats['stale'] == 2
+
+    # Ordering holds across ticks, not only within one
+    assert not input_mailbox.submit('p1', {'x': 1, 'seq': 1})
+    assert input_mailbox.submit('p1', {'x': 4, 'seq': 4})
+
+def test_sequence_numbers_wrap_around():
+    last = input_mailbox.SEQ_MODULUS - 1
+    assert input_mailbox.submit('p1', {'seq': last})
+    assert input_mailbox.submit('p1', {'seq': 0})
+    assert not input_mailbox.submit('p1', {'seq': last})
+
+    assert input_mailbox.is_newer(5, last)
+    assert not input_mailbox.is_newer(last, 5)
+
+def test_updates_without_seq_are_accepted_in_arrival_order():
+    assert input_mailbox.submit('p1', {'x': 1, 'seq': 10})
+    assert input_mailbox.submit('p1', {'x': 2})
+    assert input_mailbox.drain() == [('p1', {'x': 2})]
+
+def test_forgotten_player_starts_a_new_sequence():
+    input_mailbox.submit('p1', {'seq': 100})
+    input_mailbox.forget_player('p1')
+
+    assert input_mailbox.drain() == []
+    assert input_mailbox.submit('p1', {'seq': 1})
@@ -0,0 +1,121 @@
+"""
+Tests for journal.py: records that were synced but not confirmed survive a
+crash and are handed back for replay on the next start, in order, while
+confirmed records and a torn last line are dropped. The last test replays a
+crashed run's player updates through write_behind into local storage.
+
+Run with: python -m pytest test_journal.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import journal
+
+def reset_journal():
+    """Forget the open journal without compacting it, as a crashed process would"""
+    if journal._file is not None:
+        journal._file.close()
+    journal._file = None
+    journal._path = None
+    journal._next_seq = 1
+    journal._unsynced = False
+    journal._confirmed_since_compaction = 0
+    journal._last_compaction = 0.0
+    journal.unconfirmed.clear()
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal.atexit, 'register', lambda callback: None)
+    reset_journal()
+    yield str(tmp_path / 'mutations.journal')
+    reset_journal()
+
+def test_unconfirmed_records_are_replayed_after_a_crash(path):
+    assert journal.init_journal(path) == []
+    first = journal.record('update', collection='players', doc_id='p1', fields={'fishCount': 1})
+    second = journal.record('item', player_id='p1', item_id='i1')
+    third = journal.record('update', collection='players', doc_id='p2', fields={'money': 5})
+    journal.sync()
+    journal.confirm([second])
+
+    # Until the next compaction the confirmed record is still on disk; replaying it is harmless
+    reset_journal()  # Crash
+    assert [record['seq'] for record in journal.init_journal(path)] == [first, second, third]
+
+    journal.confirm([second])
+    journal.compact()
+    reset_journal()  # Crash
+    records = journal.init_journal(path)
+
+    assert [record['seq'] for record in records] == [first, third]
+    assert records[0] == {'seq': first, 'kind': 'update', 'collection': 'players',
+                          'doc_id': 'p1', 'fields': {'fishCount': 1}}
+    assert journal.stats['replayed'] == 2
+
+    # Sequence numbers continue after the replayed ones
+    assert journal.record('update', collection='players', doc_id='p3', fields={}) == third + 1
+
+def test_torn_last_line_is_ignored(path):
+    journal.init_journal(path)
+    seq = journal.record('update', collection='players', doc_id='p1', fields={'health': 50})
+    journal.sync()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"seq": 2, "kind": "upd')  # Crash mid-append
+
+    reset_journal()
+    assert [record['seq'] for record in journal.init_journal(path)] == [seq]
+
+    # The rewrite on open dropped the torn line, so new records start on a clean line
+    journal.record('update', collection='players', doc_id='p2', fields={})
+    journal.sync()
+    reset_journal()
+    assert [record['doc_id'] for record in journal.init_journal(path)] == ['p1', 'p2']
+
+def test_compaction_drops_confirmed_records(path):
+    journal.init_journal(path)
+    seqs = [journal.record('update', collection='players', doc_id=f'p{i}', fields={}) for i in range(4)]
+    journal.sync()
+    journal.confirm(seqs[:3])
+    journal.compact()
+
+    with open(path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    assert journal.metrics()['unconfirmed'] == 1
+
+def test_disabled_journal_records_nothing():
+    reset_journal()
+    assert journal.record('update', collection='players', doc_id='p1', fields={}) is None
+    journal.sync()
+    journal.confirm([None])
+
+def test_write_behind_replays_a_crashed_run(path, tmp_path, monkeypatch):
+    pytest.importorskip('firebase_admin')  # storage imports the Firestore models
+    import storage
+    import write_behind
+
+    monkeypatch.setattr(storage, 'backend', storage.SqliteStorage(str(tmp_path / 'storage.db')))
+    write_behind.dirty.clear()
+    write_behind.dirty_since.clear()
+    write_behind.dirty_seqs.clear()
+
+    journal.init_journal(path)
+    write_behind.update('players', 'p1', fishCount=3)
+    write_behind.update('players', 'p1', money=10)
+    journal.sync()
+
+    # Crash before the flush: the buffered writes are gone, the journal is not
+    write_behind.dirty.clear()
+    write_behind.dirty_since.clear()
+    write_behind.dirty_seqs.clear()
+    reset_journal()
+
+    assert write_behind.replay(journal.init_journal(path)) == 2
+    assert write_behind.flush() == 1
+    stored = storage.get_document('players', 'p1')
+    assert stored['fishCount'] == 3 and stored['money'] == 10
+    assert journal.metrics()['unconfirmed'] == 0
@@ -0,0 +1,184 @@
+"""
+Tests for leaderboards.py: the in-memory rankings follow stat changes the way
+the Firestore order_by query ranked players, and broadcasts send versioned
+diffs that rebuild the full leaderboard on the client.
+
+Run with: python -m pytest test_leaderboards.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import leaderboards
+import tick_bundler
+
+def player(name, fish=None, kills=None, money=None):
+    return {'name': name, 'color': 'red', 'fishCount': fish, 'monsterKills': kills, 'money': money}
+
+@pytest.fixture(autouse=True)
+def seeded():
+    leaderboards.init_leaderboards({
+        'p1': player('Anne', fish=10, kills=1, money=5),
+        'p2': player('Bart', fish=30, kills=2),
+        'p3': player('Cleo', fish=20),
+    })
+    for key in leaderboards.stats:
+        leaderboards.stats[key] = 0
+    leaderboards.broadcast_state['version'] = 0
+    leaderboards.broadcast_state['last_sent_at'] = 0.0
+    yield
+
+@pytest.fixture
+def clients(monkeypatch):
+    """One client that applies diffs and one that takes full copies"""
+    monkeypatch.setattr(tick_bundler, 'broadcast_relay', None)
+    tick_bundler.sessions.clear()
+    tick_bundler.register_session('diff', 'p1', [tick_bundler.CAPABILITY_LEADERBOARD_DIFF])
+    tick_bundler.register_session('full', 'p2')
+    yield
+    tick_bundler.sessions.clear()
+
+def queued(sid):
+    """Take the events queued for a session, in order"""
+    events = [(event, data) for queue in tick_bundler.sessions[sid]['queues'] for event, data, _ in queue.values()]
+    for queue in tick_bundler.sessions[sid]['queues']:
+        queue.clear()
+    return events
+
+def apply_diff(state, diff):
+    """What applyLeaderboardDiff in src/core/network.js does with a leaderboard_diff"""
+    assert diff['version'] == state['version'] + 1
+    next_state = {**state, 'version': diff['version']}
+    for category, change in diff['changes'].items():
+        if 'entries' in change:
+            next_state[category] = change['entries']
+            continue
+        entries = list(state.get(category, []))[:change['length']]
+        for rank, entry in change['changed']:
+            if rank < len(entries):
+                entries[rank] = entry
+            else:
+                entries.append(entry)
+        next_state[category] = entries
+    return next_state
+
+def broadcast_now():
+    leaderboards.broadcast_state['last_sent_at'] = 0.0
+    leaderboards.broadcast(tick=1)
+
+def names(category):
+    return [entry['name'] for entry in leaderboards.top(category)]
+
+def test_seed_is_ranked_highest_first():
+    assert names('fishCount') == ['Bart', 'Cleo', 'Anne']
+    assert leaderboards.top('fishCount')[0] == {'name': 'Bart', 'value': 30, 'color': 'red'}
+    # Players without a numeric stat are left out
+    assert names('money') == ['Anne']
+
+def test_stat_change_moves_player():
+    leaderboards.update_player('p1', player('Anne', fish=40, kills=1, money=5))
+    assert names('fishCount') == ['Anne', 'Bart', 'Cleo']
+
+    leaderboards.update_player('p1', player('Anne', fish=0, kills=1, money=5))
+    assert names('fishCount') == ['Bart', 'Cleo', 'Anne']
+
+def test_ties_are_ordered_by_player_id():
+    leaderboards.update_player('p4', player('Dora', fish=20))
+    assert names('fishCount') == ['Bart', 'Cleo', 'Dora', 'Anne']
+
+def test_new_player_outside_seed_climbs_by_playing():
+    leaderboards.update_player('p9', player('Zed', fish=1))
+    assert names('fishCount')[-1] == 'Zed'
+
+    leaderboards.update_player('p9', player('Zed', fish=99))
+    assert names('fishCount')[0] == 'Zed'
+
+def test_removed_stat_drops_player():
+    leaderboards.update_player('p1', player('Anne', fish=10, kills=1, money=None))
+    assert names('money') == []
+
+def test_only_visible_changes_mark_dirty(monkeypatch):
+    monkeypatch.setattr(leaderboards, 'DEFAULT_LIMIT', 2)
+    leaderboards.broadcast_state['dirty'] = False
+
+    assert not leaderboards.set_value('fishCount', 'p1', 11)  # Still third, not shown
+    assert not leaderboards.broadcast_state['dirty']
+
+    assert leaderboards.set_value('fishCount', 'p1', 25)  # Climbs into the top 2
+    assert leaderboards.broadcast_state['dirty']
+
+def test_rename_of_listed_player_marks_dirty():
+    leaderboards.broadcast_state['dirty'] = False
+    leaderboards.update_player('p2', player('Bartholomew', fish=30, kills=2))
+
+    assert leaderboards.broadcast_state['dirty']
+    assert names('fishCount')[0] == 'Bartholomew'
+
+def test_diff_sends_only_changed_ranks():
+    previous = leaderboards.combined()
+    leaderboards.update_player('p3', player('Cleo', fish=25))
+    changes = leaderboards.diff(previous, leaderboards.combined())
+
+    assert list(changes) == ['fishCount']
+    assert changes['fishCount'] == {'length': 3, 'changed': [[1, {'name': 'Cleo', 'value': 25, 'color': 'red'}]]}
+
+def test_diff_sends_whole_category_when_every_rank_changed():
+    previous = leaderboards.combined()
+    leaderboards.update_player('p4', player('Dora', fish=99))
+    changes = leaderboards.diff(previous, leaderboards.combined())
+
+    assert changes['fishCount'] == {'entries': leaderboards.top('fishCount')}
+
+def test_diff_reports_shorter_category():
+    previous = leaderboards.combined()
+    leaderboards.update_player('p1', player('Anne', fish=10, kills=1, money=None))
+    assert leaderboards.diff(previous, leaderboards.combined())['money'] == {'length': 0, 'changed': []}
+
+def test_broadcast_versions_rebuild_the_leaderboard(clients):
+    client_state = leaderboards.full_copy()
+    assert client_state['version'] == 0
+
+    for fish in (25, 35, 5):
+        leaderboards.update_player('p3', player('Cleo', fish=fish))
+        broadcast_now()
+
+        (event, diff), = queued('diff')
+        assert event == 'leaderboard_diff'
+        client_state = apply_diff(client_state, diff)
+        assert client_state == {**leaderboards.combined(), 'version': diff['version']}
+
+        (event, full), = queued('full')
+        assert event == 'leaderboard_update'
+        assert full == client_state
+
+    assert client_state['version'] == 3
+    assert leaderboards.full_copy() == client_state
+
+def test_broadcast_is_rate_limited_and_keeps_changes(clients):
+    leaderboards.update_player('p3', player('Cleo', fish=25))
+    broadcast_now()
+    queued('diff')
+
+    leaderboards.update_player('p3', player('Cleo', fish=35))
+    leaderboards.broadcast(tick=2)  # Within BROADCAST_INTERVAL of the last one
+    assert queued('diff') == []
+    assert leaderboards.broadcast_state['dirty']
+    # A client joining meanwhile gets what the others hold, and the change with the next diff
+    assert leaderboards.full_copy()['fishCount'][0]['value'] == 30
+
+    broadcast_now()
+    (_, diff), = queued('diff')
+    assert diff['version'] == 2
+
+def test_broadcast_without_visible_change_is_skipped(clients):
+    leaderboards.update_player('p3', player('Cleo', fish=25))
+    leaderboards.update_player('p3', player('Cleo', fish=20))  # Back where it was
+    broadcast_now()
+
+    assert queued('diff') == [] and queued('full') == []
+    assert leaderboards.stats['skipped'] == 1
+    assert leaderboards.broadcast_state['version'] == 0
@@ -0,0 +1,71 @@
+"""
+Tests for player_store.py: the active-player index and least-recently-used
+eviction of inactive players.
+
+Run with: python -m pytest test_player_store.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from player_store import PlayerStore
+
+def player(active):
+    return {'name': 'Sailor', 'active': active}
+
+def test_active_index_follows_assignments_and_set_active():
+    players = PlayerStore(max_inactive=10)
+    players['p1'] = player(True)
+    players['p2'] = player(False)
+
+    assert players.active_ids == {'p1'}
+    assert players.active_count() == 1
+    assert players.active_items() == [('p1', players['p1'])]
+
+    players.set_active('p2', True)
+    players.set_active('p1', False)
+    assert players.active_ids == {'p2'}
+    assert players['p1']['active'] is False
+    assert list(players.inactive) == ['p1']
+
+def test_inactive_players_are_evicted_least_recently_used_first():
+    players = PlayerStore(max_inactive=2)
+    for player_id in ('p1', 'p2', 'p3'):
+        players[player_id] = player(True)
+    players.set_active('p1', False)
+    players.set_active('p2', False)
+    players.set_active('p1', True)   # Reconnects: no longer evictable
+    players.set_active('p1', False)  # And leaves again, now the most recent
+    players.set_active('p3', False)
+
+    assert 'p2' not in players
+    assert list(players.inactive) == ['p1', 'p3']
+    assert players.stats['evictions'] == 1
+
+def test_active_players_are_never_evicted():
+    players = PlayerStore(max_inactive=1)
+    for i in range(5):
+        players[f'active{i}'] = player(True)
+    for i in range(5):
+        players[f'inactive{i}'] = player(False)
+
+    assert players.active_count() == 5
+    assert all(f'active{i}' in players for i in range(5))
+    assert [player_id for player_id in players if player_id.startswith('inactive')] == ['inactive4']
+    assert players.metrics() == {'evictions': 4, 'cached': 6, 'active': 5, 'inactive': 1, 'max_inactive': 1}
+
+def test_removal_keeps_indexes_consistent():
+    players = PlayerStore(max_inactive=10)
+    players.update({'p1': player(True), 'p2': player(False)})
+
+    del players['p1']
+    assert players.pop('p2')['active'] is False
+    assert players.pop('missing', None) is None
+    assert players.active_ids == set() and len(players.inactive) == 0
+
+    # Evicting after a removal must not trip over the removed entry
+    players.max_inactive = 0
+    players['p3'] = player(False)
+    assert 'p3' not in players
@@ -0,0 +1,144 @@
+"""
+Tests for tick_bundler.py: collapsing of keyed events, flush order by priority
+class, and backpressure (cosmetic shedding, congested transports, the memory
+budget).
+
+Run with: python -m pytest test_tick_bundler.py
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tick_bundler
+
+class RecordingSocketIO:
+    """Records what flush_tick emits instead of sending it"""
+
+    def __init__(self):
+        self.emitted = []
+        self.disconnected = []
+        self.server = SimpleNamespace(disconnect=lambda sid, namespace=None: self.disconnected.append(sid))
+
+    def emit(self, event, data, room=None):
+        self.emitted.append((room, event, data))
+
+    def frames(self, sid):
+        return [(event, data) for room, event, data in self.emitted if room == sid]
+
+@pytest.fixture(autouse=True)
+def bundler(monkeypatch):
+    socketio = RecordingSocketIO()
+    monkeypatch.setattr(tick_bundler, 'socketio', socketio)
+    monkeypatch.setattr(tick_bundler, 'broadcast_relay', None)
+    monkeypatch.setattr(tick_bundler, 'transport_backlog', lambda sid: 0)
+    monkeypatch.setattr(tick_bundler, 'tick_hooks', [])
+    tick_bundler.sessions.clear()
+    yield socketio
+    tick_bundler.sessions.clear()
+
+def bundled_events(socketio, sid):
+    """Events of the world_tick frames sent to a bundled client, in order"""
+    return [tuple(item) for event, data in socketio.frames(sid) for item in data['events']]
+
+def test_keyed_events_collapse_and_dicts_merge(bundler):
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    tick_bundler.queue_event('player_moved', {'id': 'p2', 'position': 1}, key=('player_moved', 'p2'))
+    tick_bundler.queue_event('player_moved', {'id': 'p2', 'position': 2}, key=('player_moved', 'p2'))
+    tick_bundler.queue_event('player_updated', {'id': 'p2', 'name': 'Jack'}, key=('player_updated', 'p2'))
+    tick_bundler.queue_event('player_updated', {'id': 'p2', 'color': 'red'}, key=('player_updated', 'p2'))
+    tick_bundler.queue_event('new_message', {'text': 'a'})
+    tick_bundler.queue_event('new_message', {'text': 'b'})
+    tick_bundler.flush_tick()
+
+    assert len(bundler.frames('s1')) == 1  # One frame per tick
+    assert bundled_events(bundler, 's1') == [
+        ('player_moved', {'id': 'p2', 'position': 2}),
+        ('player_updated', {'id': 'p2', 'name': 'Jack', 'color': 'red'}),
+        ('new_message', {'text': 'a'}),
+        ('new_message', {'text': 'b'}),
+    ]
+    assert tick_bundler.sessions['s1']['queued_bytes'] == 0
+
+def test_priority_classes_flush_in_order(bundler):
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    tick_bundler.queue_event('new_message', {'text': 'hi'})
+    tick_bundler.queue_event('player_moved', {'id': 'p2'})
+    tick_bundler.queue_event('server_cannon_hit', {'target': 'p1'})
+    tick_bundler.flush_tick()
+
+    assert [event for event, _ in bundled_events(bundler, 's1')] == \
+        ['server_cannon_hit', 'player_moved', 'new_message']
+
+def test_targets_and_exclude(bundler):
+    tick_bundler.register_session('s1', 'p1')
+    tick_bundler.register_session('s2', 'p2')
+    tick_bundler.queue_event('player_updated', {'id': 'p1'}, exclude='s1')
+    tick_bundler.queue_event('inventory_updated', {'id': 'p2'}, to='s2')
+    tick_bundler.flush_tick()
+
+    # Sessions without the world_tick capability get one frame per event
+    assert bundler.frames('s1') == []
+    assert bundler.frames('s2') == [('inventory_updated', {'id': 'p2'}), ('player_updated', {'id': 'p1'})]
+
+def test_flush_limit_leaves_client_behind_and_sheds_cosmetic(bundler, monkeypatch):
+    monkeypatch.setattr(tick_bundler, 'MAX_EVENTS_PER_FLUSH', 2)
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    for i in range(tick_bundler.COSMETIC_KEEP_WHEN_BEHIND + 5):
+        tick_bundler.queue_event('new_message', {'text': i})
+    tick_bundler.queue_event('cannon_fired', {'id': 'c1'})
+    tick_bundler.flush_tick()
+
+    session = tick_bundler.sessions['s1']
+    assert session['behind']
+    assert [event for event, _ in bundled_events(bundler, 's1')] == ['cannon_fired', 'new_message']
+
+    # Behind: only the newest COSMETIC_KEEP_WHEN_BEHIND chat events survive the next flush
+    tick_bundler.flush_tick()
+    remaining = [data['text'] for _, data, _ in session['queues'][tick_bundler.PRIORITY_COSMETIC].values()]
+    assert len(remaining) == tick_bundler.COSMETIC_KEEP_WHEN_BEHIND - 2
+    assert remaining[-1] == tick_bundler.COSMETIC_KEEP_WHEN_BEHIND + 4
+    assert session['dropped'] == 4
+
+def test_congested_transport_only_gets_combat(bundler, monkeypatch):
+    monkeypatch.setattr(tick_bundler, 'transport_backlog', lambda sid: tick_bundler.TRANSPORT_BACKLOG_LIMIT + 1)
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    tick_bundler.queue_event('player_moved', {'id': 'p2', 'position': 1}, key=('player_moved', 'p2'))
+    tick_bundler.queue_event('server_cannon_hit', {'target': 'p1'})
+    tick_bundler.flush_tick()
+
+    assert [event for event, _ in bundled_events(bundler, 's1')] == ['server_cannon_hit']
+    assert tick_bundler.sessions['s1']['behind']
+
+    # Movement kept collapsing while congested and goes out once the transport drains
+    tick_bundler.queue_event('player_moved', {'id': 'p2', 'position': 2}, key=('player_moved', 'p2'))
+    monkeypatch.setattr(tick_bundler, 'transport_backlog', lambda sid: 0)
+    tick_bundler.flush_tick()
+    assert bundled_events(bundler, 's1')[-1] == ('player_moved', {'id': 'p2', 'position': 2})
+    assert not tick_bundler.sessions['s1']['behind']
+
+def test_client_over_memory_budget_is_disconnected(bundler, monkeypatch):
+    monkeypatch.setattr(tick_bundler, 'MEMORY_BUDGET_BYTES', 100)
+    monkeypatch.setattr(tick_bundler, 'OVER_BUDGET_GRACE', 0.0)
+    monkeypatch.setattr(tick_bundler, 'MAX_EVENTS_PER_FLUSH', 1)
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    for i in range(20):
+        tick_bundler.queue_event('player_moved', {'id': f'p{i}', 'position': {'x': i, 'y': 0, 'z': i}})
+
+    tick_bundler.flush_tick()  # Goes over budget
+    assert 's1' in tick_bundler.sessions
+    tick_bundler.flush_tick()  # Still over budget after the grace period
+    assert 's1' not in tick_bundler.sessions
+    assert bundler.disconnected == ['s1']
+
+def test_hooks_run_before_flush(bundler):
+    tick_bundler.register_session('s1', 'p1', [tick_bundler.CAPABILITY_WORLD_TICK])
+    tick_bundler.register_tick_hook(lambda tick: tick_bundler.queue_event('player_moved', {'tick': tick}))
+    tick_bundler.flush_tick()
+
+    frame = bundler.frames('s1')[0][1]
+    assert frame['events'] == [['player_moved', {'tick': frame['tick']}]]
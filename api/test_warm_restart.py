@@ -0,0 +1,76 @@
+"""
+Tests for warm_restart.py: a snapshot written on shutdown is read back on boot, and a
+player who rejoins afterwards gets their in-flight session back.
+
+Run with: python -m pytest test_warm_restart.py
+"""
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import warm_restart
+
+def stored_player(last_update):
+    """A player as storage.get_document returns it: timestamps serialized with str()"""
+    return {
+        'id': 'firebase_p1',
+        'name': 'Sailor',
+        'position': {'x': 0, 'y': 0, 'z': 0},
+        'rotation': 0,
+        'fishCount': 7,
+        'last_update': str(last_update),
+    }
+
+def restore(tmp_path, sessions):
+    """Write a snapshot holding the given sessions, load it and keep its sessions, like a reboot"""
+    path = str(tmp_path / 'world_snapshot.bin')
+    payload = json.dumps({'sessions': sessions}).encode('utf-8')
+    warm_restart.write_snapshot(payload, path=path)
+    state = warm_restart.load_snapshot(path=path)
+    warm_restart.restored_sessions.clear()
+    warm_restart.keep_sessions(state['sessions'])
+
+def test_rejoin_after_restore_applies_newer_session(tmp_path):
+    now = time.time()
+    session = {'position': {'x': 120.5, 'y': 0, 'z': -40.0}, 'rotation': 1.5, 'mode': 'boat', 'last_update': now}
+    restore(tmp_path, {'firebase_p1': session})
+
+    player = stored_player(now - 30)
+    assert warm_restart.apply_session('firebase_p1', player)
+    assert player['position'] == session['position']
+    assert player['rotation'] == 1.5
+    assert player['fishCount'] == 7  # Persistent fields still come from storage
+
+    # A session is applied once; a later rejoin uses storage only
+    assert not warm_restart.apply_session('firebase_p1', stored_player(now - 30))
+
+def test_rejoin_keeps_newer_stored_position(tmp_path):
+    now = time.time()
+    restore(tmp_path, {'firebase_p1': {'position': {'x': 1, 'y': 0, 'z': 1}, 'last_update': now - 30}})
+
+    player = stored_player(now)
+    assert not warm_restart.apply_session('firebase_p1', player)
+    assert player['position'] == {'x': 0, 'y': 0, 'z': 0}
+
+def test_rejoin_with_unparseable_stored_timestamp(tmp_path):
+    restore(tmp_path, {'firebase_p1': {'position': {'x': 5, 'y': 0, 'z': 5}, 'last_update': time.time()}})
+
+    player = stored_player(None)
+    player['last_update'] = '2026-10-16 18:00:00+00:00'  # str() of a Firestore timestamp
+    assert warm_restart.apply_session('firebase_p1', player)
+    assert player['position'] == {'x': 5, 'y': 0, 'z': 5}
+
+def test_stale_or_corrupt_snapshot_is_ignored(tmp_path):
+    path = str(tmp_path / 'world_snapshot.bin')
+    warm_restart.write_snapshot(b'{"sessions": {}}', path=path)
+    assert warm_restart.load_snapshot(path=path, max_age=-1) is None
+
+    with open(path, 'r+b') as f:
+        f.seek(warm_restart.HEADER.size)
+        f.write(b'\x00\x00')
+    assert warm_restart.load_snapshot(path=path) is None
+    assert warm_restart.load_snapshot(path=str(tmp_path / 'missing.bin')) is None
@@ -0,0 +1,93 @@
+"""
+Tests for write_behind.py: repeated writes to a document coalesce into one
+pending write, flushes commit them in batches to storage (the local SQLite
+backend, without a Firestore remote), and a failed commit is retried
+underneath newer writes.
+
+Run with: python -m pytest test_write_behind.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('firebase_admin')  # storage imports the Firestore models
+
+import storage
+import write_behind
+
+@pytest.fixture(autouse=True)
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'backend', storage.SqliteStorage(str(tmp_path / 'storage.db')))
+    write_behind.dirty.clear()
+    write_behind.dirty_since.clear()
+    write_behind.dirty_seqs.clear()
+    for key in write_behind.stats:
+        write_behind.stats[key] = 0
+    yield storage.backend
+
+class FailingOnce:
+    """A storage backend whose first commit fails"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.failed = False
+
+    def write_batch(self, writes):
+        if not self.failed:
+            self.failed = True
+            raise ConnectionError("Firestore unavailable")
+        self.backend.write_batch(writes)
+
+def test_writes_to_one_document_coalesce():
+    write_behind.update('players', 'p1', position={'x': 1}, health=100)
+    write_behind.update('players', 'p1', position={'x': 2})
+    write_behind.update('players', 'p1', name='Jack')
+    write_behind.update('players', 'p2', position={'x': 9})
+
+    assert len(write_behind.dirty) == 2
+    assert write_behind.stats['merged'] == 2
+    assert write_behind.pending_fields('players', 'p1') == {'position': {'x': 2}, 'health': 100, 'name': 'Jack'}
+
+    assert write_behind.flush() == 2
+    assert write_behind.stats['flushes'] == 1
+    stored = storage.get_document('players', 'p1')
+    assert stored['position'] == {'x': 2} and stored['health'] == 100 and stored['name'] == 'Jack'
+    assert write_behind.pending_fields('players', 'p1') == {}
+
+def test_flush_merges_into_stored_document():
+    storage.set_document('players', 'p1', {'name': 'Jack', 'fishCount': 3})
+    write_behind.update_player('p1', fishCount=4)
+    write_behind.flush()
+
+    stored = storage.get_document('players', 'p1')
+    assert stored['name'] == 'Jack' and stored['fishCount'] == 4
+    assert 'updated_at' in stored
+
+def test_flush_commits_in_batches(monkeypatch):
+    monkeypatch.setattr(write_behind, 'MAX_BATCH_WRITES', 2)
+    for i in range(5):
+        write_behind.update('players', f'p{i}', fishCount=i)
+
+    assert write_behind.flush() == 5
+    assert write_behind.stats['flushes'] == 3
+    assert write_behind.stats['max_batch_size'] == 2
+    assert storage.get_document('players', 'p4')['fishCount'] == 4
+
+def test_failed_commit_is_retried_under_newer_writes(local_storage, monkeypatch):
+    monkeypatch.setattr(storage, 'backend', FailingOnce(local_storage))
+    write_behind.update('players', 'p1', position={'x': 1}, health=50)
+
+    with pytest.raises(ConnectionError):
+        write_behind.flush()
+    assert write_behind.stats['failures'] == 1
+    assert write_behind.pending_fields('players', 'p1') == {'position': {'x': 1}, 'health': 50}
+
+    # A write made while the batch was failing wins over the requeued one
+    write_behind.update('players', 'p1', position={'x': 2})
+    assert write_behind.flush() == 1
+    stored = local_storage.get('players', 'p1')
+    assert stored['position'] == {'x': 2} and stored['health'] == 50
@@ -0,0 +1,362 @@
+"""
+Tick Bundler Module
+Collects outbound game events queued by the handlers and flushes them once per
+server tick, so each client receives at most one Socket.IO frame per tick.
+Repeated updates for the same entity within a tick are collapsed so only the
+latest state is sent.
+
+Each client has its own queue split into priority classes (combat, movement,
+cosmetic). Clients that fall behind get their cosmetic backlog shed and only
+combat events until they catch up; a client that stays over its memory budget
+is disconnected.
+"""
+
+import os
+import json
+import time
+import itertools
+import logging
+from collections import OrderedDict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+TICK_RATE = 20                  # Ticks per second
+TICK_INTERVAL = 1.0 / TICK_RATE  # 50ms between flushes
+TICK_TIME_HISTORY = 64          # Flush times remembered for round-trip measurement (~3s)
+BUNDLE_EVENT = 'world_tick'     # Event name of the bundled frame
+CAPABILITY_WORLD_TICK = 'world_tick'  # Capability a client announces at player_join to receive bundles
+CAPABILITY_DELTA_SNAPSHOTS = 'delta_snapshots'  # Client wants movement as acknowledged delta snapshots
+CAPABILITY_DEAD_RECKONING = 'dead_reckoning'  # Client extrapolates ships itself and sends updates only on drift
+CAPABILITY_LEADERBOARD_DIFF = 'leaderboard_diff'  # Client applies leaderboard_diff events instead of full copies
+SUPPORTED_CAPABILITIES = {CAPABILITY_WORLD_TICK, CAPABILITY_DELTA_SNAPSHOTS, CAPABILITY_DEAD_RECKONING,
+                          CAPABILITY_LEADERBOARD_DIFF}
+NAMESPACE = '/'
+
+# Priority classes, flushed in this order
+PRIORITY_COMBAT = 0
+PRIORITY_MOVEMENT = 1
+PRIORITY_COSMETIC = 2
+PRIORITY_NAMES = ('combat', 'movement', 'cosmetic')
+EVENT_PRIORITIES = {
+    'server_cannon_hit': PRIORITY_COMBAT,
+    'player_defeated': PRIORITY_COMBAT,
+    'player_respawned': PRIORITY_COMBAT,
+    'cannon_fired': PRIORITY_COMBAT,
+    'harpoon_hit_broadcast': PRIORITY_COMBAT,
+    'inventory_updated': PRIORITY_COMBAT,  # Acknowledges a mutation; never shed or held back
+    'player_moved': PRIORITY_MOVEMENT,
+    'snapshot': PRIORITY_MOVEMENT,
+    'player_entered_view': PRIORITY_MOVEMENT,
+    'player_left_view': PRIORITY_MOVEMENT,
+    'player_updated': PRIORITY_COSMETIC,
+    'player_achievement': PRIORITY_COSMETIC,
+    'leaderboard_update': PRIORITY_COSMETIC,
+    'leaderboard_diff': PRIORITY_COSMETIC,
+    'new_message': PRIORITY_COSMETIC,
+    'roster_joined': PRIORITY_COSMETIC,
+}
+DEFAULT_PRIORITY = PRIORITY_MOVEMENT
+
+# Backpressure
+MAX_EVENTS_PER_FLUSH = 256        # Anything beyond this stays queued and marks the client as behind
+TRANSPORT_BACKLOG_LIMIT = 2 * TICK_RATE  # Unsent Engine.IO packets (~2s of ticks) before a client counts as behind
+COSMETIC_KEEP_WHEN_BEHIND = 8     # Non-collapsible cosmetic events (chat, achievements) kept for a lagging client
+MEMORY_BUDGET_BYTES = int(os.environ.get('OUTBOUND_MEMORY_BUDGET', 512 * 1024))  # Per-client queued payload budget
+OVER_BUDGET_GRACE = float(os.environ.get('OUTBOUND_OVER_BUDGET_GRACE', 5.0))     # Seconds over budget before disconnecting
+
+# --- Module-level Data Structures ---
+# {sid: {'player_id': str, 'capabilities': set, 'bundled': bool, 'encoder': callable | None,
+#        'queues': [OrderedDict{key: (event, data, size)}, ...] one per priority class,
+#        'queued_bytes': int, 'behind': bool, 'over_budget_since': float | None, 'dropped': int}}
+sessions = {}
+tick_hooks = []   # Callables run at the start of every tick, before flushing: fn(tick)
+tick_count = 0
+tick_times = OrderedDict()  # {tick: time the tick was flushed}, last TICK_TIME_HISTORY ticks
+stats = {
+    'dropped': 0,        # Cosmetic events shed from lagging clients
+    'disconnected': 0,   # Clients disconnected for staying over the memory budget
+}
+_unique_keys = itertools.count()
+
+# --- Module-level References ---
+socketio = None
+broadcast_relay = None  # Set by shared_state in multi-worker mode: fn(event, data, key) forwards broadcasts
+
+def init_bundler(socketio_instance):
+    """
+    Initializes the tick bundler with the Socket.IO instance
+    and starts the tick loop.
+    """
+    global socketio
+    if socketio: # Prevent double initialization
+        logger.warning("Tick bundler already initialized.")
+        return
+
+    socketio = socketio_instance
+    start_tick_loop()
+    logger.info(f"Tick bundler initialized at {TICK_RATE} Hz.")
+
+def register_session(sid, player_id, capabilities=None):
+    """
+    Registers a client socket so that queued events are delivered to it.
+
+    Args:
+        sid (str): Socket ID of the client.
+        player_id (str): Player document ID controlled by the socket.
+        capabilities (iterable): Protocol features announced by the client at player_join.
+
+    Returns:
+        list: The capabilities the server accepted for this session.
+    """
+    accepted = set(capabilities or []) & SUPPORTED_CAPABILITIES
+    sessions[sid] = {
+        'player_id': player_id,
+        'capabilities': accepted,
+        'bundled': CAPABILITY_WORLD_TICK in accepted,
+        'encoder': None,
+        'queues': [OrderedDict() for _ in PRIORITY_NAMES],
+        'queued_bytes': 0,
+        'behind': False,
+        'over_budget_since': None,
+        'dropped': 0
+    }
+    return sorted(accepted)
+
+def unregister_session(sid):
+    """Stops delivering events to a socket and drops anything still queued for it."""
+    return sessions.pop(sid, None) is not None
+
+def set_session_encoder(sid, encoder):
+    """
+    Installs a per-session encoder that rewrites a tick's [(event, data), ...] list
+    right before it is sent (e.g. to pack movement into a binary frame).
+    """
+    session = sessions.get(sid)
+    if session is not None:
+        session['encoder'] = encoder
+
+def has_capability(sid, capability):
+    """Returns True if the session negotiated the given capability at player_join."""
+    session = sessions.get(sid)
+    return session is not None and capability in session['capabilities']
+
+def sids_without(capability, sids=None):
+    """Filters sids (default: every session) down to those that did not negotiate a capability."""
+    if sids is None:
+        sids = sessions.keys()
+    return [sid for sid in sids if sid in sessions and capability not in sessions[sid]['capabilities']]
+
+def register_tick_hook(callback_function):
+    """
+    Registers a function to run once per tick, before queued events are flushed.
+    The callback receives the current tick number.
+    """
+    if not callable(callback_function):
+        logger.error("Failed to register tick hook: Provided callback is not callable.")
+        return
+    tick_hooks.append(callback_function)
+
+def priority_for(event):
+    """Returns the priority class of an event (unknown events are treated as movement)."""
+    return EVENT_PRIORITIES.get(event, DEFAULT_PRIORITY)
+
+def _estimate_size(data):
+    """Rough number of bytes a payload occupies on the wire."""
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    try:
+        return len(json.dumps(data, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+def _is_unique_key(key):
+    return isinstance(key, tuple) and len(key) == 2 and key[0] == '_unique'
+
+def queue_event(event, data, to=None, exclude=None, key=None, relay=True, priority=None):
+    """
+    Queues an outbound event for delivery on the next tick.
+
+    Args:
+        event (str): Socket.IO event name.
+        data: JSON-serialisable payload.
+        to (str | iterable | None): A single sid, an iterable of sids, or None for every session.
+        exclude (str): Optional sid that should not receive the event (e.g. the sender).
+        key (hashable): Optional collapse key. A later event with the same key in the same
+            tick replaces the earlier one; dict payloads of the same event are merged so
+            partial updates (e.g. name, then color) are not lost.
+        relay (bool): In multi-worker mode, also forward broadcasts (to=None) to the other workers.
+        priority (int): Priority class override; defaults to EVENT_PRIORITIES[event].
+    """
+    if to is None:
+        targets = list(sessions.keys())
+        if relay and broadcast_relay is not None:
+            broadcast_relay(event, data, key)
+    elif isinstance(to, str):
+        targets = [to]
+    else:
+        targets = to
+
+    if key is None:
+        key = ('_unique', next(_unique_keys))
+    if priority is None:
+        priority = priority_for(event)
+    size = _estimate_size(data)
+
+    for sid in targets:
+        if sid == exclude:
+            continue
+        session = sessions.get(sid)
+        if session is None:
+            continue
+
+        queue = session['queues'][priority]
+        previous = queue.pop(key, None)
+        if previous is not None:
+            session['queued_bytes'] -= previous[2]
+        if previous is not None and previous[0] == event \
+                and isinstance(previous[1], dict) and isinstance(data, dict):
+            merged = {**previous[1], **data}
+            entry = (event, merged, max(size, previous[2]))
+        else:
+            entry = (event, data, size)
+        queue[key] = entry
+        session['queued_bytes'] += entry[2]
+
+def transport_backlog(sid):
+    """Returns the number of packets Engine.IO still has to write to a client's transport."""
+    try:
+        server = socketio.server
+        eio_socket = server.eio.sockets.get(server.manager.eio_sid_from_sid(sid, NAMESPACE))
+        return eio_socket.queue.qsize() if eio_socket is not None else 0
+    except Exception:
+        return 0
+
+def _shed_cosmetic(session):
+    """Drops the oldest non-collapsible cosmetic events of a lagging client."""
+    queue = session['queues'][PRIORITY_COSMETIC]
+    unique_keys = [key for key in queue if _is_unique_key(key)]
+    for key in unique_keys[:max(0, len(unique_keys) - COSMETIC_KEEP_WHEN_BEHIND)]:
+        session['queued_bytes'] -= queue.pop(key)[2]
+        session['dropped'] += 1
+        stats['dropped'] += 1
+
+def _take_batch(session, limit, classes):
+    """Removes up to `limit` events from the given priority classes, highest priority first."""
+    items = []
+    for priority in classes:
+        queue = session['queues'][priority]
+        while queue and len(items) < limit:
+            event, data, size = queue.popitem(last=False)[1]
+            session['queued_bytes'] -= size
+            items.append((event, data))
+    return items
+
+def _enforce_memory_budget(sid, session, now):
+    """Disconnects a client whose queue has stayed over MEMORY_BUDGET_BYTES for OVER_BUDGET_GRACE seconds."""
+    if session['queued_bytes'] <= MEMORY_BUDGET_BYTES:
+        session['over_budget_since'] = None
+        return False
+    if session['over_budget_since'] is None:
+        session['over_budget_since'] = now
+        return False
+    if now - session['over_budget_since'] < OVER_BUDGET_GRACE:
+        return False
+
+    logger.warning(f"Disconnecting {sid} (player {session['player_id']}): "
+                   f"{session['queued_bytes']} bytes queued for over {OVER_BUDGET_GRACE}s")
+    unregister_session(sid)
+    stats['disconnected'] += 1
+    try:
+        socketio.server.disconnect(sid, namespace=NAMESPACE)
+    except Exception as e:
+        logger.error(f"Error disconnecting slow client {sid}: {e}")
+    return True
+
+def queue_metrics():
+    """Returns per-client outbound queue depth and backpressure state."""
+    clients = {}
+    for sid, session in list(sessions.items()):
+        clients[sid] = {
+            'player_id': session['player_id'],
+            'depth': {name: len(queue) for name, queue in zip(PRIORITY_NAMES, session['queues'])},
+            'queued_bytes': session['queued_bytes'],
+            'transport_backlog': transport_backlog(sid),
+            'behind': session['behind'],
+            'dropped': session['dropped'],
+        }
+    return {'tick': tick_count, 'clients': clients, **stats}
+
+def tick_time(tick):
+    """Returns when a recent tick was flushed, or None if it is too old or unknown."""
+    return tick_times.get(tick)
+
+def flush_tick():
+    """Runs the tick hooks and sends every session's queued events."""
+    global tick_count
+    tick_count += 1
+
+    for hook in list(tick_hooks):
+        try:
+            hook(tick_count)
+        except Exception as e:
+            logger.error(f"Error in tick hook {getattr(hook, '__name__', hook)}: {e}", exc_info=True)
+
+    now = time.time()
+    tick_times[tick_count] = now
+    while len(tick_times) > TICK_TIME_HISTORY:
+        tick_times.popitem(last=False)
+
+    for sid, session in list(sessions.items()):
+        if not any(session['queues']):
+            session['behind'] = False
+            session['over_budget_since'] = None
+            continue
+
+        congested = transport_backlog(sid) > TRANSPORT_BACKLOG_LIMIT
+        if session['behind'] or congested:
+            _shed_cosmetic(session)
+        # A congested transport only gets combat events; movement keeps collapsing to
+        # the latest state per entity and goes out once the client has caught up.
+        classes = (PRIORITY_COMBAT,) if congested else range(len(PRIORITY_NAMES))
+        items = _take_batch(session, MAX_EVENTS_PER_FLUSH, classes)
+        session['behind'] = congested or any(session['queues'])
+
+        if _enforce_memory_budget(sid, session, now) or not items:
+            continue
+
+        try:
+            if session['encoder'] is not None:
+                items = session['encoder'](sid, items)
+
+            if session['bundled']:
+                socketio.emit(BUNDLE_EVENT, {
+                    'tick': tick_count,
+                    'events': [[event, data] for event, data in items]
+                }, room=sid)
+            else:
+                # Legacy clients still get one frame per event, but collapsed and tick-aligned
+                for event, data in items:
+                    socketio.emit(event, data, room=sid)
+        except Exception as e:
+            logger.error(f"Error flushing tick {tick_count} to {sid}: {e}")
+
+def start_tick_loop():
+    """Starts the background task that flushes queued events at TICK_RATE."""
+    if not socketio:
+        logger.error("Cannot start tick loop: Socket.IO instance not available.")
+        return
+
+    def tick_loop():
+        logger.info("Starting tick bundler loop.")
+        while True:
+            try:
+                flush_tick()
+                socketio.sleep(TICK_INTERVAL) # Use socketio's sleep for eventlet
+            except Exception as e:
+                logger.error(f"Critical error in tick loop: {e}", exc_info=True)
+                socketio.sleep(1)
+
+    socketio.start_background_task(tick_loop)
+    logger.info("Tick bundler background task scheduled.")
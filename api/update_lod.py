@@ -0,0 +1,144 @@
+"""
+Update LOD Module
+Distance-based update rates for remote players. Nearby ships are sent at the
+full rate, medium-range ships a few times a second and far-away ships at a
+coarse "radar" rate, so per-client bandwidth stays roughly flat as the world fills up.
+An update skipped because it was not due yet is kept (the latest one per observer
+and subject) and sent once it is due, so a ship that stops is still shown where it
+came to rest.
+"""
+
+import os
+import math
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# (max_distance, min_seconds_between_updates), checked in order. Override with the
+# LOD_TIERS environment variable, e.g. "200:0,600:0.2,inf:1".
+DEFAULT_LOD_TIERS = [
+    (200, 0.0),       # Near: every update
+    (600, 0.2),       # Medium: ~5 Hz
+    (math.inf, 1.0),  # Far: ~1 Hz radar
+]
+
+# --- Module-level Data Structures ---
+lod_tiers = list(DEFAULT_LOD_TIERS)
+last_sent = {}  # {observer_id: {subject_id: timestamp of last update sent}}
+pending = {}    # {observer_id: {subject_id: latest update skipped because it was not due yet}}
+
+# --- Module-level References ---
+players = None  # Reference to the main player dictionary from app.py
+
+def init_lod(players_reference):
+    """Initialize the LOD module with the players reference and optional tier override"""
+    global players
+    players = players_reference
+
+    tiers_env = os.environ.get('LOD_TIERS')
+    if tiers_env:
+        try:
+            configure_tiers(parse_tiers(tiers_env))
+        except ValueError as e:
+            logger.error(f"Ignoring invalid LOD_TIERS '{tiers_env}': {e}")
+    logger.info(f"Update LOD initialized with tiers {lod_tiers}")
+
+def parse_tiers(text):
+    """Parse 'distance:interval,...' into a list of (distance, interval) tuples"""
+    tiers = []
+    for part in text.split(','):
+        distance, interval = part.split(':')
+        tiers.append((float(distance), float(interval)))
+    return tiers
+
+def configure_tiers(tiers):
+    """
+    Replace the LOD tiers.
+
+    Args:
+        tiers (list): (max_distance, min_interval_seconds) pairs. They are sorted by
+            distance and the last tier is extended to infinity so every distance is covered.
+    """
+    tiers = sorted((float(d), float(i)) for d, i in tiers)
+    if not tiers:
+        raise ValueError("At least one LOD tier is required")
+    if any(interval < 0 for _, interval in tiers):
+        raise ValueError("LOD intervals must not be negative")
+    tiers[-1] = (math.inf, tiers[-1][1])
+    lod_tiers[:] = tiers
+
+def interval_for_distance(distance):
+    """Return the minimum seconds between updates for a subject at this distance"""
+    for max_distance, interval in lod_tiers:
+        if distance <= max_distance:
+            return interval
+    return lod_tiers[-1][1]
+
+def _distance(player_a, player_b):
+    pos_a = player_a.get('position') or {}
+    pos_b = player_b.get('position') or {}
+    dx = pos_a.get('x', 0) - pos_b.get('x', 0)
+    dz = pos_a.get('z', 0) - pos_b.get('z', 0)
+    return math.sqrt(dx*dx + dz*dz)
+
+def is_due(observer_id, subject_id, now, mark=True):
+    """
+    Return True if the observer should get an update about the subject now.
+    Distance is taken from the positions cached in players. When mark is True a
+    positive answer also records the update as sent.
+    """
+    observer = players.get(observer_id)
+    subject = players.get(subject_id)
+    if observer is None or subject is None:
+        return True
+
+    interval = interval_for_distance(_distance(observer, subject))
+    sent = last_sent.setdefault(observer_id, {})
+    if interval > 0 and now - sent.get(subject_id, 0) < interval:
+        return False
+
+    if mark:
+        sent[subject_id] = now
+    return True
+
+def due_observers(subject_id, observer_ids, now, update=None):
+    """
+    Filter observer_ids down to those due an update about subject_id (marking them as sent).
+    When update is given, it is kept for the observers that are not due yet, replacing
+    any older pending update; take_pending returns it once it is due.
+    """
+    due = []
+    for observer_id in observer_ids:
+        if is_due(observer_id, subject_id, now):
+            due.append(observer_id)
+            pending.get(observer_id, {}).pop(subject_id, None)
+        elif update is not None:
+            pending.setdefault(observer_id, {})[subject_id] = update
+    return due
+
+def take_pending(now):
+    """
+    Remove and return the pending updates that are now due (marking them as sent).
+
+    Returns:
+    - [(observer_id, subject_id, update)]
+    """
+    ready = []
+    for observer_id, updates in list(pending.items()):
+        for subject_id in list(updates):
+            if is_due(observer_id, subject_id, now):
+                ready.append((observer_id, subject_id, updates.pop(subject_id)))
+        if not updates:
+            del pending[observer_id]
+    return ready
+
+def forget_player(player_id):
+    """Drop all LOD bookkeeping involving a player that left"""
+    last_sent.pop(player_id, None)
+    for sent in last_sent.values():
+        sent.pop(player_id, None)
+    pending.pop(player_id, None)
+    for updates in pending.values():
+        updates.pop(player_id, None)
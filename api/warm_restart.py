@@ -0,0 +1,199 @@
+"""
+Warm Restart Module
+Periodically writes a snapshot of the server's in-flight world state to a
+local file, and writes a final one on graceful shutdown. On boot, a snapshot
+that is fresh enough is restored on top of the state loaded from storage, so
+a deploy comes back with projectiles, cooldowns and ship positions intact.
+Persistent state (stats, inventories) is never taken from the snapshot.
+
+File format: a fixed binary header followed by zlib-compressed JSON.
+
+    magic (4s) | version (H) | created_at (d) | payload length (I) | payload crc32 (I) | payload
+
+Snapshots are written to a temporary file and renamed over the old one, so a
+crash mid-write never leaves a torn snapshot. They are read through mmap.
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import atexit
+import signal
+import struct
+import logging
+import threading
+import tick_bundler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# One file per worker: workers on one machine must not restore each other's world
+SNAPSHOT_NAME = f"world_snapshot_{os.environ.get('WORKER_ID') or os.environ.get('PORT', 'default')}.bin"
+SNAPSHOT_PATH = os.environ.get('WARM_RESTART_SNAPSHOT',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), SNAPSHOT_NAME))
+SNAPSHOT_INTERVAL = float(os.environ.get('WARM_RESTART_INTERVAL', 5.0))  # Seconds between periodic snapshots
+MAX_SNAPSHOT_AGE = float(os.environ.get('WARM_RESTART_MAX_AGE', 60.0))   # Older snapshots are ignored on boot
+COMPRESSION_LEVEL = 1  # Fast; the payload is mostly repetitive JSON keys
+
+MAGIC = b'TFWS'
+FORMAT_VERSION = 2  # 2: in-flight state only (sessions instead of whole players)
+HEADER = struct.Struct('<4sHdII')
+
+# --- Module-level Data Structures ---
+stats = {
+    'written': 0,
+    'last_size': 0,          # Compressed bytes of the last snapshot
+    'last_capture_ms': 0.0,  # Time spent serializing state on the tick thread
+    'last_write_ms': 0.0,    # Time spent compressing and writing in the background
+    'failures': 0,
+    'loaded_age': None,      # Age of the snapshot the server booted from, if any
+}
+
+restored_sessions = {}  # {player_id: session fields from the snapshot}, applied when the player joins again
+
+# --- Module-level References ---
+capture_state = None  # Callable returning the JSON-serialisable world state
+_last_capture = 0.0
+_write_lock = threading.Lock()
+
+def init_warm_restart(capture_callback):
+    """
+    Start periodic snapshots (as a tick hook) and write a final one on shutdown.
+
+    Args:
+        capture_callback (callable): Returns the world state as a JSON-serialisable dict.
+            Called on the tick thread, so it can read game state without locking.
+    """
+    global capture_state
+    if capture_state is not None:
+        logger.warning("Warm restart already initialized.")
+        return
+
+    capture_state = capture_callback
+    tick_bundler.register_tick_hook(_periodic_snapshot)
+    atexit.register(_final_snapshot)
+    # Turn SIGTERM (deploys) into a normal exit so atexit handlers, including this one, run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info(f"Warm restart snapshots every {SNAPSHOT_INTERVAL}s to {SNAPSHOT_PATH}")
+
+def _capture():
+    start = time.perf_counter()
+    payload = json.dumps(capture_state(), separators=(',', ':'), default=str).encode('utf-8')
+    stats['last_capture_ms'] = (time.perf_counter() - start) * 1000
+    return payload
+
+def write_snapshot(payload, path=SNAPSHOT_PATH):
+    """Compress a JSON payload and atomically replace the snapshot file with it"""
+    start = time.perf_counter()
+    compressed = zlib.compress(payload, COMPRESSION_LEVEL)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, time.time(), len(compressed), zlib.crc32(compressed))
+
+    temp_path = f"{path}.tmp"
+    with _write_lock:
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    stats['written'] += 1
+    stats['last_size'] = HEADER.size + len(compressed)
+    stats['last_write_ms'] = (time.perf_counter() - start) * 1000
+
+def _write_in_background(payload):
+    try:
+        write_snapshot(payload)
+    except Exception as e:
+        stats['failures'] += 1
+        logger.error(f"Failed to write warm restart snapshot: {e}")
+
+def _periodic_snapshot(tick):
+    """Tick hook: capture state every SNAPSHOT_INTERVAL seconds and write it off the tick thread"""
+    global _last_capture
+    now = time.time()
+    if now - _last_capture < SNAPSHOT_INTERVAL:
+        return
+    _last_capture = now
+    payload = _capture()
+    threading.Thread(target=_write_in_background, args=(payload,), name='warm-restart', daemon=True).start()
+
+def _final_snapshot():
+    """Write a snapshot synchronously when the process exits"""
+    try:
+        write_snapshot(_capture())
+        logger.info(f"Wrote warm restart snapshot to {SNAPSHOT_PATH}")
+    except Exception as e:
+        logger.error(f"Failed to write final warm restart snapshot: {e}")
+
+def load_snapshot(path=SNAPSHOT_PATH, max_age=MAX_SNAPSHOT_AGE):
+    """
+    Read the snapshot file through a memory map.
+
+    Returns:
+        dict | None: The world state, or None if there is no usable snapshot
+        (missing, too old, wrong version or corrupt).
+    """
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if len(mapped) < HEADER.size:
+                    raise ValueError("file shorter than header")
+                magic, version, created_at, length, crc = HEADER.unpack_from(mapped, 0)
+                if magic != MAGIC or version != FORMAT_VERSION:
+                    raise ValueError(f"unsupported format {magic!r} v{version}")
+
+                age = time.time() - created_at
+                if age > max_age:
+                    logger.info(f"Warm restart snapshot is {age:.1f}s old (max {max_age}s), ignoring it")
+                    return None
+
+                compressed = mapped[HEADER.size:HEADER.size + length]
+                if len(compressed) != length or zlib.crc32(compressed) != crc:
+                    raise ValueError("payload truncated or checksum mismatch")
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable warm restart snapshot {path}: {e}")
+        return None
+
+    state = json.loads(zlib.decompress(compressed))
+    stats['loaded_age'] = age
+    logger.info(f"Loaded warm restart snapshot ({len(compressed)} bytes, {age:.1f}s old)")
+    return state
+
+def keep_sessions(sessions):
+    """
+    Keep the sessions of players who were active when the snapshot was taken. Sockets do
+    not survive a restart, so each one is applied when its player joins again.
+    """
+    restored_sessions.update(sessions)
+
+def _seconds(value):
+    """A last_update as seconds; storage returns timestamps as strings, unparseable ones count as 0"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def apply_session(player_id, player):
+    """
+    Update a rejoining player in place with their restored session, if it is newer than
+    the player's stored last_update. The session is used at most once.
+
+    Returns:
+        bool: True if the session was applied
+    """
+    session = restored_sessions.pop(player_id, None)
+    if not session or _seconds(session.get('last_update')) <= _seconds(player.get('last_update')):
+        return False
+    player.update(session)
+    return True
+
+def metrics():
+    """Return snapshot size and timing metrics"""
+    return dict(stats)
@@ -0,0 +1,185 @@
+"""
+Wire Protocol Module
+Compact binary encoding for update_position / player_moved.
+Clients opt in by sending protocol_version >= 2 in player_join; everyone else
+keeps using the JSON events.
+
+Frame layouts (little endian):
+- Position update (client -> server, event 'update_position'):
+    <BB I i h i H B   version, MSG_POSITION_UPDATE, seq, x, y, z, rotation, mode
+- Players moved (server -> client, event 'player_moved_bin'):
+    <BB H             version, MSG_PLAYERS_MOVED, count
+    count x <H i h i H B   handle, x, y, z, rotation, mode
+  Handles a client has not seen yet are announced first in a JSON
+  'player_handles' event ({handle: player_id}).
+Positions use snapshots.POSITION_SCALE, rotations a 16-bit fraction of a turn
+and mode the snapshots.MODES enum.
+"""
+
+import struct
+import logging
+import snapshots
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+PROTOCOL_VERSION_JSON = 1
+PROTOCOL_VERSION_BINARY = 2
+CURRENT_PROTOCOL_VERSION = PROTOCOL_VERSION_BINARY
+
+MSG_POSITION_UPDATE = 1
+MSG_PLAYERS_MOVED = 2
+
+BINARY_MOVED_EVENT = 'player_moved_bin'
+HANDLES_EVENT = 'player_handles'
+
+POSITION_UPDATE = struct.Struct('<BBIihiHB')
+MOVED_HEADER = struct.Struct('<BBH')
+MOVED_ENTRY = struct.Struct('<HihiHB')
+
+_MODE_NAMES = {value: name for name, value in snapshots.MODES.items()}
+
+# --- Module-level Data Structures ---
+session_versions = {}  # {sid: negotiated protocol version}
+known_handles = {}     # {sid: set(handle)} handles already announced to each binary session
+
+# --- Module-level References ---
+players = None  # Reference to the main player dictionary from app.py
+
+def init_protocol(players_reference):
+    """Initialize the wire protocol with the players reference"""
+    global players
+    players = players_reference
+    logger.info("Wire protocol initialized")
+
+def negotiate(sid, requested_version):
+    """
+    Pick the protocol version for a session from the version the client asked for.
+    Clients that don't send a version (or send garbage) stay on JSON.
+
+    Returns:
+    - The negotiated version
+    """
+    try:
+        requested = int(requested_version or PROTOCOL_VERSION_JSON)
+    except (TypeError, ValueError):
+        requested = PROTOCOL_VERSION_JSON
+
+    version = max(PROTOCOL_VERSION_JSON, min(requested, CURRENT_PROTOCOL_VERSION))
+    session_versions[sid] = version
+    return version
+
+def forget_session(sid):
+    """Drop the negotiated version of a disconnected socket"""
+    session_versions.pop(sid, None)
+    known_handles.pop(sid, None)
+
+def is_binary(sid):
+    """Return True if the session negotiated the binary protocol"""
+    return session_versions.get(sid, PROTOCOL_VERSION_JSON) >= PROTOCOL_VERSION_BINARY
+
+# --- Encoding / decoding ---
+def _clamp(value, low, high):
+    return low if value < low else high if value > high else value
+
+def encode_position_update(seq, x, y, z, rotation, mode):
+    """Encode a client position update (used by clients and the benchmark)"""
+    return POSITION_UPDATE.pack(
+        PROTOCOL_VERSION_BINARY, MSG_POSITION_UPDATE, seq & 0xFFFFFFFF,
+        _clamp(snapshots.quantize_position(x), -2**31, 2**31 - 1),
+        _clamp(snapshots.quantize_position(y), -2**15, 2**15 - 1),
+        _clamp(snapshots.quantize_position(z), -2**31, 2**31 - 1),
+        snapshots.quantize_rotation(rotation),
+        snapshots.encode_mode(mode))
+
+def decode_position_update(frame, player_id):
+    """
+    Decode a binary position update into the same dict shape as the JSON event.
+
+    Raises:
+    - ValueError if the frame is malformed
+    """
+    if len(frame) != POSITION_UPDATE.size:
+        raise ValueError(f"Position update frame must be {POSITION_UPDATE.size} bytes, got {len(frame)}")
+
+    version, msg_type, seq, x, y, z, rotation, mode = POSITION_UPDATE.unpack(frame)
+    if msg_type != MSG_POSITION_UPDATE:
+        raise ValueError(f"Unexpected message type {msg_type} in position update")
+
+    return {
+        'player_id': player_id,
+        'seq': seq,
+        'x': snapshots.dequantize_position(x),
+        'y': snapshots.dequantize_position(y),
+        'z': snapshots.dequantize_position(z),
+        'rotation': snapshots.dequantize_rotation(rotation),
+        'mode': _MODE_NAMES.get(mode, 'boat'),
+    }
+
+def encode_players_moved(moves):
+    """
+    Encode a list of player_moved payloads ({id, position, rotation?, mode?}) into one frame.
+    Missing rotation/mode fall back to the values cached in players.
+    """
+    entries = []
+    for move in moves:
+        player_id = move['id']
+        cached = players.get(player_id, {}) if players is not None else {}
+        position = move.get('position') or {}
+        rotation = move.get('rotation', cached.get('rotation'))
+        mode = move.get('mode', cached.get('mode'))
+        entries.append(MOVED_ENTRY.pack(
+            snapshots.handle_for(player_id),
+            _clamp(snapshots.quantize_position(position.get('x')), -2**31, 2**31 - 1),
+            _clamp(snapshots.quantize_position(position.get('y')), -2**15, 2**15 - 1),
+            _clamp(snapshots.quantize_position(position.get('z')), -2**31, 2**31 - 1),
+            snapshots.quantize_rotation(rotation),
+            snapshots.encode_mode(mode)))
+    return MOVED_HEADER.pack(PROTOCOL_VERSION_BINARY, MSG_PLAYERS_MOVED, len(entries)) + b''.join(entries)
+
+def decode_players_moved(frame):
+    """Decode a players-moved frame into a list of dicts keyed by handle (used by the benchmark)"""
+    version, msg_type, count = MOVED_HEADER.unpack_from(frame, 0)
+    if msg_type != MSG_PLAYERS_MOVED:
+        raise ValueError(f"Unexpected message type {msg_type} in players moved frame")
+    moves = []
+    for handle, x, y, z, rotation, mode in MOVED_ENTRY.iter_unpack(frame[MOVED_HEADER.size:MOVED_HEADER.size + count * MOVED_ENTRY.size]):
+        moves.append({
+            'handle': handle,
+            'position': {
+                'x': snapshots.dequantize_position(x),
+                'y': snapshots.dequantize_position(y),
+                'z': snapshots.dequantize_position(z),
+            },
+            'rotation': snapshots.dequantize_rotation(rotation),
+            'mode': _MODE_NAMES.get(mode, 'boat'),
+        })
+    return moves
+
+def encode_tick_items(sid, items):
+    """
+    Tick bundler encoder for binary sessions: replaces every queued player_moved
+    event with a single player_moved_bin frame placed where the first one was.
+    """
+    moves = [data for event, data in items if event == 'player_moved']
+    if not moves:
+        return items
+
+    known = known_handles.setdefault(sid, set())
+    new_handles = {}
+    for move in moves:
+        handle = snapshots.handle_for(move['id'])
+        if handle not in known:
+            new_handles[handle] = move['id']
+            known.add(handle)
+
+    encoded = [(HANDLES_EVENT, new_handles)] if new_handles else []
+    frame_added = False
+    for event, data in items:
+        if event != 'player_moved':
+            encoded.append((event, data))
+        elif not frame_added:
+            encoded.append((BINARY_MOVED_EVENT, encode_players_moved(moves)))
+            frame_added = True
+    return encoded
@@ -0,0 +1,195 @@
+"""
+Write-Behind Module
+Buffers document updates in memory and writes them to storage (Firestore
+WriteBatch commits, or the local store) from a background thread, so socket
+handlers never wait on the database.
+Repeated writes to the same document are merged; a batch is flushed every
+FLUSH_INTERVAL seconds, or sooner once FLUSH_THRESHOLD documents are dirty.
+Every update is recorded in the local journal first and confirmed there once
+committed, so a crash before the flush loses nothing (see journal.py).
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+import storage
+import journal
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_INTERVAL', 1.0))  # Seconds between flushes
+FLUSH_THRESHOLD = 200     # Dirty documents that trigger an early flush
+MAX_BATCH_WRITES = storage.MAX_BATCH_WRITES  # Documents per flush batch
+RETRY_DELAY = 5.0         # Seconds to wait after a failed commit before trying again
+
+# --- Module-level Data Structures ---
+# {(collection_name, doc_id): {field: value}} pending fields per document, oldest first
+dirty = OrderedDict()
+dirty_since = {}  # {(collection_name, doc_id): time the document first became dirty}
+dirty_seqs = {}   # {(collection_name, doc_id): [journal sequence numbers of the pending fields]}
+stats = {
+    'flushes': 0,            # Successful batch commits
+    'documents_written': 0,  # Document writes committed
+    'merged': 0,             # Writes folded into an already dirty document
+    'failures': 0,           # Failed commits (their writes are retried)
+    'last_batch_size': 0,
+    'max_batch_size': 0,
+    'last_flush_lag': 0.0,   # Seconds the oldest write of the last batch waited before being committed
+    'max_flush_lag': 0.0,
+}
+_lock = threading.Lock()
+_wake = threading.Event()
+
+# --- Module-level References ---
+_thread = None
+
+def init_write_behind():
+    """Start the flusher thread (storage must be initialized first)"""
+    global _thread
+    if _thread is not None:
+        logger.warning("Write-behind flusher already running.")
+        return
+
+    _thread = threading.Thread(target=_flush_loop, name='write-behind', daemon=True)
+    _thread.start()
+    atexit.register(_final_flush)
+    logger.info(f"Write-behind initialized (interval {FLUSH_INTERVAL}s, threshold {FLUSH_THRESHOLD} docs)")
+
+def update(collection_name, doc_id, **fields):
+    """
+    Mark fields of a document dirty. Returns immediately; the write is committed by
+    the flusher. Later values for the same field replace earlier ones.
+    """
+    seq = journal.record('update', collection=collection_name, doc_id=doc_id, fields=fields)
+    size = _queue((collection_name, doc_id), fields, seq)
+    if size >= FLUSH_THRESHOLD:
+        _wake.set()
+
+def _queue(key, fields, seq):
+    """Merge fields into a document's pending write. Returns the number of dirty documents."""
+    with _lock:
+        pending = dirty.get(key)
+        if pending is None:
+            dirty[key] = dict(fields)
+            dirty_since[key] = time.time()
+            dirty_seqs[key] = []
+        else:
+            pending.update(fields)
+            stats['merged'] += 1
+        if seq is not None:
+            dirty_seqs[key].append(seq)
+        return len(dirty)
+
+def replay(records):
+    """Queue the journaled updates a previous run did not commit (see journal.init_journal)"""
+    replayed = 0
+    for record in records:
+        if record.get('kind') == 'update':
+            _queue((record['collection'], record['doc_id']), record['fields'], record['seq'])
+            replayed += 1
+    if replayed:
+        logger.info(f"Replayed {replayed} journaled updates")
+        _wake.set()
+    return replayed
+
+def update_player(player_id, **fields):
+    """Queue a player update (mirrors Player.update, including the updated_at stamp)"""
+    fields['updated_at'] = time.time()
+    update('players', player_id, **fields)
+
+def flush_soon():
+    """Wake the flusher now instead of at the next interval"""
+    _wake.set()
+
+def pending_fields(collection_name, doc_id):
+    """Return a copy of the fields still waiting to be written for a document (empty dict if none)"""
+    with _lock:
+        return dict(dirty.get((collection_name, doc_id), {}))
+
+def _take_batch():
+    """Remove up to MAX_BATCH_WRITES dirty documents, oldest first"""
+    with _lock:
+        batch = []
+        while dirty and len(batch) < MAX_BATCH_WRITES:
+            key, fields = dirty.popitem(last=False)
+            batch.append((key, fields, dirty_since.pop(key), dirty_seqs.pop(key)))
+        return batch
+
+def _requeue(batch):
+    """Put the writes of a failed batch back, underneath anything written since"""
+    with _lock:
+        for key, fields, since, seqs in reversed(batch):
+            newer = dirty.pop(key, None)
+            dirty[key] = {**fields, **newer} if newer else fields
+            dirty_since[key] = min(since, dirty_since.get(key, since))
+            dirty_seqs[key] = seqs + dirty_seqs.get(key, [])
+            dirty.move_to_end(key, last=False)
+
+def flush():
+    """
+    Write every dirty document to storage in batches of up to MAX_BATCH_WRITES.
+
+    Returns:
+    - Number of documents written
+    """
+    if storage.backend is None:
+        return 0
+
+    written = 0
+    while True:
+        batch = _take_batch()
+        if not batch:
+            return written
+
+        try:
+            storage.write_batch([(collection_name, doc_id, fields)
+                                 for (collection_name, doc_id), fields, _, _ in batch])
+        except Exception as e:
+            stats['failures'] += 1
+            logger.error(f"Write-behind commit of {len(batch)} documents failed, will retry: {e}")
+            _requeue(batch)
+            raise
+
+        journal.confirm([seq for _, _, _, seqs in batch for seq in seqs])
+        now = time.time()
+        lag = now - min(since for _, _, since, _ in batch)
+        stats['flushes'] += 1
+        stats['documents_written'] += len(batch)
+        stats['last_batch_size'] = len(batch)
+        stats['max_batch_size'] = max(stats['max_batch_size'], len(batch))
+        stats['last_flush_lag'] = lag
+        stats['max_flush_lag'] = max(stats['max_flush_lag'], lag)
+        written += len(batch)
+
+def _flush_loop():
+    logger.info("Starting write-behind flusher.")
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            time.sleep(RETRY_DELAY)
+
+def _final_flush():
+    """Write whatever is still pending when the process exits"""
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Write-behind final flush failed: {e}")
+
+def metrics():
+    """Return flush lag, batch size and backlog metrics"""
+    with _lock:
+        pending = len(dirty)
+        oldest = min(dirty_since.values()) if dirty_since else None
+    return {
+        **stats,
+        'pending': pending,
+        'oldest_pending_age': time.time() - oldest if oldest is not None else 0.0,
+    }
@@ -49,6 +49,9 @@ let activeIslandsRef;
 // Callback for 'all_players' event
 let allPlayersCallback = null;
 
+// Last full leaderboard, kept so leaderboard_diff events can be applied to it
+let leaderboardState = null;
+
 // Respawn Manager - centralized respawn handling
 export const respawnManager = {
     // References
@@ -334,7 +337,8 @@ export async function initializeNetwork(
             rotation: boatRef.rotation.y,
             mode: playerStateRef.mode,
             player_id: userId,      // Use module-scoped variable
-            firebaseToken: firebaseToken   // Use module-scoped variable
+            firebaseToken: firebaseToken,  // Use module-scoped variable
+            capabilities: ['leaderboard_diff']  // Receive only the leaderboard entries that changed
         });
     });
 
@@ -451,6 +455,26 @@ function setupSocketEvents() {
         removeOtherPlayerFromScene(data.id);
     });
 
+    // Area-of-interest events: ships sailing into / out of our grid neighbourhood
+    socket.on('player_entered_view', (data) => {
+        if (data.id === playerId) return;
+        if (otherPlayers.has(data.id)) {
+            // Still in the scene from earlier: its position is stale while it was out of view
+            updateOtherPlayerPosition(data);
+        } else {
+            addOtherPlayersToSceneIfNotPresent([data]);
+        }
+    });
+
+    socket.on('player_left_view', (data) => {
+        removeOtherPlayerFromScene(data.id);
+    });
+
+    // Round-trip probe: acknowledge at once so the server can measure our latency for hit detection
+    socket.on('latency_probe', (data, ack) => {
+        if (typeof ack === 'function') ack();
+    });
+
     // Island events
     socket.on('island_registered', (data) => {
         // This could be used to sync islands across clients
@@ -459,6 +483,7 @@ function setupSocketEvents() {
 
     // Leaderboard events
     socket.on('leaderboard_update', (data) => {
+        leaderboardState = data;
         // Update the UI with new leaderboard data
         if (typeof updateLeaderboardData === 'function') {
             updateLeaderboardData(data);
@@ -467,6 +492,18 @@ function setupSocketEvents() {
         }
     });
 
+    socket.on('leaderboard_diff', (data) => {
+        // A missed version means our copy is stale: ask for a full one
+        if (!leaderboardState || data.version !== leaderboardState.version + 1) {
+            requestLeaderboard();
+            return;
+        }
+        leaderboardState = applyLeaderboardDiff(leaderboardState, data);
+        if (typeof updateLeaderboardData === 'function') {
+            updateLeaderboardData(leaderboardState);
+        }
+    });
+
     // Add this handler to process the player stats response
     socket.on('player_stats', (data) => {
         // Update local player stats
@@ -887,6 +924,23 @@ export function isNetworkConnected() {
     return isConnected;
 }
 
+// Apply a leaderboard_diff ({version, changes: {category: {length, changed: [[rank, entry]]} | {entries}}})
+function applyLeaderboardDiff(state, diff) {
+    const next = { ...state, version: diff.version };
+    for (const [category, change] of Object.entries(diff.changes)) {
+        if (change.entries) {
+            next[category] = change.entries;
+            continue;
+        }
+        const entries = (state[category] || []).slice(0, change.length);
+        for (const [rank, entry] of change.changed) {
+            entries[rank] = entry;
+        }
+        next[category] = entries;
+    }
+    return next;
+}
+
 // Request leaderboard data from the server
 export function requestLeaderboard() {
     if (!isConnected || !socket) return;
@@ -1112,9 +1166,13 @@ export function playerHasItem(inventoryData, itemType, itemName) {
     if (!inventoryData) return false;
 
     const itemCollection = inventoryData[itemType];
-    if (!itemCollection || !Array.isArray(itemCollection)) return false;
+    if (!itemCollection) return false;
 
-    return itemCollection.some(item => item.name === itemName);
+    // Older inventories are arrays of items; summaries are {name: {name, count, ...}}
+    if (Array.isArray(itemCollection)) {
+        return itemCollection.some(item => item.name === itemName);
+    }
+    return (itemCollection[itemName]?.count || 0) > 0;
 }
 
 // Fire a cannon from the player's position
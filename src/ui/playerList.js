@@ -150,45 +150,44 @@ class PlayerList {
         this.statusIndicator.style.color = "#00ff00";
         this.statusIndicator.style.borderColor = "#00ff00";
 
-        socket.on('all_players', (players) => {
+        // The roster ({id, name, color, fishCount, money}) covers every online player;
+        // all_players and player_joined only carry the ships within our area of interest
+        this.roster = [];
 
-            // Update both the UI and the gameState's allPlayers array
-            updateAllPlayers(players);
-            this.updatePlayerList(players);
+        socket.on('player_roster', (roster) => {
+            this.roster = roster;
+            this.updatePlayerList(this.roster);
         });
 
-        // Add listener for player_joined events
-        socket.on('player_joined', (player) => {
-
-            // Update gameState's allPlayers array by adding the new player
-            const currentPlayers = getAllPlayers();
-            const updatedPlayers = [...currentPlayers];
-
+        // Add listener for players joining anywhere on the server
+        socket.on('roster_joined', (entry) => {
             // Check if player already exists, update if so
-            const existingIndex = updatedPlayers.findIndex(p => p.id === player.id);
+            const existingIndex = this.roster.findIndex(p => p.id === entry.id);
             if (existingIndex >= 0) {
-                updatedPlayers[existingIndex] = player;
+                this.roster[existingIndex] = entry;
             } else {
-                updatedPlayers.push(player);
+                this.roster.push(entry);
             }
 
-            updateAllPlayers(updatedPlayers);
-
             // Refresh the UI with the updated player list
-            this.updatePlayerList(updatedPlayers);
+            this.updatePlayerList(this.roster);
         });
 
-        // Add listener for player_left events
-        socket.on('player_left', (playerId) => {
-
-            // Update gameState's allPlayers array by removing the player
-            const currentPlayers = getAllPlayers();
-            const updatedPlayers = currentPlayers.filter(p => p.id !== playerId);
+        // Name and color changes
+        socket.on('player_updated', (data) => {
+            const existingIndex = this.roster.findIndex(p => p.id === data.id);
+            if (existingIndex >= 0) {
+                this.roster[existingIndex] = { ...this.roster[existingIndex], ...data };
+                this.updatePlayerList(this.roster);
+            }
+        });
 
-            updateAllPlayers(updatedPlayers);
+        // Add listener for players leaving
+        socket.on('player_disconnected', (data) => {
+            this.roster = this.roster.filter(p => p.id !== data.id);
 
             // Refresh the UI with the updated player list
-            this.updatePlayerList(updatedPlayers);
+            this.updatePlayerList(this.roster);
         });
 
         // Cache the socket for later use
@@ -596,8 +595,8 @@ class PlayerList {
     refreshPlayerList() {
 
 
-        // Try to get players from gameState first
-        const storedPlayers = getAllPlayers();
+        // Show the last roster (or gameState's players) until the server answers
+        const storedPlayers = this.roster && this.roster.length > 0 ? this.roster : getAllPlayers();
         if (storedPlayers && storedPlayers.length > 0) {
 
             this.updatePlayerList(storedPlayers);